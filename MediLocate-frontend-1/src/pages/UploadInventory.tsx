@@ -45,8 +45,24 @@ const UploadInventory: React.FC = () => {
     setErrorDetails([]);
 
     try {
-      const response = await inventoryAPI.uploadInventory(selectedFile);
-      setSuccess(response.message || 'File uploaded successfully!');
+      const response: any = await inventoryAPI.uploadInventory(selectedFile);
+      if (!response.job_id) {
+        setSuccess(response.message || 'File uploaded successfully!');
+        return;
+      }
+      setSuccess(response.message || 'Upload queued for processing.');
+      const job = await inventoryAPI.waitForIngestJob(response.job_id, (current) => {
+        setSuccess(current.status === 'queued'
+          ? 'Upload queued for processing.'
+          : `Processing... ${current.rows_processed} of ${current.total_rows ?? '?'} rows.`);
+      });
+      if (job.status === 'failed') {
+        setSuccess('');
+        setError('Upload failed with errors');
+        setErrorDetails(job.errors);
+      } else {
+        setSuccess(`Successfully uploaded ${job.rows_processed} inventory items.`);
+      }
     } catch (err: any) {
       setError(err.response?.data?.error || 'Upload failed. Please check the file format and try again.');
       if(err.response?.data?.details) {
@@ -6,6 +6,7 @@ import {
   SearchData, 
   AuthResponse,
   ApiResponse,
+  IngestJob,
   User
 } from '../types';
 
@@ -77,6 +78,23 @@ export const inventoryAPI = {
     });
     return response.data;
   },
+
+  getIngestJob: async (jobId: string): Promise<IngestJob> => {
+    const response = await api.get(`/api/inventory/jobs/${jobId}`);
+    return response.data;
+  },
+
+  // Uploads are ingested in the background; poll the job until it finishes
+  waitForIngestJob: async (jobId: string, onProgress?: (job: IngestJob) => void, intervalMs = 1000): Promise<IngestJob> => {
+    for (;;) {
+      const job = await inventoryAPI.getIngestJob(jobId);
+      if (job.status === 'succeeded' || job.status === 'failed') {
+        return job;
+      }
+      onProgress?.(job);
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  },
 };
 
 // User API calls
@@ -87,4 +87,18 @@ export interface ApiResponse<T> {
     data?: T;
     error?: string;
     message?: string;
+}
+
+export interface IngestJob {
+    job_id: string;
+    status: 'queued' | 'running' | 'succeeded' | 'failed';
+    mode?: 'replace' | 'add';
+    filename?: string;
+    total_rows?: number;
+    rows_processed: number;
+    progress?: number | null;
+    jobs_ahead?: number;
+    errors: string[];
+    changes?: { inserted: number; updated: number; deleted: number; unchanged: number } | null;
+    stats?: { rows: number; rows_per_second?: number | null } | null;
 }
\ No newline at end of file
@@ -5,14 +5,32 @@ from config import Config
 from flask_jwt_extended import JWTManager
 db = SQLAlchemy()
 
-def create_app():
+def create_app(config_object=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_object)
 
     db.init_app(app)
     CORS(app)
     jwt = JWTManager(app)
 
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+
+    from app.utils.auth_utils import init_auth
+    init_auth(app, jwt)
+
+    from app.utils.geocode_utils import init_geocoder
+    init_geocoder(app)
+
+    from app.utils.search_cache import init_search_cache
+    init_search_cache(app)
+
+    from app.utils.road_network import init_road_network
+    init_road_network(app)
+
+    from app.utils.ingest_jobs import init_ingest_jobs
+    init_ingest_jobs(app)
+
     # Blueprints
     from app.routes.auth import auth_bp
     from app.routes.upload import upload_bp
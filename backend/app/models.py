@@ -16,6 +16,8 @@ class User(db.Model):
     longitude = db.Column(db.Float)
     
     inventory = db.relationship('Inventory', backref='pharmacy', lazy=True, cascade="all, delete-orphan")
+    availability = db.relationship('MedicineAvailability', lazy=True, cascade="all, delete-orphan")
+    ingest_jobs = db.relationship('IngestJob', lazy=True, cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
@@ -34,23 +36,102 @@ class Medicine(db.Model):
     __tablename__ = 'medicines'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     manufacturer = db.Column(db.String(100))
     description = db.Column(db.String(255))
 
     # Relationship to Inventory
     inventories = db.relationship('Inventory', backref='medicine', lazy=True)
 
+# One catalog entry per name whatever its case; uploads that race to create
+# the same medicine skip the conflicting insert
+db.Index('uq_medicines_name_lower', db.func.lower(Medicine.name), unique=True)
+
 class Inventory(db.Model):
     __tablename__ = 'inventory'
+    __table_args__ = (
+        # One row per batch: uploads upsert on this key
+        db.UniqueConstraint('pharmacy_id', 'medicine_id', 'expiry_date', 'price', name='uq_inventory_batch'),
+        # Lookups by medicine across pharmacies (availability, autocomplete weights)
+        db.Index('ix_inventory_medicine_pharmacy', 'medicine_id', 'pharmacy_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     pharmacy_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     medicine_id = db.Column(db.Integer, db.ForeignKey('medicines.id'), nullable=False)  # <-- THIS LINE IS MANDATORY
 
-    name = db.Column(db.String(100), nullable=False)
-    manufacturer = db.Column(db.String(100))
-    description = db.Column(db.String(255))
+    # Name, manufacturer and description live on Medicine only
     stock = db.Column(db.Integer)
     price = db.Column(db.Float)
     expiry_date = db.Column(db.Date)
+
+class MedicineAvailability(db.Model):
+    """
+    Per pharmacy and medicine summary of the inventory batches, kept up to
+    date by app.utils.availability whenever inventory is uploaded.
+    """
+    __tablename__ = 'medicine_availability'
+    __table_args__ = (
+        # The primary key serves lookups by pharmacy; this one by medicine
+        db.Index('ix_medicine_availability_medicine_pharmacy', 'medicine_id', 'pharmacy_id'),
+    )
+
+    pharmacy_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    medicine_id = db.Column(db.Integer, db.ForeignKey('medicines.id'), primary_key=True)
+    total_stock = db.Column(db.Integer, nullable=False, default=0)
+    min_price = db.Column(db.Float)
+    earliest_expiry = db.Column(db.Date)  # earliest batch not yet expired when refreshed
+    batch_count = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_on = db.Column(db.Date, nullable=False)
+
+class InventoryStaging(db.Model):
+    """
+    Landing area for CSV uploads. Rows are bulk-written here per upload_id
+    and then diffed against `inventory`, applying the changes in one transaction.
+    """
+    __tablename__ = 'inventory_staging'
+    __table_args__ = (
+        db.Index('ix_inventory_staging_upload_key', 'upload_id', 'medicine_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    upload_id = db.Column(db.String(32), nullable=False)
+    pharmacy_id = db.Column(db.Integer, nullable=False)
+    medicine_id = db.Column(db.Integer)  # NULL until new medicines are created after staging
+    medicine_key = db.Column(db.String(100), nullable=False)  # lowercased medicine name
+    line_num = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())  # also set for COPY
+
+    stock = db.Column(db.Integer)
+    price = db.Column(db.Float)
+    expiry_date = db.Column(db.Date)
+
+class IngestJob(db.Model):
+    """
+    A queued inventory CSV upload. The file waits in INGEST_JOB_DIR until a
+    worker from app.utils.ingest_jobs claims the job; at most one job per
+    pharmacy runs at a time. In `replace` mode the file is the pharmacy's
+    whole inventory, in `add` mode its stock is added to the batches.
+    """
+    __tablename__ = 'ingest_jobs'
+    __table_args__ = (
+        db.Index('ix_ingest_jobs_status_created', 'status', 'created_at'),
+        db.Index('ix_ingest_jobs_pharmacy_status', 'pharmacy_id', 'status'),
+        db.Index('ix_ingest_jobs_status_finished', 'status', 'finished_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    pharmacy_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, succeeded, failed
+    mode = db.Column(db.String(16), nullable=False, default='replace', server_default='replace')  # replace, or add to stock
+    filename = db.Column(db.String(255))
+    file_path = db.Column(db.String(500), nullable=False)
+    total_rows = db.Column(db.Integer)  # line count of the file less the header, known at enqueue
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text)  # JSON list of per-line errors
+    result = db.Column(db.Text)  # JSON: change counts, ingestion stats and touched medicine ids
+    worker = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)  # progress heartbeat while running
+    finished_at = db.Column(db.DateTime)
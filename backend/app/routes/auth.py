@@ -1,14 +1,19 @@
-from flask import request, jsonify, Blueprint
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
+import hmac
+import os
+
+from flask import request, jsonify, Blueprint, current_app
+from flask_jwt_extended import jwt_required, create_access_token, current_user
 from app import db
 from app.models import User
+from app.utils.auth_utils import token_claims, user_cache
 from app.utils.geocode_utils import geocode_address
-from geopy.geocoders import Nominatim
+from app.utils.pharmacy_onboarding import compose_address, onboard_pharmacies
+from app.utils.spatial_index import add_pharmacy, remove_pharmacy
+from app.utils.search_cache import invalidate_pharmacy
 from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
 
 auth_bp = Blueprint('auth', __name__)
-geolocator = Nominatim(user_agent="medilocate")
 
 @auth_bp.route('/api/register', methods=['POST'])
 def register():
@@ -26,15 +31,14 @@ def register():
     country = data.get('country')
     
     # Combine into a single address string for geocoding
-    address = f"{address_line}, {city}, {state}, {postal_code}, {country}"
+    address = compose_address(address_line, city, state, postal_code, country)
 
     if not all([name, email, password, address_line, city, state, postal_code, country]):
         return jsonify({'error': 'All fields are required'}), 400
 
     try:
-        geolocator = Nominatim(user_agent="medilocate")
-        location = geolocator.geocode(address)
-        if not location:
+        latitude, longitude = geocode_address(address)
+        if latitude is None:
             return jsonify({'error': 'Invalid address, could not geocode'}), 400
 
         hashed_password = generate_password_hash(password)
@@ -44,12 +48,17 @@ def register():
             password=hashed_password,
             is_pharmacy=is_pharmacy,
             address=address,
-            latitude=location.latitude,
-            longitude=location.longitude
+            latitude=latitude,
+            longitude=longitude
         )
         db.session.add(new_user)
         db.session.commit()
 
+        if new_user.is_pharmacy:
+            add_pharmacy(new_user.id, new_user.latitude, new_user.longitude)
+            # A new node can shorten routes through the pharmacy graph
+            invalidate_pharmacy(new_user.id, new_user.latitude, new_user.longitude)
+
         return jsonify({'message': 'User registered successfully'}), 201
 
     except IntegrityError:
@@ -57,6 +66,45 @@ def register():
         return jsonify({'error': 'Email already registered'}), 409
     except Exception as e:
         return jsonify({'error': 'Registration failed', 'details': str(e)}), 500
+
+
+@auth_bp.route('/api/pharmacies/bulk', methods=['POST'])
+def register_pharmacies():
+    # Onboarding a chain is an operator task: it needs the configured key
+    expected = current_app.config.get('ONBOARDING_API_KEY')
+    if not expected:
+        return jsonify({'error': 'Bulk onboarding is disabled'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Onboarding-Key', ''), expected):
+        return jsonify({'error': 'Invalid onboarding key'}), 403
+
+    file = request.files.get('file')
+    if file is None or not file.filename.endswith('.csv'):
+        return jsonify({'error': 'Please upload a CSV file.'}), 400
+    dry_run = request.form.get('dry_run', 'false').lower() in ('1', 'true', 'yes')
+
+    try:
+        result = onboard_pharmacies(
+            file.stream,
+            default_password=request.form.get('default_password'),
+            dry_run=dry_run,
+            chunk_size=current_app.config['ONBOARDING_CHUNK_SIZE'],
+            max_rows=current_app.config['ONBOARDING_MAX_ROWS'],
+        )
+    except UnicodeDecodeError as e:
+        return jsonify({'error': f"File is not valid UTF-8: {e}"}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Bulk registration failed', 'details': str(e)}), 500
+
+    status = 200 if dry_run else 201 if result.created else 400
+    return jsonify({
+        'message': f"{'Validated' if dry_run else 'Registered'} {len(result.created)} of {result.rows} pharmacies.",
+        'created': result.created,
+        'failures': result.failures,
+        'stats': result.stats(),
+    }), status
     
 
 @auth_bp.route('/login', methods=['POST'])
@@ -68,7 +116,7 @@ def login():
     user = User.query.filter_by(email=email).first()
 
     if user and check_password_hash(user.password, password):
-        access_token = create_access_token(identity=user.email)
+        access_token = create_access_token(identity=user.email, additional_claims=token_claims(user))
         return jsonify(access_token=access_token, user=user.to_dict()), 200
     
     return jsonify({"error": "Invalid credentials"}), 401
@@ -77,8 +125,7 @@ def login():
 @auth_bp.route('/api/profile', methods=['GET'])
 @jwt_required()
 def profile():
-    current_user_email = get_jwt_identity()
-    user = User.query.filter_by(email=current_user_email).first()
+    user = db.session.get(User, current_user.id)
 
     if not user:
         return jsonify({"error": "User not found"}), 404
@@ -88,15 +135,27 @@ def profile():
 @auth_bp.route('/api/profile', methods=['DELETE'])
 @jwt_required()
 def delete_account():
-    current_user_email = get_jwt_identity()
-    user = User.query.filter_by(email=current_user_email).first()
+    user = db.session.get(User, current_user.id)
 
     if not user:
         return jsonify({"error": "User not found"}), 404
         
     try:
+        user_id = user.id
+        is_pharmacy, location = user.is_pharmacy, (user.latitude, user.longitude)
+        # Uploads still waiting for a worker go with the account
+        spooled = [job.file_path for job in user.ingest_jobs if job.status == 'queued']
         db.session.delete(user)
         db.session.commit()
+        for path in spooled:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        user_cache.invalidate(user_id)
+        if is_pharmacy:
+            invalidate_pharmacy(user_id, *location)
+        remove_pharmacy(user_id)
         return jsonify({"message": "Account deleted successfully"}), 200
     except Exception as e:
         db.session.rollback()
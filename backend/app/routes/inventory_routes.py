@@ -1,23 +1,23 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
-from app.models import Inventory, User, Medicine
-import csv
-from io import StringIO
-from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app, url_for
+from flask_jwt_extended import current_user
+from app.models import IngestJob
+from app.utils.auth_utils import pharmacy_required
+from app.utils.ingest_jobs import enqueue_upload, job_status, start_ingest_workers
 
 inventory_bp = Blueprint('inventory', __name__)
 
+# ⚙️ On app start, begin taking ingestion jobs (including ones queued before a restart)
+@inventory_bp.before_app_first_request
+def start_ingestion_workers():
+    try:
+        start_ingest_workers()
+    except Exception as e:
+        print("❌ Error starting ingestion workers:", e)
+
 @inventory_bp.route('/api/inventory/upload', methods=['POST'])
-@jwt_required()
+@pharmacy_required
 def upload_inventory():
-    current_user_email = get_jwt_identity()
-    user = User.query.filter_by(email=current_user_email).first()
-
-    if not user or not user.is_pharmacy:
-        return jsonify({'error': 'Pharmacy access required'}), 403
-
-    pharmacy_id = user.id
+    pharmacy_id = current_user.id
 
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'}), 400
@@ -26,85 +26,39 @@ def upload_inventory():
     if not file.filename.endswith('.csv'):
         return jsonify({'error': 'Invalid file format. Please upload a CSV file.'}), 400
 
-    stream = StringIO(file.stream.read().decode("UTF8"), newline=None)
-    
-    # Use a two-pass approach to handle new medicines
-    # Pass 1: Discover all medicines and create new ones if they don't exist.
-    
-    # Cache existing medicines for quick lookup
-    medicine_catalog = {m.name.lower(): m for m in Medicine.query.all()}
-    new_medicines_to_add = {}
-    
-    # Rewind stream to read again for the first pass
-    stream.seek(0)
-    csv_for_pass1 = csv.DictReader(stream)
-
-    rows_from_csv = list(csv_for_pass1) # Read all rows into memory
-
-    for row in rows_from_csv:
-        medicine_name = row.get('name')
-        if not medicine_name:
-            continue
-        
-        medicine_name_lower = medicine_name.lower()
-
-        if medicine_name_lower not in medicine_catalog and medicine_name_lower not in new_medicines_to_add:
-            new_medicines_to_add[medicine_name_lower] = Medicine(
-                name=medicine_name,
-                manufacturer=row.get('manufacturer'),
-                description=row.get('description')
-            )
-
-    if new_medicines_to_add:
-        db.session.add_all(new_medicines_to_add.values())
-        db.session.flush() # Flush to get IDs for new medicines
-        # Update catalog with the newly added medicines
-        for med in new_medicines_to_add.values():
-            medicine_catalog[med.name.lower()] = med
-
-    # Pass 2: Create inventory items
-    Inventory.query.filter_by(pharmacy_id=pharmacy_id).delete()
-    errors = []
-    new_inventory_items = []
-
-    for i, row in enumerate(rows_from_csv):
-        line_num = i + 2  # Header is line 1
-        try:
-            medicine_name = row['name']
-            medicine = medicine_catalog.get(medicine_name.lower())
-
-            if not medicine:
-                # This should theoretically not happen due to the first pass
-                errors.append(f"Line {line_num}: Could not find or create medicine '{medicine_name}'.")
-                continue
-
-            inventory_item = Inventory(
-                pharmacy_id=pharmacy_id,
-                medicine_id=medicine.id,
-                name=medicine.name,
-                manufacturer=row.get('manufacturer', medicine.manufacturer),
-                description=row.get('description', medicine.description),
-                stock=int(row['stock']),
-                price=float(row['price']),
-                expiry_date=datetime.strptime(row['expiry_date'], '%Y-%m-%d').date()
-            )
-            new_inventory_items.append(inventory_item)
-
-        except KeyError as e:
-            errors.append(f"Line {line_num}: Missing required column: {e}")
-        except ValueError as e:
-            errors.append(f"Line {line_num}: Invalid data format. Check numbers and dates. Details: {e}")
-        except Exception as e:
-            errors.append(f"Line {line_num}: An unexpected error occurred: {e}")
-    
-    if errors:
-        db.session.rollback()
-        return jsonify({'error': 'Upload failed with errors', 'details': errors}), 400
-
     try:
-        db.session.add_all(new_inventory_items)
-        db.session.commit()
-        return jsonify({'message': f'Successfully uploaded {len(new_inventory_items)} inventory items.'}), 201
+        job = enqueue_upload(pharmacy_id, file, current_app.config['INGEST_JOB_DIR'])
     except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': 'Failed to save inventory to database', 'details': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': 'Failed to queue inventory upload', 'details': str(e)}), 500
+
+    status_url = url_for('inventory.ingest_job_status', job_id=job.id)
+    response = jsonify({
+        'message': 'Upload queued for processing.',
+        'job_id': job.id,
+        'status': job.status,
+        'total_rows': job.total_rows,
+        'status_url': status_url,
+    })
+    response.headers['Location'] = status_url
+    return response, 202
+
+@inventory_bp.route('/api/inventory/jobs', methods=['GET'])
+@pharmacy_required
+def list_ingest_jobs():
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    jobs = (
+        IngestJob.query
+        .filter_by(pharmacy_id=current_user.id)
+        .order_by(IngestJob.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+    return jsonify({'jobs': [job_status(job) for job in jobs]})
+
+@inventory_bp.route('/api/inventory/jobs/<job_id>', methods=['GET'])
+@pharmacy_required
+def ingest_job_status(job_id):
+    job = IngestJob.query.filter_by(id=job_id, pharmacy_id=current_user.id).first()
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status(job))
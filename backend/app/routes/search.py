@@ -1,34 +1,176 @@
 # app/routes/search.py
 
-from flask import Blueprint, request, jsonify
-from app.models import User, Inventory, Medicine
-from app import db
-from geopy.geocoders import Nominatim
-from math import radians, cos, sin, asin, sqrt
-from app.utils.graph_interface import find_shortest_path  # ✅ Dijkstra wrapper
+import time
+
+from flask import Blueprint, request, jsonify, current_app
+from app.utils import read_queries
+from app.utils.read_queries import pharmacy_card
+from app.utils.routing_graph import routing_graph, USER_NODE  # ✅ Dijkstra over the sparse pharmacy graph
+from app.utils.graph_interface import solve_tour
+from app.utils.spatial_index import pharmacy_index, build_pharmacy_index
+from app.utils.geocode_utils import geocode_address
+from app.utils.ngram_index import medicine_name_index
+from app.utils.catalog_sync import load_trie, load_medicine_name_index, ensure_medicine_name_index
+from app.utils.availability import refresh_expired
+from app.utils.search_cache import search_cache, normalize_query
+from app.utils.prescription import plan_prescription
+from app.utils.road_network import get_road_network
 
 
 # Import the Trie builder and search function
-from app.utils.trie_interface import build_trie, search_medicine_prefix
+from app.utils.trie_interface import search_medicine_prefix, search_medicine_fuzzy
 
 search_bp = Blueprint('search', __name__)
-geolocator = Nominatim(user_agent="medilocate")
 
-# 🌟 On app start, preload all medicine names into the Trie
+# 🌟 On app start, load the Trie (from its snapshot file when fresh)
 @search_bp.before_app_first_request
 def preload_trie():
     try:
-        med_names = db.session.query(Medicine.name).distinct().all()
-        build_trie([m[0] for m in med_names])  # m[0] extracts the string
-        print("✅ Trie preloaded with medicine names.")
+        source = load_trie()
+        print(f"✅ Trie preloaded with medicine names from {source}.")
     except Exception as e:
         print("❌ Error loading Trie:", e)
 
+# 🗺️ On app start, index every pharmacy location
+@search_bp.before_app_first_request
+def preload_pharmacy_index():
+    try:
+        load_pharmacy_index()
+        print(f"✅ Spatial index loaded with {len(pharmacy_index)} pharmacies.")
+    except Exception as e:
+        print("❌ Error loading spatial index:", e)
+
+
+def load_pharmacy_index():
+    build_pharmacy_index(read_queries.pharmacy_locations())
+
+
+def ensure_pharmacy_index():
+    """
+    Registrations handled by other worker processes never reach this
+    process's index, so rebuild it from the database once it gets too old.
+    """
+    max_age = current_app.config.get('PHARMACY_INDEX_MAX_AGE')
+    built_at = pharmacy_index.built_at
+    if built_at is None or (max_age is not None and time.time() - built_at > max_age):
+        load_pharmacy_index()
+
+
+# 🔤 On app start, index medicine names by trigram
+@search_bp.before_app_first_request
+def preload_medicine_name_index():
+    try:
+        load_medicine_name_index()
+        print(f"✅ Name index loaded with {len(medicine_name_index)} medicines.")
+    except Exception as e:
+        print("❌ Error loading name index:", e)
+
+
+def resolve_medicine_ids(medicine_name):
+    """
+    Ids of every medicine whose name contains `medicine_name` (case-insensitive).
+    When none does, falls back to the catalog names closest to it by edit
+    distance. Returns (ids, corrected names or None).
+    """
+    ensure_medicine_name_index()
+    medicine_ids = list(medicine_name_index.search(medicine_name))
+    if medicine_ids:
+        return medicine_ids, None
+
+    corrected = closest_medicine_names(medicine_name)
+    if not corrected:
+        return [], None
+    medicine_ids = read_queries.medicine_ids_named(corrected)
+    return medicine_ids, corrected
+
+
+def closest_medicine_names(query):
+    """
+    The catalog names fewest typos away from `query` (all tied at that
+    distance, best ranked first), or [] for short or unmatched queries.
+    """
+    config = current_app.config
+    if len(query.strip()) < config['FUZZY_MIN_QUERY_LENGTH']:
+        return []
+    matches = search_medicine_fuzzy(query, config['FUZZY_MAX_SUGGESTIONS'])
+    return [name for distance, name in matches if distance == matches[0][0]]
+
+
+def parse_search_limits(data, default_limit=None):
+    """
+    Read the optional `radius_km` and `limit` search parameters.
+    Raises ValueError with a client-facing message on bad input.
+    """
+    radius_km = data.get('radius_km')
+    if radius_km is not None:
+        try:
+            radius_km = float(radius_km)
+        except (TypeError, ValueError):
+            raise ValueError("radius_km must be a number")
+        if radius_km <= 0:
+            raise ValueError("radius_km must be positive")
+
+    limit = data.get('limit', default_limit or current_app.config['SEARCH_DEFAULT_LIMIT'])
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+
+    return radius_km, min(limit, current_app.config['SEARCH_MAX_LIMIT'])
+
+
+def query_availability(pharmacy_ids, medicine_ids):
+    """
+    Summary rows (with medicine and pharmacy names) for the given pharmacies
+    and medicines. Rows whose earliest expiry has passed since they were
+    computed are refreshed first.
+    """
+    rows = read_queries.availability_rows(pharmacy_ids, medicine_ids)
+    if refresh_expired(rows):
+        rows = read_queries.availability_rows(pharmacy_ids, medicine_ids)
+    return rows
+
+
+def iter_candidate_batches(lat, lon, radius_km, batch_size):
+    """
+    Group the pharmacies around (lat, lon), nearest first, into batches of
+    `batch_size` {pharmacy_id: distance_km} dicts. A radius is served by
+    one batched distance scan; otherwise the k-d tree is walked lazily.
+    """
+    if radius_km is not None:
+        ranked = pharmacy_index.within_radius(lat, lon, radius_km)
+    else:
+        ranked = pharmacy_index.iter_nearest(lat, lon)
+
+    batch = {}
+    for distance, pharmacy_id in ranked:
+        batch[pharmacy_id] = distance
+        if len(batch) >= batch_size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
 # 🔍 GET: Auto-suggest using Trie
 @search_bp.route('/api/search_by_prefix', methods=['GET'])
 def search_by_prefix():
     prefix = request.args.get('prefix', '')
-    results = search_medicine_prefix(prefix)
+    try:
+        limit = int(request.args.get('limit', current_app.config['AUTOCOMPLETE_DEFAULT_LIMIT']))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit <= 0:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    limit = min(limit, current_app.config['AUTOCOMPLETE_MAX_LIMIT'])
+    ensure_medicine_name_index()
+    results = search_medicine_prefix(prefix, limit)
+    if not results and len(prefix.strip()) >= current_app.config['FUZZY_MIN_QUERY_LENGTH']:
+        # Nothing starts with the prefix: suggest names starting with something close to it
+        results = [name for _, name in search_medicine_fuzzy(prefix, limit, prefix=True)]
+        return jsonify({'results': results, 'fuzzy': True})
     return jsonify({'results': results})
 
 # 📍 POST: Find nearest pharmacies with medicine
@@ -42,96 +184,79 @@ def search_medicine():
         return jsonify({"error": "Address and medicine_name are required"}), 400
 
     try:
-        location = geolocator.geocode(address)
-        if not location:
+        radius_km, limit = parse_search_limits(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        user_lat, user_lon = geocode_address(address)
+        if user_lat is None:
             return jsonify({"error": "Invalid address"}), 400
 
-        user_lat = location.latitude
-        user_lon = location.longitude
+        # Searches from the same ~150 m cell share one cached response
+        cell, user_lat, user_lon = search_cache.locate(user_lat, user_lon)
+        cache_key = ('search_medicine', normalize_query(medicine_name), cell, radius_km, limit)
+        if cell is not None:
+            cached = search_cache.get(cache_key)
+            if cached is not None:
+                return jsonify(cached), 200
+
+        medicine_ids, corrected = resolve_medicine_ids(medicine_name)
+        if not medicine_ids:
+            # Any upload may bring the first matching medicine
+            search_cache.set(cache_key, {"results": []}, user_lat, user_lon, float('inf'))
+            return jsonify({"results": []}), 200
+
+        ensure_pharmacy_index()
+        batch_size = current_app.config['SEARCH_CANDIDATE_BATCH']
+        results = []
+        # How far out pharmacies were examined: only changes within it can
+        # alter this response
+        frontier = radius_km if radius_km is not None else float('inf')
 
-        inventory_items = (
-            db.session.query(Inventory, User)
-            .join(User, User.id == Inventory.pharmacy_id)
-            .filter(User.is_pharmacy == True)
-            .filter(Inventory.name.ilike(f"%{medicine_name}%"))
-            .all()
-        )
+        # Walk outwards from the user one batch of pharmacies at a time and
+        # stop as soon as enough of them stock the medicine.
+        for candidates in iter_candidate_batches(user_lat, user_lon, radius_km, batch_size):
+            pharmacies_found = {}
 
-        pharmacies_found = {}
+            for summary in query_availability(candidates, medicine_ids):
+                pharmacy_id = summary.pharmacy_id
 
-        for item, pharmacy_user in inventory_items:
-            pharmacy_id = item.pharmacy_id
-            
-            if pharmacy_id not in pharmacies_found:
-                if pharmacy_user.latitude is not None and pharmacy_user.longitude is not None:
-                    distance = calculate_distance(user_lat, user_lon, pharmacy_user.latitude, pharmacy_user.longitude)
+                if pharmacy_id not in pharmacies_found:
                     pharmacies_found[pharmacy_id] = {
                         "details": {
-                            "pharmacy_name": pharmacy_user.name,
-                            "pharmacy_address": pharmacy_user.address,
-                            "distance_km": round(distance, 2)
+                            "pharmacy_name": summary.pharmacy_name,
+                            "pharmacy_address": summary.pharmacy_address,
+                            "distance_km": round(candidates[pharmacy_id], 2)
                         },
-                        "medicines": {}
-                    }
-            
-            if pharmacy_id in pharmacies_found:
-                med_name = item.name
-                if med_name not in pharmacies_found[pharmacy_id]['medicines']:
-                    pharmacies_found[pharmacy_id]['medicines'][med_name] = {
-                        'total_stock': 0,
-                        'batches': []
+                        "medicines": []
                     }
-                
-                pharmacies_found[pharmacy_id]['medicines'][med_name]['total_stock'] += item.stock
-                pharmacies_found[pharmacy_id]['medicines'][med_name]['batches'].append({
-                    "price": item.price,
-                    "expiry_date": item.expiry_date.strftime('%Y-%m-%d'),
-                })
 
-        results = []
-        for pharmacy_id, data in pharmacies_found.items():
-            medicines_list = []
-            if not data['medicines']:
-                continue
-
-            for name, med_data in data['medicines'].items():
-                if not med_data['batches']:
-                    continue
-                
-                min_price = min(b['price'] for b in med_data['batches'])
-                earliest_expiry = min(b['expiry_date'] for b in med_data['batches'])
-
-                medicines_list.append({
-                    "medicine_name": name,
-                    "stock": med_data['total_stock'],
-                    "price": min_price,
-                    "expiry_date": earliest_expiry,
+                pharmacies_found[pharmacy_id]['medicines'].append({
+                    "medicine_name": summary.medicine_name,
+                    "stock": summary.total_stock,
+                    "price": summary.min_price,
+                    "expiry_date": summary.earliest_expiry.isoformat() if summary.earliest_expiry else None,
                 })
 
-            results.append({
-                "details": data['details'],
-                "medicines": medicines_list
-            })
+            results.extend(pharmacies_found.values())
+            if len(results) >= limit:
+                frontier = max(candidates.values())
+                break
 
-        sorted_results = sorted(results, key=lambda p: p['details']['distance_km'])
+        # Batches arrive nearest first, so sorting only reorders within a batch
+        sorted_results = sorted(results, key=lambda p: p['details']['distance_km'])[:limit]
 
-        return jsonify({"results": sorted_results}), 200
+        response = {"results": sorted_results}
+        if corrected:
+            response["did_you_mean"] = corrected
+        search_cache.set(cache_key, response, user_lat, user_lon, frontier)
+        return jsonify(response), 200
 
     except Exception as e:
         print("Search Error:", str(e))
         return jsonify({"error": "Something went wrong during search"}), 500
 
-
-# 🧮 Helper: Haversine Distance Formula
-def calculate_distance(lat1, lon1, lat2, lon2):
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
-    c = 2 * asin(sqrt(a))
-    km = 6371 * c
-    return km
-
 @search_bp.route('/api/find_nearest_path', methods=['POST'])
 def find_nearest_path():
     data = request.get_json()
@@ -142,83 +267,294 @@ def find_nearest_path():
         return jsonify({"error": "Address and medicine_name are required"}), 400
 
     # Geocode user address
-    location = geolocator.geocode(address)
-    if not location:
+    user_lat, user_lon = geocode_address(address)
+    if user_lat is None:
         return jsonify({"error": "Invalid address"}), 400
 
-    user_lat = location.latitude
-    user_lon = location.longitude
+    cell, user_lat, user_lon = search_cache.locate(user_lat, user_lon)
+    cache_key = ('find_nearest_path', normalize_query(medicine_name), cell)
+    if cell is not None:
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
 
     # Fetch pharmacies with the medicine
-    inventory_data = (
-        db.session.query(User.id, User.name, User.latitude, User.longitude, Inventory.name, Inventory.stock)
-        .join(Inventory, Inventory.pharmacy_id == User.id)
-        .filter(User.is_pharmacy == True)
-        .filter(Inventory.name.ilike(f"%{medicine_name}%"))
-        .filter(User.latitude.isnot(None), User.longitude.isnot(None))
-        .all()
-    )
+    medicine_ids, corrected = resolve_medicine_ids(medicine_name)
+    if not medicine_ids:
+        return jsonify({"error": "No pharmacies found with this medicine"}), 404
+
+    target_ids = read_queries.pharmacies_stocking(medicine_ids)
 
-    if not inventory_data:
+    if not target_ids:
         return jsonify({"error": "No pharmacies found with this medicine"}), 404
 
-    # Build graph with Haversine distance
-    nodes = {
-        str(pharmacy.id): (pharmacy.latitude, pharmacy.longitude)
-        for pharmacy in db.session.query(User).filter(User.is_pharmacy==True).all()
-        if pharmacy.latitude and pharmacy.longitude
-    }
+    # One multi-target Dijkstra run over the persistent sparse graph
+    ensure_pharmacy_index()
+    route = routing_graph.route_to_nearest(user_lat, user_lon, target_ids)
 
-    graph = {}
-
-    def haversine(lat1, lon1, lat2, lon2):
-        from math import radians, sin, cos, sqrt, atan2
-        R = 6371
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        return R * c
-
-    for id1, (lat1, lon1) in nodes.items():
-        graph[id1] = []
-        for id2, (lat2, lon2) in nodes.items():
-            if id1 != id2:
-                graph[id1].append((id2, haversine(lat1, lon1, lat2, lon2)))
-
-    # Add user node
-    user_node = "USER"
-    graph[user_node] = []
-    for pid, (plat, plon) in nodes.items():
-        distance = haversine(user_lat, user_lon, plat, plon)
-        graph[user_node].append((pid, distance))
-
-    # Try Dijkstra to each matching pharmacy
-    targets = [str(pharmacy.id) for pharmacy in inventory_data]
-    shortest_path = None
-    shortest_len = float("inf")
-    final_target = None
-
-    for target in targets:
-        path = find_shortest_path(graph, user_node, target)
-        if path and len(path) < shortest_len:
-            shortest_path = path
-            shortest_len = len(path)
-            final_target = target
-
-    if not shortest_path:
+    if not route:
         return jsonify({"error": "No reachable pharmacy found"}), 404
 
-    pharmacy = db.session.query(User).filter_by(id=int(final_target)).first()
+    final_target, distance, shortest_path = route
+    pharmacy = read_queries.pharmacy_cards([final_target])[final_target]
 
-    return jsonify({
+    response = {
         "path": shortest_path,
-        "nearest_pharmacy": {
-            "id": pharmacy.id,
-            "name": pharmacy.name,
-            "address": pharmacy.address,
-            "latitude": pharmacy.latitude,
-            "longitude": pharmacy.longitude
+        "distance_km": round(distance, 2),
+        "nearest_pharmacy": pharmacy_card(pharmacy)
     }
+    if corrected:
+        response["did_you_mean"] = corrected
+    road = get_road_network()
+    if road is not None:
+        # Travel distance, time and geometry along the streets, when both
+        # ends lie on the loaded road network
+        response["road_route"] = format_road_route(
+            road.route(user_lat, user_lon, pharmacy.latitude, pharmacy.longitude)
+        )
+    # A route of length d never leaves the d-radius around the user, so
+    # pharmacies further out can't change it
+    search_cache.set(cache_key, response, user_lat, user_lon, distance)
+    return jsonify(response)
+
+
+def format_road_route(route):
+    if route is None:
+        return None
+    return {
+        "distance_km": round(route["distance_km"], 2),
+        "duration_min": round(route["duration_min"], 1),
+        "geometry": route["geometry"],
+    }
+
+
+# 🛣️ POST: Travel distance and time to one pharmacy along the road network
+@search_bp.route('/api/road_route', methods=['POST'])
+def road_route():
+    data = request.get_json() or {}
+    address = data.get('address')
+    pharmacy_id = data.get('pharmacy_id')
+    metric = data.get('metric', 'distance')
+
+    if not address or pharmacy_id is None:
+        return jsonify({"error": "Address and pharmacy_id are required"}), 400
+    if metric not in ('distance', 'time'):
+        return jsonify({"error": "metric must be 'distance' or 'time'"}), 400
+
+    road = get_road_network()
+    if road is None:
+        return jsonify({"error": "Road network is not loaded"}), 503
+
+    try:
+        pharmacy = read_queries.pharmacy_cards([int(pharmacy_id)]).get(int(pharmacy_id))
+    except (TypeError, ValueError):
+        return jsonify({"error": "pharmacy_id must be an integer"}), 400
+    if pharmacy is None or pharmacy.latitude is None:
+        return jsonify({"error": "Pharmacy not found"}), 404
+
+    user_lat, user_lon = geocode_address(address)
+    if user_lat is None:
+        return jsonify({"error": "Invalid address"}), 400
+
+    route = road.route(user_lat, user_lon, pharmacy.latitude, pharmacy.longitude, by_time=(metric == 'time'))
+    if route is None:
+        return jsonify({"error": "No road route between the address and the pharmacy"}), 404
+
+    return jsonify({
+        "pharmacy": pharmacy_card(pharmacy),
+        "metric": metric,
+        **format_road_route(route),
+    })
+
+
+def collect_prescription_options(lat, lon, radius_km, item_ids, max_candidates):
+    """
+    Walk outwards from (lat, lon) until `max_candidates` pharmacies stocking
+    at least one prescription item are found. Only medicines in stock with
+    an unexpired batch count. Returns the planner's options and, per
+    pharmacy, its details plus the summary row used for each item.
+    """
+    found = {}
+    batch_size = current_app.config['SEARCH_CANDIDATE_BATCH']
+    for candidates in iter_candidate_batches(lat, lon, radius_km, batch_size):
+        for summary in query_availability(candidates, list(item_ids)):
+            if not summary.total_stock or summary.total_stock <= 0 or summary.earliest_expiry is None:
+                continue
+            pharmacy = found.setdefault(summary.pharmacy_id, {
+                "details": {
+                    "pharmacy_name": summary.pharmacy_name,
+                    "pharmacy_address": summary.pharmacy_address,
+                    "distance_km": round(candidates[summary.pharmacy_id], 2)
+                },
+                "distance": candidates[summary.pharmacy_id],
+                "items": {},
+            })
+            price = summary.min_price or 0.0
+            for item in item_ids[summary.medicine_id]:
+                current = pharmacy['items'].get(item)
+                if current is None or price < (current.min_price or 0.0):
+                    pharmacy['items'][item] = summary
+        if len(found) >= max_candidates:
+            break
+
+    nearest = sorted(found.items(), key=lambda entry: entry[1]['distance'])[:max_candidates]
+    options = [
+        (pharmacy_id, pharmacy['distance'], {item: row.min_price or 0.0 for item, row in pharmacy['items'].items()})
+        for pharmacy_id, pharmacy in nearest
+    ]
+    return options, dict(nearest)
+
+
+# 💊 POST: Cover a whole prescription with the fewest, nearest pharmacies
+@search_bp.route('/api/search_prescription', methods=['POST'])
+def search_prescription():
+    data = request.get_json() or {}
+    address = data.get('address')
+    medicines = data.get('medicines')
+    config = current_app.config
+
+    if not address or not isinstance(medicines, list):
+        return jsonify({"error": "Address and a medicines list are required"}), 400
+
+    # One item per distinct medicine name, in the order given
+    names = list({normalize_query(name): str(name).strip() for name in medicines if str(name).strip()}.values())
+    if not names:
+        return jsonify({"error": "Address and a medicines list are required"}), 400
+    if len(names) > config['PRESCRIPTION_MAX_ITEMS']:
+        return jsonify({"error": f"At most {config['PRESCRIPTION_MAX_ITEMS']} medicines per prescription"}), 400
+
+    try:
+        radius_km, limit = parse_search_limits(data, config['PRESCRIPTION_DEFAULT_LIMIT'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        max_pharmacies = int(data.get('max_pharmacies', config['PRESCRIPTION_MAX_PHARMACIES']))
+    except (TypeError, ValueError):
+        return jsonify({"error": "max_pharmacies must be an integer"}), 400
+    if max_pharmacies <= 0:
+        return jsonify({"error": "max_pharmacies must be positive"}), 400
+    max_pharmacies = min(max_pharmacies, config['PRESCRIPTION_MAX_PHARMACIES'])
+
+    try:
+        user_lat, user_lon = geocode_address(address)
+        if user_lat is None:
+            return jsonify({"error": "Invalid address"}), 400
+
+        # Resolve every name in one pass over the name index
+        item_ids = {}   # medicine id -> prescription items it satisfies
+        corrections = {}
+        for item, name in enumerate(names):
+            medicine_ids, corrected = resolve_medicine_ids(name)
+            if corrected:
+                corrections[name] = corrected
+            for medicine_id in medicine_ids:
+                item_ids.setdefault(medicine_id, set()).add(item)
+        if not item_ids:
+            return jsonify({"plans": [], "unavailable": names}), 200
+
+        ensure_pharmacy_index()
+        options, pharmacies = collect_prescription_options(
+            user_lat, user_lon, radius_km, item_ids, config['PRESCRIPTION_CANDIDATES']
+        )
+        plans, unavailable = plan_prescription(
+            options, len(names),
+            max_pharmacies=max_pharmacies, limit=limit, km_cost=config['PRESCRIPTION_KM_COST'],
+        )
+
+        results = []
+        for plan in plans:
+            stops = []
+            for option in plan.chosen:
+                pharmacy = pharmacies[options[option][0]]
+                medicines_list = []
+                for item in sorted(i for i, chosen in plan.assignment.items() if chosen == option):
+                    summary = pharmacy['items'][item]
+                    medicines_list.append({
+                        "requested": names[item],
+                        "medicine_name": summary.medicine_name,
+                        "stock": summary.total_stock,
+                        "price": summary.min_price,
+                        "expiry_date": summary.earliest_expiry.isoformat(),
+                    })
+                stops.append({"details": pharmacy['details'], "medicines": medicines_list})
+            results.append({
+                "pharmacy_count": len(stops),
+                "total_distance_km": round(plan.total_distance, 2),
+                "total_price": round(plan.total_price, 2),
+                "score": round(plan.score, 2),
+                "pharmacies": stops,
+            })
+
+        response = {"plans": results, "unavailable": [names[item] for item in unavailable]}
+        if corrections:
+            response["did_you_mean"] = corrections
+        return jsonify(response), 200
+
+    except Exception as e:
+        print("Prescription Search Error:", str(e))
+        return jsonify({"error": "Something went wrong during search"}), 500
+
+
+# 🧭 POST: Best order to visit several pharmacies (e.g. a prescription plan)
+@search_bp.route('/api/plan_route', methods=['POST'])
+def plan_route():
+    data = request.get_json() or {}
+    address = data.get('address')
+    pharmacy_ids = data.get('pharmacy_ids')
+    return_to_start = bool(data.get('return_to_start', False))
+    config = current_app.config
+
+    if not address or not isinstance(pharmacy_ids, list) or not pharmacy_ids:
+        return jsonify({"error": "Address and a pharmacy_ids list are required"}), 400
+    try:
+        pharmacy_ids = list(dict.fromkeys(int(pharmacy_id) for pharmacy_id in pharmacy_ids))
+    except (TypeError, ValueError):
+        return jsonify({"error": "pharmacy_ids must be integers"}), 400
+    if len(pharmacy_ids) > config['ROUTE_MAX_STOPS']:
+        return jsonify({"error": f"At most {config['ROUTE_MAX_STOPS']} pharmacies per route"}), 400
+
+    user_lat, user_lon = geocode_address(address)
+    if user_lat is None:
+        return jsonify({"error": "Invalid address"}), 400
+
+    pharmacies = read_queries.pharmacy_cards(pharmacy_ids)
+    ensure_pharmacy_index()
+    unknown = [pharmacy_id for pharmacy_id in pharmacy_ids
+               if pharmacy_id not in pharmacies or pharmacy_id not in pharmacy_index]
+    if unknown:
+        return jsonify({"error": "Unknown pharmacies", "pharmacy_ids": unknown}), 404
+
+    matrix, paths = routing_graph.stop_matrix(user_lat, user_lon, pharmacy_ids)
+    order, total, solver = solve_tour(
+        matrix,
+        return_to_start=return_to_start,
+        exact_max_nodes=config['ROUTE_EXACT_MAX_NODES'],
+        time_budget_ms=config['ROUTE_TIME_BUDGET_MS'],
+    )
+
+    n = len(pharmacy_ids) + 1
+    labels = [USER_NODE] + [str(pharmacy_id) for pharmacy_id in pharmacy_ids]
+    hops = list(zip(order, order[1:] + ([0] if return_to_start else [])))
+    legs = [{
+        "from": labels[i],
+        "to": labels[j],
+        "distance_km": round(matrix[i * n + j], 2),
+        "path": paths[(i, j)],
+    } for i, j in hops]
+
+    stops = []
+    for i in order[1:]:
+        stops.append(pharmacy_card(pharmacies[pharmacy_ids[i - 1]]))
+
+    return jsonify({
+        "stops": stops,
+        "legs": legs,
+        "total_distance_km": round(total, 2),
+        "return_to_start": return_to_start,
+        "solver": solver,
     })
+
+
+@search_bp.route('/api/search_cache/stats', methods=['GET'])
+def search_cache_stats():
+    return jsonify(search_cache.stats())
@@ -0,0 +1,136 @@
+# app/utils/auth_utils.py
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify
+from flask_jwt_extended import jwt_required, current_user, get_jwt
+
+from app import db
+from app.models import User
+
+
+class AuthUser:
+    """
+    What authorization needs to know about the caller, without the full row.
+    """
+    __slots__ = ("id", "email", "is_pharmacy")
+
+    def __init__(self, id, email, is_pharmacy):
+        self.id = id
+        self.email = email
+        self.is_pharmacy = bool(is_pharmacy)
+
+
+class UserCache:
+    """
+    LRU + TTL cache of AuthUser by user id, so authenticated requests skip
+    the users table. Deleting an account drops its entry here; other
+    workers keep theirs until the TTL runs out.
+    """
+
+    def __init__(self, max_entries=4096, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # user id -> (AuthUser, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                return entry[0]
+            if entry is not None:
+                del self._entries[user_id]
+            return None
+
+    def set(self, user):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[user.id] = (user, time.time() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def token_claims(user):
+    """
+    Extra JWT claims issued at login: the id and role checks need, so
+    routes can authorize without looking the user up by email.
+    """
+    return {"user_id": user.id, "is_pharmacy": bool(user.is_pharmacy)}
+
+
+def load_user(identity, claims):
+    """
+    AuthUser for a verified token, or None if the account no longer exists.
+    Tokens issued before the claims existed are resolved by their email.
+    """
+    user_id = claims.get("user_id")
+    if user_id is not None:
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        query = db.session.query(User.id, User.email, User.is_pharmacy).filter(User.id == user_id)
+    else:
+        query = db.session.query(User.id, User.email, User.is_pharmacy).filter(User.email == identity)
+
+    row = query.first()
+    # A recycled id must not inherit another account's token
+    if row is None or row.email != identity:
+        return None
+    user = AuthUser(row.id, row.email, row.is_pharmacy)
+    user_cache.set(user)
+    return user
+
+
+def init_auth(app, jwt):
+    """
+    Apply the cache config and make `flask_jwt_extended.current_user`
+    resolve through `load_user`.
+    """
+    user_cache.max_entries = app.config.get("USER_CACHE_SIZE", 4096)
+    user_cache.ttl = app.config.get("USER_CACHE_TTL", 60)
+    user_cache.clear()
+
+    @jwt.user_lookup_loader
+    def _lookup(jwt_header, jwt_data):
+        return load_user(jwt_data["sub"], jwt_data)
+
+    @jwt.user_lookup_error_loader
+    def _lookup_error(jwt_header, jwt_data):
+        return jsonify({"error": "User not found"}), 404
+
+
+def pharmacy_required(fn):
+    """
+    `jwt_required()` plus a 403 unless the caller is a pharmacy account.
+    The role is fixed at registration, so the token's `is_pharmacy` claim
+    decides; tokens issued before the claim existed use the account row.
+    """
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        is_pharmacy = get_jwt().get("is_pharmacy")
+        if is_pharmacy is None:
+            is_pharmacy = current_user.is_pharmacy
+        if not is_pharmacy:
+            return jsonify({"error": "Pharmacy access required"}), 403
+        return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,80 @@
+# app/utils/availability.py
+
+from datetime import date
+
+from sqlalchemy import select, func, case, literal, tuple_
+
+from app import db
+from app.models import Inventory, MedicineAvailability
+
+SUMMARY_COLUMNS = (
+    'pharmacy_id', 'medicine_id', 'total_stock', 'min_price',
+    'earliest_expiry', 'batch_count', 'refreshed_on',
+)
+
+
+def _summary_select(today):
+    inventory = Inventory.__table__
+    return (
+        select(
+            inventory.c.pharmacy_id,
+            inventory.c.medicine_id,
+            func.coalesce(func.sum(inventory.c.stock), 0),
+            func.min(inventory.c.price),
+            func.min(case((inventory.c.expiry_date >= today, inventory.c.expiry_date))),
+            func.count(inventory.c.id),
+            literal(today, db.Date),
+        )
+        .group_by(inventory.c.pharmacy_id, inventory.c.medicine_id)
+    )
+
+
+def rebuild_availability():
+    """
+    Recompute the whole summary table from the inventory.
+    """
+    summary = MedicineAvailability.__table__
+    db.session.execute(summary.delete())
+    db.session.execute(summary.insert().from_select(SUMMARY_COLUMNS, _summary_select(date.today())))
+    db.session.commit()
+
+
+def refresh_availability(pairs, commit=True):
+    """
+    Recompute the summary rows for an iterable of (pharmacy_id, medicine_id)
+    pairs, in the database with one DELETE and one INSERT ... SELECT per
+    chunk. Pairs left without batches lose their row. With commit=False the
+    rows are written in the caller's transaction (inventory uploads).
+    """
+    pairs = list(set(pairs))
+    if not pairs:
+        return
+    inventory = Inventory.__table__
+    summary = MedicineAvailability.__table__
+    today = date.today()
+    for i in range(0, len(pairs), 500):
+        chunk = pairs[i:i + 500]
+        db.session.execute(
+            summary.delete().where(tuple_(summary.c.pharmacy_id, summary.c.medicine_id).in_(chunk))
+        )
+        db.session.execute(summary.insert().from_select(
+            SUMMARY_COLUMNS,
+            _summary_select(today).where(tuple_(inventory.c.pharmacy_id, inventory.c.medicine_id).in_(chunk)),
+        ))
+    if commit:
+        db.session.commit()
+
+
+def refresh_expired(rows):
+    """
+    A row's earliest expiry can pass without any upload touching it. Given
+    summary rows about to be served, refresh those whose earliest expiry is
+    now in the past and return the pairs that were refreshed.
+    """
+    today = date.today()
+    stale = {
+        (row.pharmacy_id, row.medicine_id) for row in rows
+        if row.earliest_expiry is not None and row.earliest_expiry < today
+    }
+    refresh_availability(stale)
+    return stale
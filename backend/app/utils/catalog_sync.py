@@ -0,0 +1,141 @@
+# app/utils/catalog_sync.py
+
+import os
+import time
+
+from flask import current_app
+from sqlalchemy import func, distinct
+
+from app import db
+from app.models import Medicine, Inventory
+from app.utils import trie_interface
+from app.utils.inventory_ingest import register_inventory_listener
+from app.utils.ngram_index import medicine_name_index
+
+
+def medicine_weights(names=None):
+    """
+    (name, weight) pairs for autocomplete ranking, where the weight is the
+    number of pharmacies stocking the medicine. Limited to `names` if given.
+    """
+    query = (
+        db.session.query(Medicine.name, func.count(distinct(Inventory.pharmacy_id)))
+        .outerjoin(Inventory, Inventory.medicine_id == Medicine.id)
+        .group_by(Medicine.name)
+    )
+    if names is not None:
+        query = query.filter(Medicine.name.in_(list(names)))
+    return query.all()
+
+
+def load_trie():
+    """
+    Build the autocomplete trie, from the snapshot file when a fresh one
+    exists, otherwise from the database (writing a new snapshot).
+    """
+    config = current_app.config
+    path = config.get('TRIE_SNAPSHOT_PATH')
+    top_k = config['AUTOCOMPLETE_CACHE_SIZE']
+    fuzzy = {
+        'fuzzy_max_distance': config['FUZZY_MAX_DISTANCE'],
+        'fuzzy_prefix_length': config['FUZZY_PREFIX_LENGTH'],
+    }
+
+    if path and os.path.exists(path) and time.time() - os.path.getmtime(path) < config['TRIE_SNAPSHOT_MAX_AGE']:
+        try:
+            entries, _ = trie_interface.load_snapshot(path)
+            trie_interface.build_trie(entries, top_k, **fuzzy)
+            # Catch up on medicines the snapshot doesn't have; ids commit out
+            # of order, so compare names rather than trusting an id watermark
+            known = {name for name, _ in entries}
+            new_names = [
+                name for (name,) in db.session.query(Medicine.name).distinct()
+                if name not in known
+            ]
+            if new_names:
+                for name, weight in medicine_weights(new_names):
+                    trie_interface.insert_medicine(name, weight)
+            return "snapshot"
+        except (OSError, ValueError) as e:
+            print("❌ Error loading trie snapshot, rebuilding:", e)
+
+    trie_interface.build_trie(medicine_weights(), top_k, **fuzzy)
+    if path:
+        save_trie_snapshot()
+    return "database"
+
+
+def save_trie_snapshot():
+    path = current_app.config.get('TRIE_SNAPSHOT_PATH')
+    if not path:
+        return
+    try:
+        trie_interface.save_snapshot(path)
+    except OSError as e:
+        print("❌ Error saving trie snapshot:", e)
+
+
+def load_medicine_name_index():
+    medicine_name_index.rebuild(db.session.query(Medicine.id, Medicine.name).all())
+
+
+def ensure_medicine_name_index():
+    """
+    Medicines uploaded through other worker processes are picked up by
+    comparing the catalog's row count and highest id with the index and, on
+    a mismatch, loading every id the index is missing: ids don't commit in
+    order, so rows past a watermark would miss late commits below it. The
+    catalog is append-only. New names also go into the autocomplete trie.
+    """
+    synced_at = medicine_name_index.synced_at
+    if synced_at is None:
+        load_medicine_name_index()
+        return
+    if time.time() - synced_at < current_app.config['MEDICINE_INDEX_REFRESH_SECONDS']:
+        return
+    count, max_id = db.session.query(func.count(Medicine.id), func.max(Medicine.id)).one()
+    new_rows = []
+    if count != len(medicine_name_index) or (max_id or 0) > medicine_name_index.max_id:
+        known = medicine_name_index.ids()
+        missing = [medicine_id for (medicine_id,) in db.session.query(Medicine.id) if medicine_id not in known]
+        for i in range(0, len(missing), 500):
+            new_rows.extend(
+                db.session.query(Medicine.id, Medicine.name).filter(Medicine.id.in_(missing[i:i + 500]))
+            )
+    for medicine_id, name in new_rows:
+        medicine_name_index.add(medicine_id, name)
+    if new_rows:
+        for name, weight in medicine_weights({name for _, name in new_rows}):
+            trie_interface.insert_medicine(name, weight)
+    medicine_name_index.synced_at = time.time()
+
+
+_last_snapshot = 0.0
+
+
+def on_inventory_changed(medicine_ids):
+    """
+    Hook for the upload paths, called after commit with every medicine id
+    whose stock changed (including newly created medicines). Keeps the
+    name index and the trie's ranking weights in step with the database,
+    and refreshes the trie snapshot at most every TRIE_SNAPSHOT_INTERVAL.
+    """
+    global _last_snapshot
+    if not medicine_ids:
+        return
+
+    rows = db.session.query(Medicine.id, Medicine.name).filter(Medicine.id.in_(list(medicine_ids))).all()
+    for medicine_id, name in rows:
+        medicine_name_index.add(medicine_id, name)
+
+    for name, weight in medicine_weights({name for _, name in rows}):
+        trie_interface.insert_medicine(name, weight)
+
+    if time.time() - _last_snapshot >= current_app.config['TRIE_SNAPSHOT_INTERVAL']:
+        _last_snapshot = time.time()
+        save_trie_snapshot()
+
+
+@register_inventory_listener
+def on_inventory_upload(changes):
+    on_inventory_changed(changes.medicine_ids)
@@ -0,0 +1,154 @@
+# app/utils/fuzzy_index.py
+
+
+def edit_distance(a, b, max_distance, prefix=False):
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent
+    transpositions) between `a` and `b`, or max_distance + 1 as soon as it
+    is known to exceed `max_distance`. With `prefix`, the distance between
+    `a` and the closest beginning of `b`.
+    """
+    if a == b:
+        return 0
+    if prefix:
+        b = b[:len(a) + max_distance]
+        if len(b) < len(a) - max_distance:
+            return max_distance + 1
+    elif abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    elif len(a) > len(b):
+        a, b = b, a
+
+    too_far = max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [too_far] * len(b)
+        # Only cells within max_distance of the diagonal can stay in range
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        row_min = current[0] if low == 1 else too_far
+        for j in range(low, high + 1):
+            cb = b[j - 1]
+            cost = 0 if ca == cb else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return too_far
+        previous_previous, previous = previous, current
+    if prefix:
+        return min(min(previous[max(0, len(a) - max_distance):]), too_far)
+    return min(previous[len(b)], too_far)
+
+
+class SymSpellIndex:
+    """
+    Typo-tolerant lookup of names within a small edit distance, after
+    SymSpell's symmetric delete scheme: every string reachable from the
+    first `prefix_length` characters of a name by deleting up to
+    `max_distance` characters points back at the name. A query generates
+    its own deletes, so candidates come from dictionary hits instead of a
+    scan, and only those are checked with `edit_distance`.
+
+    Names are matched case-insensitively; results keep the original casing
+    and are ranked by distance, then by weight (as in the trie).
+    """
+
+    def __init__(self, max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.terms = {}     # lowercased name -> {original name: weight}
+        self.deletes = {}   # delete string -> lowercased name, or a list of them
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _deletes(self, word, max_distance):
+        found = {word}
+        frontier = [word]
+        for _ in range(max_distance):
+            next_frontier = []
+            for current in frontier:
+                if len(current) <= 1:
+                    continue
+                for i in range(len(current)):
+                    shorter = current[:i] + current[i + 1:]
+                    if shorter not in found:
+                        found.add(shorter)
+                        next_frontier.append(shorter)
+            frontier = next_frontier
+        return found
+
+    def insert(self, name, weight=1.0):
+        key = name.lower()
+        variants = self.terms.get(key)
+        if variants is not None:
+            variants[name] = weight
+            return
+        self.terms[key] = {name: weight}
+        # Most names hit a fresh delete, so single names are stored bare
+        # and only shared deletes pay for a list
+        for delete in self._deletes(key[:self.prefix_length], self.max_distance):
+            entry = self.deletes.get(delete)
+            if entry is None:
+                self.deletes[delete] = key
+            elif isinstance(entry, list):
+                entry.append(key)
+            else:
+                self.deletes[delete] = [entry, key]
+
+    def remove(self, name):
+        key = name.lower()
+        variants = self.terms.get(key)
+        if variants is None or variants.pop(name, None) is None:
+            return False
+        if variants:
+            return True
+        del self.terms[key]
+        for delete in self._deletes(key[:self.prefix_length], self.max_distance):
+            entry = self.deletes.get(delete)
+            if entry == key:
+                del self.deletes[delete]
+            elif isinstance(entry, list) and key in entry:
+                entry.remove(key)
+                if len(entry) == 1:
+                    self.deletes[delete] = entry[0]
+        return True
+
+    def lookup(self, query, limit=10, max_distance=None, prefix=False):
+        """
+        [(distance, name)] for the names within `max_distance` edits of
+        `query`, closest first. With `prefix`, a name also matches when its
+        beginning is that close to the query (for autocomplete); typos in
+        the first letters are then only found once `prefix_length`
+        characters have been typed.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        if max_distance is None:
+            max_distance = self.max_distance
+        max_distance = min(max_distance, self.max_distance)
+
+        candidates = set()
+        for delete in self._deletes(query[:self.prefix_length], max_distance):
+            entry = self.deletes.get(delete)
+            if entry is None:
+                continue
+            if isinstance(entry, list):
+                candidates.update(entry)
+            else:
+                candidates.add(entry)
+
+        matches = []
+        for key in candidates:
+            distance = edit_distance(query, key, max_distance, prefix)
+            if distance <= max_distance:
+                for name, weight in self.terms[key].items():
+                    matches.append((distance, -weight, name))
+
+        matches.sort()
+        return [(distance, name) for distance, _, name in matches[:limit]]
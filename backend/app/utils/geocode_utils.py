@@ -1,9 +1,367 @@
-import geopy
+# app/utils/geocode_utils.py
+
+import csv
+import hashlib
+import math
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
 from geopy.geocoders import Nominatim
 
+from app.utils.metrics import stage
+
+
+def normalize_address(address):
+    """
+    Cache key for an address: lowercase, single spaces, tidy commas.
+    "12  Main St ,NEW YORK" and "12 main st, new york" share one entry.
+    """
+    key = re.sub(r"\s+", " ", str(address).strip().lower())
+    key = re.sub(r"\s*,\s*", ", ", key)
+    return key.strip(", ")
+
+
+# ===============================
+# Backends
+# ===============================
+class NominatimBackend:
+    """
+    Live OpenStreetMap geocoder. One client is shared by every request.
+    """
+
+    def __init__(self, user_agent="medilocate", timeout=10):
+        self.client = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def geocode(self, address):
+        location = self.client.geocode(address)
+        if location:
+            return location.latitude, location.longitude
+        return None
+
+
+class GazetteerBackend:
+    """
+    Offline geocoder backed by a CSV file with `address,latitude,longitude`
+    columns. Used in tests and air-gapped deployments instead of Nominatim.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                self.entries[normalize_address(row["address"])] = (
+                    float(row["latitude"]),
+                    float(row["longitude"]),
+                )
+
+    def geocode(self, address):
+        return self.entries.get(normalize_address(address))
+
+
+class SyntheticBackend:
+    """
+    Deterministic stand-in for load tests and benchmarks: every address
+    resolves, to a point derived from its hash within the city it names
+    (one of app.utils.synthetic_data.CITIES) or, failing that, within a
+    city picked by the hash. Never touches the network. `latency` (seconds)
+    and `failure_rate` (share of calls raising GeocoderUnavailable) mimic a
+    remote service for exercising concurrency and retries.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        from app.utils.synthetic_data import CITIES
+        self.cities = CITIES
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def geocode(self, address):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise GeocoderUnavailable("Synthetic geocoder failure")
+        key = normalize_address(address)
+        digest = hashlib.sha1(key.encode("utf-8")).digest()
+        city = next((c for c in self.cities if c[0].lower() in key), None)
+        if city is None:
+            city = self.cities[digest[0] % len(self.cities)]
+        _, lat, lon, radius_km, _ = city
+        # Uniform over a disc of the city's radius
+        r = radius_km * math.sqrt(int.from_bytes(digest[1:5], "big") / 2**32)
+        theta = 2 * math.pi * int.from_bytes(digest[5:9], "big") / 2**32
+        return (
+            lat + r * math.cos(theta) / 111.0,
+            lon + r * math.sin(theta) / (111.0 * max(0.01, math.cos(math.radians(lat)))),
+        )
+
+
+# ===============================
+# Cache
+# ===============================
+_MISS = object()
+
+
+class GeocodeCache:
+    """
+    Two-level cache: an in-memory LRU in front of an optional SQLite file
+    shared by every worker process. Failed lookups are stored too (as None)
+    with a shorter TTL so unknown addresses don't hit the backend each time.
+    """
+
+    def __init__(self, path=None, max_entries=4096, ttl=30 * 86400, negative_ttl=86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._memory = OrderedDict()    # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS geocode_cache ("
+                    " key TEXT PRIMARY KEY, latitude REAL, longitude REAL, expires_at REAL NOT NULL)"
+                )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """
+        Return the cached (lat, lon), None for a cached miss, or _MISS.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+        if not self.path:
+            return _MISS
+
+        row = self._connect().execute(
+            "SELECT latitude, longitude, expires_at FROM geocode_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[2] <= now:
+            return _MISS
+
+        value = (row[0], row[1]) if row[0] is not None else None
+        self._remember(key, value, row[2])
+        return value
+
+    def set(self, key, value):
+        expires_at = time.time() + (self.ttl if value is not None else self.negative_ttl)
+        self._remember(key, value, expires_at)
+        if self.path:
+            latitude, longitude = value if value is not None else (None, None)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO geocode_cache (key, latitude, longitude, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, latitude, longitude, expires_at),
+                )
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM geocode_cache")
+
+
+# ===============================
+# Rate limiting
+# ===============================
+RETRYABLE_ERRORS = (GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited)
+
+
+class RateLimiter:
+    """
+    Spaces calls at least 1/rate seconds apart across threads (rate <= 0
+    disables it). Nominatim's usage policy allows one request per second.
+    The limit is per process.
+    """
+
+    def __init__(self, rate=0.0):
+        self.rate = rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + 1.0 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# ===============================
+# Service
+# ===============================
+class GeocodingService:
+    def __init__(self, backend, cache, limiter=None, workers=4, max_retries=3, backoff=1.0):
+        self.backend = backend
+        self.cache = cache
+        self.limiter = limiter or RateLimiter()
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def geocode(self, address):
+        """
+        Resolve an address to (lat, lon), or None if it can't be geocoded.
+        Backend errors (timeouts, rate limiting) propagate and are not cached.
+        """
+        if not address:
+            return None
+        key = normalize_address(address)
+        cached = self.cache.get(key)
+        if cached is not _MISS:
+            return cached
+
+        self.limiter.acquire()
+        value = self.backend.geocode(address)
+        self.cache.set(key, value)
+        return value
+
+    def geocode_with_retry(self, address):
+        """
+        geocode() retrying timeouts, unavailability and rate limiting up to
+        `max_retries` times with exponential backoff and jitter (or the
+        server's Retry-After).
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.geocode(address)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = getattr(e, "retry_after", None) or self.backoff * 2 ** attempt
+                time.sleep(delay * random.uniform(1.0, 1.5))
+
+    def geocode_many(self, addresses):
+        """
+        Geocode many addresses on a thread pool of `workers`, each distinct
+        (normalized) address once, backend calls paced by the rate limiter.
+        Returns ({address: (lat, lon) or None}, {address: error message}).
+        """
+        by_key = {}
+        for address in addresses:
+            if address:
+                by_key.setdefault(normalize_address(address), address)
+
+        def lookup(address):
+            try:
+                return address, self.geocode_with_retry(address), None
+            except Exception as e:
+                return address, None, f"{type(e).__name__}: {e}"
+
+        locations = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            for address, location, error in pool.map(lookup, by_key.values()):
+                locations[address] = location
+                if error is not None:
+                    errors[address] = error
+
+        results = {}
+        for address in addresses:
+            original = by_key.get(normalize_address(address)) if address else None
+            results[address] = locations.get(original)
+            if original in errors:
+                errors[address] = errors[original]
+        return results, errors
+
+
+geocoder = GeocodingService(NominatimBackend(), GeocodeCache())
+
+
+def make_backend(config):
+    backend = config.get("GEOCODER_BACKEND", "nominatim")
+    if backend == "gazetteer":
+        return GazetteerBackend(config["GEOCODER_GAZETTEER_PATH"])
+    if backend == "synthetic":
+        return SyntheticBackend(
+            latency=config.get("GEOCODER_SYNTHETIC_LATENCY_MS", 0) / 1000,
+            failure_rate=config.get("GEOCODER_SYNTHETIC_FAILURE_RATE", 0.0),
+        )
+    if backend == "nominatim":
+        return NominatimBackend(
+            user_agent=config.get("NOMINATIM_USER_AGENT", "medilocate"),
+            timeout=config.get("GEOCODER_TIMEOUT", 10),
+        )
+    raise ValueError(f"Unknown GEOCODER_BACKEND: {backend}")
+
+
+def init_geocoder(app):
+    """
+    Configure the shared geocoding service from the app config.
+    """
+    global geocoder
+    config = app.config
+    cache = GeocodeCache(
+        path=config.get("GEOCODE_CACHE_PATH"),
+        max_entries=config.get("GEOCODE_CACHE_SIZE", 4096),
+        ttl=config.get("GEOCODE_CACHE_TTL", 30 * 86400),
+        negative_ttl=config.get("GEOCODE_NEGATIVE_TTL", 86400),
+    )
+    geocoder = GeocodingService(
+        make_backend(config),
+        cache,
+        limiter=RateLimiter(config.get("GEOCODER_RATE_LIMIT", 0.0)),
+        workers=config.get("GEOCODER_WORKERS", 4),
+        max_retries=config.get("GEOCODER_MAX_RETRIES", 3),
+        backoff=config.get("GEOCODER_RETRY_BACKOFF", 1.0),
+    )
+    return geocoder
+
+
+def set_backend(backend):
+    """
+    Swap the geocoder backend (e.g. a GazetteerBackend in tests).
+    """
+    geocoder.backend = backend
+    geocoder.cache.clear()
+
+
 def geocode_address(address):
-    geolocator = Nominatim(user_agent="medilocate")
-    location = geolocator.geocode(address)
+    with stage("geocode"):
+        location = geocoder.geocode(address)
     if location:
-        return location.latitude, location.longitude
+        return location
     return None, None
+
+
+def geocode_addresses(addresses):
+    """
+    Bulk counterpart of geocode_address: ({address: (lat, lon) or None},
+    {address: error}) with lookups run concurrently under the rate limit.
+    """
+    with stage("geocode"):
+        return geocoder.geocode_many(addresses)
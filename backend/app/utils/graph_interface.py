@@ -2,13 +2,17 @@
 
 import sys
 import os
-from collections import defaultdict, deque
 import heapq
+import time
+from array import array
 
-# Add path to compiled .pyd module
-pyd_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "cpp", "build", "Release"))
-if pyd_path not in sys.path:
-    sys.path.insert(0, pyd_path)
+from app.utils.metrics import record_backend
+
+# Add path to compiled module: .pyd in build/Release (Visual Studio), .so in build/ (Makefile/Ninja)
+for build_dir in (("build",), ("build", "Release")):
+    pyd_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "cpp", *build_dir))
+    if pyd_path not in sys.path:
+        sys.path.insert(0, pyd_path)
 
 # Try to import compiled C++ module
 try:
@@ -20,44 +24,337 @@ except ImportError as e:
     dijkstra_graph = None
     CPP_AVAILABLE = False
 
+INF = float("inf")
+
+
 # Python fallback implementation of Dijkstra's algorithm
-def python_dijkstra(graph, start, end):
-    """
-    Python implementation of Dijkstra's shortest path algorithm
-    """
-    if start not in graph or end not in graph:
-        return None
-    
-    # Priority queue: (distance, node, path)
-    pq = [(0, start, [start])]
-    visited = set()
-    
-    while pq:
-        distance, current, path = heapq.heappop(pq)
-        
-        if current in visited:
-            continue
-            
-        visited.add(current)
-        
-        if current == end:
-            return path
-        
-        # Check all neighbors
-        for neighbor, weight in graph.get(current, []):
-            if neighbor not in visited:
-                new_distance = distance + weight
-                new_path = path + [neighbor]
-                heapq.heappush(pq, (new_distance, neighbor, new_path))
-    
-    return None
+class PythonCSRGraph:
+    """
+    Python implementation of the dijkstra_graph.CSRGraph engine. Works on the
+    same offsets/targets/weights buffers and fills the same dist/pred output
+    buffers, so CSRGraph can switch between the two transparently.
+    """
+
+    def __init__(self, offsets, targets, weights):
+        if len(offsets) < 1 or offsets[-1] != len(targets) or len(targets) != len(weights):
+            raise ValueError("Inconsistent CSR buffers")
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.num_nodes = len(offsets) - 1
+
+    def run(self, sources, source_dists, goals, stop_at_first_goal, dist, pred):
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        for i in range(self.num_nodes):
+            dist[i] = INF
+            pred[i] = -1
+
+        pending = set(goals)
+        pq = []
+        for node, start_dist in zip(sources, source_dists):
+            if start_dist < dist[node]:
+                dist[node] = start_dist
+                pq.append((start_dist, node))
+        heapq.heapify(pq)
+
+        first_goal = -1
+        while pq:
+            d, u = heapq.heappop(pq)
+            if d > dist[u]:
+                continue  # stale entry
+
+            if u in pending:
+                pending.discard(u)
+                if first_goal < 0:
+                    first_goal = u
+                if stop_at_first_goal or not pending:
+                    break
+
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                nd = d + weights[e]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    pred[v] = u
+                    heapq.heappush(pq, (nd, v))
+
+        return first_goal
+
+
+class CSRGraph:
+    """
+    Immutable graph in compressed sparse row form, built once and queried
+    many times. Node ids (any hashable) are mapped to dense ints; edges live
+    in `array` buffers that are handed to the C++ engine without copying.
+    Both engines share one API: `run` fills distance and predecessor arrays,
+    and the helpers below build on it.
+    """
+
+    def __init__(self, node_ids, offsets, targets, weights):
+        self.node_ids = list(node_ids)
+        self.index = {node: i for i, node in enumerate(self.node_ids)}
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        if CPP_AVAILABLE and dijkstra_graph is not None:
+            self._engine = dijkstra_graph.CSRGraph(offsets, targets, weights)
+            self.backend = "cpp"
+        else:
+            self._engine = PythonCSRGraph(offsets, targets, weights)
+            self.backend = "python"
+
+    @classmethod
+    def from_adjacency(cls, adjacency):
+        """
+        Build from {node: iterable of (neighbor, weight)}. Nodes that only
+        appear as neighbours are included as well.
+        """
+        node_ids = list(adjacency)
+        index = {node: i for i, node in enumerate(node_ids)}
+        for edges in adjacency.values():
+            for neighbor, _ in edges:
+                if neighbor not in index:
+                    index[neighbor] = len(node_ids)
+                    node_ids.append(neighbor)
+
+        offsets = array("q", [0])
+        targets = array("q")
+        weights = array("d")
+        for node in node_ids:
+            for neighbor, weight in adjacency.get(node, ()):
+                targets.append(index[neighbor])
+                weights.append(weight)
+            offsets.append(len(targets))
+
+        return cls(node_ids, offsets, targets, weights)
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def run(self, sources, goals=(), stop_at_first_goal=False):
+        """
+        Multi-source Dijkstra from {node: start distance}. Returns
+        (first goal settled or None, dist array, pred array) with arrays
+        indexed by the dense node index.
+        """
+        source_idx = [self.index[node] for node in sources]
+        source_dists = [float(sources[node]) for node in sources]
+        goal_idx = [self.index[node] for node in goals if node in self.index]
+
+        n = len(self.node_ids)
+        dist = array("d", [INF]) * n
+        pred = array("q", [-1]) * n
+        record_backend("graph", self.backend)
+        reached = self._engine.run(source_idx, source_dists, goal_idx, stop_at_first_goal, dist, pred)
+        return (self.node_ids[reached] if reached >= 0 else None), dist, pred
+
+    def path_to(self, pred, node):
+        """
+        Rebuild the node-id path ending at `node` from a predecessor array.
+        """
+        i = self.index[node]
+        path = []
+        while i >= 0:
+            path.append(self.node_ids[i])
+            i = pred[i]
+        path.reverse()
+        return path
+
+    def distances(self, source):
+        """
+        Single-source shortest distances to every reachable node.
+        """
+        _, dist, _ = self.run({source: 0.0})
+        return {self.node_ids[i]: d for i, d in enumerate(dist) if d != INF}
+
+    def shortest_path(self, start, end):
+        """
+        Shortest path between two nodes, stopping as soon as `end` is settled.
+        """
+        if start not in self.index or end not in self.index:
+            return None
+        reached, _, pred = self.run({start: 0.0}, [end], stop_at_first_goal=True)
+        if reached is None:
+            return None
+        return self.path_to(pred, end)
+
+    def nearest_target(self, sources, targets):
+        """
+        One search from several seeded sources ({node: distance}) towards a
+        set of targets. Returns (target, distance, path) or None.
+        """
+        sources = {node: d for node, d in sources.items() if node in self.index}
+        if not sources:
+            return None
+        reached, dist, pred = self.run(sources, targets, stop_at_first_goal=True)
+        if reached is None:
+            return None
+        return reached, dist[self.index[reached]], self.path_to(pred, reached)
+
 
 def find_shortest_path(graph, start, end):
     """
-    Calls the compiled C++ Dijkstra module to get the shortest path.
-    Falls back to Python implementation if C++ module is not available.
+    Shortest path on a {node: [(neighbor, weight), ...]} graph. Runs on the
+    compiled C++ engine when available, the Python fallback otherwise.
+    Prefer building a CSRGraph once when the same graph is queried repeatedly.
+    """
+    return CSRGraph.from_adjacency(graph).shortest_path(start, end)
+
+def find_nearest_target(graph, sources, targets):
+    """
+    Multi-target search on a {node: [(neighbor, weight), ...]} graph from
+    seeded sources ({node: distance}). Returns (target, distance, path) for
+    the closest target, or None if no target is reachable.
     """
+    return CSRGraph.from_adjacency(graph).nearest_target(sources, set(targets))
+
+
+# ===============================
+# Multi-stop tours
+# ===============================
+# Largest matrix the exact solver accepts (its table grows as 2^n * n)
+MAX_EXACT_TOUR_NODES = 18
+
+
+def tour_cost(matrix, n, order, return_to_start=False):
+    total = sum(matrix[order[i] * n + order[i + 1]] for i in range(len(order) - 1))
+    if return_to_start and len(order) > 1:
+        total += matrix[order[-1] * n + order[0]]
+    return total
+
+
+# Python fallback implementations of the dijkstra_graph tour solvers
+def python_solve_tour_exact(matrix, return_to_start=False):
+    """
+    Held-Karp dynamic programming over a flat n*n matrix, starting at node
+    0. Returns (order, cost) like dijkstra_graph.solve_tour_exact.
+    """
+    n = int(round(len(matrix) ** 0.5))
+    if n * n != len(matrix):
+        raise ValueError("matrix must hold n * n entries")
+    if n > MAX_EXACT_TOUR_NODES:
+        raise ValueError("too many nodes for the exact tour solver")
+    if n <= 1:
+        return list(range(n)), 0.0
+
+    m = n - 1
+    full = (1 << m) - 1
+    # dp[mask][j]: cheapest route from 0 through `mask` ending at node j + 1
+    dp = [[INF] * m for _ in range(full + 1)]
+    parent = [[-1] * m for _ in range(full + 1)]
+    for j in range(m):
+        dp[1 << j][j] = matrix[j + 1]
+
+    for mask in range(1, full + 1):
+        row = dp[mask]
+        for j in range(m):
+            cost = row[j]
+            if cost == INF or not mask & (1 << j):
+                continue
+            base = (j + 1) * n + 1
+            for k in range(m):
+                if mask & (1 << k):
+                    continue
+                nxt = mask | (1 << k)
+                candidate = cost + matrix[base + k]
+                if candidate < dp[nxt][k]:
+                    dp[nxt][k] = candidate
+                    parent[nxt][k] = j
+
+    last = min(
+        range(m),
+        key=lambda j: dp[full][j] + (matrix[(j + 1) * n] if return_to_start else 0.0),
+    )
+    order = []
+    mask, j = full, last
+    while j >= 0:
+        order.append(j + 1)
+        mask, j = mask & ~(1 << j), parent[mask][j]
+    order.append(0)
+    order.reverse()
+    return order, tour_cost(matrix, n, order, return_to_start)
+
+
+def python_solve_tour_heuristic(matrix, return_to_start=False, time_budget_ms=50.0):
+    """
+    Nearest-neighbour construction, then first-improvement 2-opt and
+    Or-opt moves until none helps or the time budget is spent. Returns
+    (order, cost) like dijkstra_graph.solve_tour_heuristic.
+    """
+    n = int(round(len(matrix) ** 0.5))
+    if n * n != len(matrix):
+        raise ValueError("matrix must hold n * n entries")
+    if n == 0:
+        return [], 0.0
+    deadline = time.perf_counter() + time_budget_ms / 1000.0
+
+    order = [0]
+    unvisited = set(range(1, n))
+    while unvisited:
+        last = order[-1] * n
+        nearest = min(unvisited, key=lambda j: (matrix[last + j], j))
+        unvisited.discard(nearest)
+        order.append(nearest)
+
+    def two_opt():
+        for i in range(1, n - 1):
+            for k in range(i + 1, n):
+                a, b, c = order[i - 1], order[i], order[k]
+                before = matrix[a * n + b]
+                after = matrix[a * n + c]
+                if k + 1 < n or return_to_start:
+                    d = order[k + 1] if k + 1 < n else order[0]
+                    before += matrix[c * n + d]
+                    after += matrix[b * n + d]
+                if after < before - 1e-9:
+                    order[i:k + 1] = reversed(order[i:k + 1])
+                    return True
+        return False
+
+    def or_opt():
+        base = tour_cost(matrix, n, order, return_to_start)
+        for length in range(1, min(3, n - 1) + 1):
+            for i in range(1, n - length + 1):
+                segment = order[i:i + length]
+                rest = order[:i] + order[i + length:]
+                for at in range(1, len(rest) + 1):
+                    if at == i:
+                        continue
+                    candidate = rest[:at] + segment + rest[at:]
+                    if tour_cost(matrix, n, candidate, return_to_start) < base - 1e-9:
+                        order[:] = candidate
+                        return True
+        return False
+
+    while time.perf_counter() < deadline:
+        if two_opt() or or_opt():
+            continue
+        break
+    return order, tour_cost(matrix, n, order, return_to_start)
+
+
+def solve_tour(matrix, return_to_start=False, exact_max_nodes=10, time_budget_ms=50.0):
+    """
+    Visiting order over a flat n*n distance matrix (row-major, node 0 is
+    the start). Up to `exact_max_nodes` nodes the optimal order is found by
+    dynamic programming; larger inputs use the time-boxed heuristic.
+    Returns (order, cost, solver name).
+    """
+    if not isinstance(matrix, array) or matrix.typecode != "d":
+        matrix = array("d", matrix)
+    n = int(round(len(matrix) ** 0.5))
+    exact = n <= min(exact_max_nodes, MAX_EXACT_TOUR_NODES)
+
     if CPP_AVAILABLE and dijkstra_graph is not None:
-        return dijkstra_graph.find_shortest_path(graph, start, end)
+        if exact:
+            order, cost = dijkstra_graph.solve_tour_exact(matrix, return_to_start)
+        else:
+            order, cost = dijkstra_graph.solve_tour_heuristic(matrix, return_to_start, time_budget_ms)
+    elif exact:
+        order, cost = python_solve_tour_exact(matrix, return_to_start)
     else:
-        return python_dijkstra(graph, start, end)
+        order, cost = python_solve_tour_heuristic(matrix, return_to_start, time_budget_ms)
+    return list(order), cost, "exact" if exact else "heuristic"
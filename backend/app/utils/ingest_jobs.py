@@ -0,0 +1,437 @@
+# app/utils/ingest_jobs.py
+
+import json
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, exists, select
+
+from app import db
+from app.models import IngestJob, User
+from app.utils.inventory_ingest import ingest_inventory, notify_inventory_listeners
+
+# Inventory uploads as background jobs. The upload request only spools the
+# file to INGEST_JOB_DIR and inserts a queued row in `ingest_jobs`; worker
+# threads (in every web process, or in ingest_worker.py) claim queued jobs
+# with a conditional UPDATE and run the same streaming ingestion as before.
+# The table is the queue, so any number of processes can share it: jobs of
+# different pharmacies run concurrently, a pharmacy's own jobs one at a time
+# in upload order. Inventory listeners fire only in the process that ran a
+# job, so every web process also follows the jobs that succeeded elsewhere
+# and replays them to its own listeners (CompletedJobFeed).
+jobs = IngestJob.__table__
+users = User.__table__
+
+COPY_BUFFER = 1024 * 1024
+# Completed jobs are re-read this far behind the newest one seen, covering
+# commit delays and clock differences between worker hosts
+FEED_OVERLAP = timedelta(seconds=60)
+
+
+def _copy_counting_lines(source, target):
+    lines = 0
+    last = b''
+    while True:
+        block = source.read(COPY_BUFFER)
+        if not block:
+            break
+        target.write(block)
+        lines += block.count(b'\n')
+        last = block[-1:]
+    if last and last != b'\n':
+        lines += 1
+    return lines
+
+
+def enqueue_upload(pharmacy_id, file_storage, job_dir, mode='replace'):
+    """
+    Spool an uploaded CSV to `job_dir` and queue it. The row count is
+    estimated from line breaks (quoted multi-line fields count extra).
+    `mode` is 'replace' or 'add' (add the file's stock to the batches).
+    Returns the committed IngestJob.
+    """
+    if mode not in ('replace', 'add'):
+        raise ValueError(f"Unknown ingestion mode {mode!r}")
+    os.makedirs(job_dir, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    path = os.path.join(job_dir, job_id + '.csv')
+    with open(path, 'wb') as f:
+        lines = _copy_counting_lines(file_storage.stream, f)
+
+    job = IngestJob(
+        id=job_id,
+        pharmacy_id=pharmacy_id,
+        status='queued',
+        mode=mode,
+        filename=file_storage.filename,
+        file_path=path,
+        total_rows=max(0, lines - 1),
+        rows_processed=0,
+    )
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.remove(path)
+        raise
+    if ingest_workers is not None:
+        ingest_workers.wake()
+    return job
+
+
+def _running_for_pharmacy(pharmacy_id_column):
+    running = jobs.alias('running')
+    return exists().where(and_(running.c.pharmacy_id == pharmacy_id_column, running.c.status == 'running'))
+
+
+def claim_job(job_id, pharmacy_id, worker):
+    """
+    Move a queued job to running unless another job of its pharmacy is
+    running. Locking the pharmacy's user row first serializes competing
+    claims on PostgreSQL; SQLite runs the UPDATE under its write lock.
+    Returns True if this worker got the job.
+    """
+    now = datetime.utcnow()
+    try:
+        db.session.execute(select(users.c.id).where(users.c.id == pharmacy_id).with_for_update())
+        claimed = db.session.execute(
+            jobs.update()
+            .where(jobs.c.id == job_id, jobs.c.status == 'queued')
+            .where(~_running_for_pharmacy(jobs.c.pharmacy_id))
+            .values(status='running', worker=worker, started_at=now, updated_at=now)
+        ).rowcount == 1
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return claimed
+
+
+def claim_next_job(worker, candidates=20):
+    """
+    Claim the oldest queued job whose pharmacy has none running. Returns
+    its id, or None when nothing can run now.
+    """
+    queued = db.session.execute(
+        select(jobs.c.id, jobs.c.pharmacy_id)
+        .where(jobs.c.status == 'queued')
+        .where(~_running_for_pharmacy(jobs.c.pharmacy_id))
+        .order_by(jobs.c.created_at)
+        .limit(candidates)
+    ).all()
+    db.session.commit()
+    seen = set()
+    for job_id, pharmacy_id in queued:
+        # Only a pharmacy's oldest queued job may start
+        if pharmacy_id in seen:
+            continue
+        seen.add(pharmacy_id)
+        if claim_job(job_id, pharmacy_id, worker):
+            return job_id
+    return None
+
+
+def requeue_stale_jobs(stale_seconds):
+    """
+    Put running jobs back in the queue when their worker has stopped
+    reporting progress (crashed or killed process). Returns how many.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    requeued = db.session.execute(
+        jobs.update()
+        .where(jobs.c.status == 'running', jobs.c.updated_at < cutoff)
+        .values(status='queued', worker=None, rows_processed=0, started_at=None)
+    ).rowcount
+    db.session.commit()
+    if requeued:
+        print(f"⚠️ Requeued {requeued} stalled ingestion jobs.")
+    return requeued
+
+
+class JobLost(Exception):
+    """
+    The job was requeued (its worker looked stalled) while this worker was
+    still running it; whoever claims it next ingests the file instead.
+    """
+
+
+def _finish(job_id, worker, status, rows=None, errors=None, result=None):
+    """
+    Record a job's outcome. Returns False if the job no longer belongs to
+    `worker`, in which case nothing is written.
+    """
+    values = {
+        'status': status,
+        'errors': json.dumps(errors) if errors else None,
+        'result': json.dumps(result) if result else None,
+        'finished_at': datetime.utcnow(),
+    }
+    if rows is not None:
+        values['rows_processed'] = rows
+    finished = db.session.execute(
+        jobs.update().where(jobs.c.id == job_id, jobs.c.worker == worker).values(**values)
+    ).rowcount == 1
+    db.session.commit()
+    return finished
+
+
+def run_job(job_id, worker, config):
+    """
+    Ingest a claimed job's file and record the outcome on the job row.
+    Progress doubles as the heartbeat and stops the run with JobLost once
+    the job has been requeued: the UPDATE is part of the ingestion's own
+    transactions, and the last one holds the job row until the inventory
+    changes commit, so a requeue can't slip in between. The spooled file
+    is only removed by the worker that records the outcome.
+    """
+    job = db.session.get(IngestJob, job_id)
+    pharmacy_id, path, mode = job.pharmacy_id, job.file_path, job.mode
+    db.session.commit()
+
+    def progress(rows):
+        beat = db.session.execute(
+            jobs.update().where(jobs.c.id == job_id, jobs.c.worker == worker)
+            .values(rows_processed=rows, updated_at=datetime.utcnow())
+        ).rowcount
+        if beat != 1:
+            raise JobLost(job_id)
+
+    finished = False
+
+    try:
+        with open(path, 'rb') as f:
+            result = ingest_inventory(
+                pharmacy_id,
+                f,
+                chunk_size=config['INGEST_CHUNK_SIZE'],
+                max_errors=config['INGEST_MAX_ERRORS'],
+                trace_memory=config['INGEST_TRACE_MEMORY'],
+                progress=progress,
+                add_stock=mode == 'add',
+            )
+    except JobLost:
+        print(f"⚠️ Ingestion job {job_id} was requeued while {worker} ran it; abandoning this run.")
+    except UnicodeDecodeError as e:
+        finished = _finish(job_id, worker, 'failed', errors=[f"File is not valid UTF-8: {e}"])
+    except FileNotFoundError:
+        finished = _finish(job_id, worker, 'failed', errors=["Uploaded file is missing from INGEST_JOB_DIR."])
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Ingestion job {job_id} failed:", e)
+        finished = _finish(job_id, worker, 'failed', errors=[f"Failed to save inventory to database: {e}"])
+    else:
+        if result.errors:
+            finished = _finish(job_id, worker, 'failed', result.rows, result.errors, {'stats': result.stats()})
+        else:
+            finished = _finish(job_id, worker, 'succeeded', result.rows, None, {
+                'changes': result.changes.counts(),
+                'stats': result.stats(),
+                'medicine_ids': sorted(result.changes.medicine_ids),
+            })
+    if finished:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def job_status(job):
+    """
+    JSON-ready state of a job: status, progress, errors and, once done,
+    change counts and stats.
+    """
+    result = json.loads(job.result) if job.result else {}
+    status = {
+        'job_id': job.id,
+        'status': job.status,
+        'mode': job.mode,
+        'filename': job.filename,
+        'total_rows': job.total_rows,
+        'rows_processed': job.rows_processed,
+        'progress': (
+            1.0 if job.status == 'succeeded'
+            else round(min(1.0, job.rows_processed / job.total_rows), 3) if job.total_rows else None
+        ),
+        'errors': json.loads(job.errors) if job.errors else [],
+        'changes': result.get('changes'),
+        'stats': result.get('stats'),
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+    if job.status == 'queued':
+        # Earlier uploads of the same pharmacy still to finish
+        status['jobs_ahead'] = (
+            db.session.query(IngestJob.id)
+            .filter(IngestJob.pharmacy_id == job.pharmacy_id)
+            .filter(IngestJob.status.in_(('queued', 'running')))
+            .filter(IngestJob.created_at < job.created_at)
+            .count()
+        )
+    return status
+
+
+class CompletedUpload:
+    """
+    What listeners read from an InventoryChangeSet (`pharmacy_id`,
+    `medicine_ids`, truthiness), rebuilt from a job another process ran.
+    """
+
+    def __init__(self, pharmacy_id, medicine_ids):
+        self.pharmacy_id = pharmacy_id
+        self.medicine_ids = set(medicine_ids)
+
+    def __bool__(self):
+        return bool(self.medicine_ids)
+
+
+class CompletedJobFeed:
+    """
+    Replays jobs that succeeded in other processes to this process's
+    inventory listeners (search cache, trie, name index). Jobs are read by
+    finished_at with FEED_OVERLAP and remembered by id, so each is replayed
+    once; replaying is idempotent anyway. Starts at its creation time:
+    state loaded at boot already covers older jobs.
+    """
+
+    def __init__(self, process_name):
+        self.process_name = process_name
+        self.watermark = datetime.utcnow()
+        self._seen = {}     # job id -> finished_at
+
+    def poll(self):
+        since = self.watermark - FEED_OVERLAP
+        rows = db.session.execute(
+            select(jobs.c.id, jobs.c.pharmacy_id, jobs.c.worker, jobs.c.finished_at, jobs.c.result)
+            .where(jobs.c.status == 'succeeded', jobs.c.finished_at >= since)
+            .order_by(jobs.c.finished_at)
+        ).all()
+        db.session.commit()
+        replayed = 0
+        for job_id, pharmacy_id, worker, finished_at, result in rows:
+            self.watermark = max(self.watermark, finished_at)
+            if job_id in self._seen:
+                continue
+            self._seen[job_id] = finished_at
+            if worker and worker.startswith(self.process_name + ':'):
+                continue    # ran here, listeners already fired
+            medicine_ids = json.loads(result).get('medicine_ids', []) if result else []
+            notify_inventory_listeners(CompletedUpload(pharmacy_id, medicine_ids))
+            replayed += 1
+        cutoff = self.watermark - FEED_OVERLAP
+        self._seen = {job_id: at for job_id, at in self._seen.items() if at >= cutoff}
+        return replayed
+
+
+class IngestWorkerPool:
+    """
+    `workers` daemon threads taking jobs from the queue table, each in its
+    own app context. Idle threads poll every `poll_seconds` or wake up as
+    soon as this process queues a job. With `sync`, one more thread replays
+    jobs completed by other processes to this one's listeners at the same
+    interval.
+    """
+
+    def __init__(self, app, workers=2, poll_seconds=2.0, stale_seconds=900):
+        self.app = app
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._last_stale_check = 0.0
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self, sync=True):
+        with self._lock:
+            if self.running:
+                return
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._run, args=(f"{self.name}:{i}",), name=f"ingest-worker-{i}", daemon=True)
+                for i in range(max(0, self.workers))
+            ]
+            if sync:
+                feed = CompletedJobFeed(self.name)
+                self._threads.append(threading.Thread(target=self._follow, args=(feed,), name="ingest-feed", daemon=True))
+            for thread in self._threads:
+                thread.start()
+        if self.workers > 0:
+            print(f"✅ Started {self.workers} ingestion workers.")
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _check_stale(self):
+        now = datetime.utcnow().timestamp()
+        with self._lock:
+            if now - self._last_stale_check < min(60, self.stale_seconds):
+                return
+            self._last_stale_check = now
+        requeue_stale_jobs(self.stale_seconds)
+
+    def _run(self, worker):
+        while not self._stopping.is_set():
+            job_id = None
+            try:
+                with self.app.app_context():
+                    self._check_stale()
+                    job_id = claim_next_job(worker)
+                    if job_id is not None:
+                        run_job(job_id, worker, self.app.config)
+            except Exception as e:
+                print(f"❌ Ingestion worker {worker} error:", e)
+            if job_id is None:
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+
+    def _follow(self, feed):
+        while not self._stopping.wait(self.poll_seconds):
+            try:
+                with self.app.app_context():
+                    feed.poll()
+            except Exception as e:
+                print("❌ Ingestion job feed error:", e)
+
+
+ingest_workers = None
+
+
+def init_ingest_jobs(app):
+    """
+    Create the process's worker pool from INGEST_WORKERS and friends. The
+    threads start with the first request or the first queued upload, so
+    scripts that only build an app never poll the queue.
+    """
+    global ingest_workers
+    if ingest_workers is not None:
+        ingest_workers.stop(timeout=5)
+    config = app.config
+    ingest_workers = IngestWorkerPool(
+        app,
+        workers=config.get("INGEST_WORKERS", 2),
+        poll_seconds=config.get("INGEST_JOB_POLL_SECONDS", 2.0),
+        stale_seconds=config.get("INGEST_JOB_STALE_SECONDS", 900),
+    )
+    return ingest_workers
+
+
+def start_ingest_workers():
+    if ingest_workers is not None:
+        ingest_workers.start()
@@ -0,0 +1,537 @@
+# app/utils/inventory_ingest.py
+
+import csv
+import io
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, bindparam, func, or_
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Inventory, InventoryStaging, Medicine
+from app.utils.availability import refresh_availability
+
+STAGING_COLUMNS = (
+    'upload_id', 'pharmacy_id', 'medicine_id', 'medicine_key', 'line_num',
+    'stock', 'price', 'expiry_date',
+)
+
+# A batch is identified by the pharmacy plus these columns; the value
+# columns are compared to decide whether an upload changes it. Medicine
+# details are not copied onto batches, they stay on `medicines`.
+BATCH_KEY = ('medicine_id', 'expiry_date', 'price')
+BATCH_VALUE_COLUMNS = ('stock',)
+
+_inventory_listeners = []   # (order, listener)
+
+# Listener order: process-local indexes first, cached responses last, so a
+# search racing an upload can't re-cache results from stale indexes
+ORDER_INDEXES = 0
+ORDER_CACHES = 100
+
+# tracemalloc is process-wide: only one upload at a time may measure with it
+_trace_lock = threading.Lock()
+
+
+def register_inventory_listener(listener=None, order=ORDER_INDEXES):
+    """
+    Call `listener(changes)` with the InventoryChangeSet of every committed
+    upload, in ascending `order` (registration order within one). Listeners
+    run in the app context of the ingestion worker (or request) that
+    committed it; their errors are logged and don't fail the upload. Data
+    that must stay consistent with the inventory (the availability summary)
+    is written in the upload's own transaction instead.
+    Usable as @register_inventory_listener or
+    @register_inventory_listener(order=ORDER_CACHES).
+    """
+    if listener is None:
+        return lambda fn: register_inventory_listener(fn, order)
+    if all(registered is not listener for _, registered in _inventory_listeners):
+        _inventory_listeners.append((order, listener))
+        _inventory_listeners.sort(key=lambda entry: entry[0])
+    return listener
+
+
+def notify_inventory_listeners(changes):
+    for _, listener in list(_inventory_listeners):
+        try:
+            listener(changes)
+        except Exception as e:
+            print(f"❌ Inventory listener {getattr(listener, '__name__', listener)} failed:", e)
+
+
+class InventoryChangeSet:
+    """
+    Batch-level difference between a pharmacy's inventory and an upload.
+    Rows are dicts of inventory columns; deleted rows carry their `id` and
+    updated rows their `previous_stock`.
+    """
+
+    def __init__(self, pharmacy_id):
+        self.pharmacy_id = pharmacy_id
+        self.inserted = []
+        self.updated = []
+        self.deleted = []
+        self.unchanged = 0
+
+    def __bool__(self):
+        return bool(self.inserted or self.updated or self.deleted)
+
+    @property
+    def medicine_ids(self):
+        return {row['medicine_id'] for row in self.inserted + self.updated + self.deleted}
+
+    def counts(self):
+        return {
+            'inserted': len(self.inserted),
+            'updated': len(self.updated),
+            'deleted': len(self.deleted),
+            'unchanged': self.unchanged,
+        }
+
+
+class IngestResult:
+    def __init__(self, upload_id):
+        self.upload_id = upload_id
+        self.rows = 0
+        self.errors = []
+        self.new_medicines = 0
+        self.changes = None
+        self.elapsed = 0.0
+        self.peak_memory = None
+
+    def stats(self):
+        return {
+            'rows': self.rows,
+            'new_medicines': self.new_medicines,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows / self.elapsed, 1) if self.elapsed > 0 else None,
+            'peak_memory_kb': round(self.peak_memory / 1024, 1) if self.peak_memory is not None else None,
+        }
+
+
+def iter_csv_rows(binary_stream, encoding='utf-8-sig'):
+    """
+    Decode an uploaded file incrementally and yield (line_num, row dict).
+    Only the current row is held in memory, never the whole file.
+    """
+    text = io.TextIOWrapper(binary_stream, encoding=encoding, newline='')
+    try:
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    finally:
+        text.detach()
+
+
+def parse_date(value):
+    """
+    Parse a YYYY-MM-DD date. date.fromisoformat is several times faster
+    than strptime; strptime still handles forms such as 2030-1-5.
+    """
+    if len(value) == 10 and value[4] == '-' and value[7] == '-':
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def parse_row(row, line_num, catalog, new_medicines, known_ids=None):
+    """
+    Validate one CSV row. Returns the staging dict (without upload/pharmacy
+    ids) or raises ValueError/KeyError with the per-line problem.
+    Unknown medicines are remembered in `new_medicines` with their
+    manufacturer and description, first spelling wins; for known medicines
+    those columns are ignored.
+    With `known_ids` (add-to-stock uploads) a row may name its medicine by
+    `medicine_id` instead, and unknown medicines are rejected, not created.
+    """
+    if known_ids is not None and row.get('medicine_id'):
+        medicine_id = int(row['medicine_id'])
+        if medicine_id not in known_ids:
+            raise ValueError(f"Unknown medicine id {medicine_id}")
+        key = (row.get('name') or str(medicine_id)).lower()
+    else:
+        medicine_name = row['name']
+        if not medicine_name:
+            raise ValueError("Medicine name is required")
+        key = medicine_name.lower()
+        medicine_id = catalog.get(key)
+        if medicine_id is None:
+            if known_ids is not None:
+                raise ValueError(f"Unknown medicine {medicine_name}")
+            if key not in new_medicines:
+                new_medicines[key] = (medicine_name, row.get('manufacturer'), row.get('description'))
+
+    stock = int(row['stock'])
+    price = float(row['price'])
+    expiry_date = parse_date(row['expiry_date'])
+
+    return {
+        'medicine_id': medicine_id,
+        'medicine_key': key,
+        'line_num': line_num,
+        'stock': stock,
+        'price': price,
+        'expiry_date': expiry_date,
+    }
+
+
+def _stage_chunk(rows):
+    """
+    Bulk-write one chunk of staging rows: COPY on PostgreSQL, executemany
+    everywhere else.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\N' if row[c] is None else row[c] for c in STAGING_COLUMNS])
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {InventoryStaging.__tablename__} ({', '.join(STAGING_COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+        finally:
+            cursor.close()
+    else:
+        db.session.execute(InventoryStaging.__table__.insert(), rows)
+
+
+def _insert_medicines(rows):
+    """
+    Insert catalog rows, skipping names that already exist in any case:
+    ON CONFLICT DO NOTHING on PostgreSQL and SQLite, one savepoint per row
+    elsewhere.
+    """
+    medicines = Medicine.__table__
+    dialect = db.session.connection().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.session.execute(insert(medicines).on_conflict_do_nothing(), rows)
+        return
+
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(medicines.insert(), row)
+        except IntegrityError:
+            pass
+
+
+def _create_new_medicines(upload_id, new_medicines):
+    """
+    Insert medicines first seen in this upload and point their staging rows
+    at the new ids. A concurrent upload (another pharmacy's job) may have
+    created some of them since the catalog was read; those rows are kept
+    and their ids used instead.
+    """
+    medicines = Medicine.__table__
+    staging = InventoryStaging.__table__
+    _insert_medicines([
+        {'name': name, 'manufacturer': manufacturer, 'description': description}
+        for name, manufacturer, description in new_medicines.values()
+    ])
+
+    # The unique index leaves one row per lowercased name; exact spellings
+    # also catch names SQL lower() folds differently from Python's
+    names = {name for name, _, _ in new_medicines.values()}
+    created = {}
+    for medicine_id, name in db.session.execute(
+        select(medicines.c.id, medicines.c.name)
+        .where(or_(func.lower(medicines.c.name).in_(list(new_medicines)), medicines.c.name.in_(names)))
+    ):
+        if name in names or name.lower() not in created:
+            created[name.lower()] = medicine_id
+
+    db.session.execute(
+        staging.update()
+        .where(staging.c.upload_id == upload_id)
+        .where(staging.c.medicine_key == bindparam('key'))
+        .values(medicine_id=bindparam('new_id')),
+        [{'key': key, 'new_id': medicine_id} for key, medicine_id in created.items()],
+    )
+
+
+def _current_batches(pharmacy_id):
+    inventory = Inventory.__table__
+    return db.session.execute(
+        select(
+            inventory.c.id, inventory.c.medicine_id, inventory.c.expiry_date, inventory.c.price,
+            inventory.c.stock,
+        ).where(inventory.c.pharmacy_id == pharmacy_id)
+    )
+
+
+def _staged_batches(upload_id):
+    """
+    Staged rows collapsed onto the batch key; a batch listed several times
+    in one file has its stock summed.
+    """
+    staging = InventoryStaging.__table__
+    return db.session.execute(
+        select(
+            staging.c.medicine_id, staging.c.expiry_date, staging.c.price,
+            func.sum(staging.c.stock),
+        )
+        .where(staging.c.upload_id == upload_id)
+        .group_by(staging.c.medicine_id, staging.c.expiry_date, staging.c.price)
+    )
+
+
+def diff_inventory(upload_id, pharmacy_id, add_stock=False):
+    """
+    Compare the staged upload with the pharmacy's current batches and
+    return the InventoryChangeSet that turns one into the other. With
+    `add_stock` the staged stock is added to existing batches and batches
+    missing from the upload are kept.
+    """
+    changes = InventoryChangeSet(pharmacy_id)
+    current = {}
+    for row_id, medicine_id, expiry_date, price, stock in _current_batches(pharmacy_id):
+        row = {
+            'id': row_id, 'pharmacy_id': pharmacy_id, 'medicine_id': medicine_id,
+            'expiry_date': expiry_date, 'price': price, 'stock': stock,
+        }
+        key = (medicine_id, expiry_date, price)
+        if key in current:
+            # Duplicate batch left over from before the batch key existed
+            if not add_stock:
+                changes.deleted.append(row)
+        else:
+            current[key] = row
+
+    for medicine_id, expiry_date, price, stock in _staged_batches(upload_id):
+        row = {
+            'pharmacy_id': pharmacy_id, 'medicine_id': medicine_id,
+            'expiry_date': expiry_date, 'price': price, 'stock': stock,
+        }
+        existing = current.pop((medicine_id, expiry_date, price), None)
+        if existing is None:
+            changes.inserted.append(row)
+        elif add_stock and not stock:
+            changes.unchanged += 1
+        elif add_stock:
+            row['stock'] = (existing['stock'] or 0) + stock
+            row['previous_stock'] = existing['stock']
+            changes.updated.append(row)
+        elif any(existing[c] != row[c] for c in BATCH_VALUE_COLUMNS):
+            row['previous_stock'] = existing['stock']
+            changes.updated.append(row)
+        else:
+            changes.unchanged += 1
+
+    if not add_stock:
+        changes.deleted.extend(current.values())
+    return changes
+
+
+def upsert_inventory_rows(rows):
+    """
+    Write batch rows with INSERT ... ON CONFLICT on the batch key, updating
+    the value columns of batches that already exist. Dialects without an
+    upsert clause fall back to an UPDATE followed by an INSERT of the rows
+    that matched nothing.
+    """
+    if not rows:
+        return
+    inventory = Inventory.__table__
+    key_columns = ('pharmacy_id',) + BATCH_KEY
+    rows = [{c: row[c] for c in key_columns + BATCH_VALUE_COLUMNS} for row in rows]
+    dialect = db.session.connection().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(inventory)
+        updates = {c: stmt.excluded[c] for c in BATCH_VALUE_COLUMNS}
+        stmt = stmt.on_conflict_do_update(index_elements=list(key_columns), set_=updates)
+        db.session.execute(stmt, rows)
+        return
+
+    values = {c: bindparam('b_' + c) for c in BATCH_VALUE_COLUMNS}
+    db.session.execute(
+        inventory.update()
+        .where(*[inventory.c[c] == bindparam('b_' + c) for c in key_columns])
+        .values(**values),
+        [{'b_' + c: value for c, value in row.items()} for row in rows],
+    )
+    existing = {
+        tuple(key) for key in db.session.execute(
+            select(*[inventory.c[c] for c in key_columns])
+            .where(inventory.c.pharmacy_id.in_({row['pharmacy_id'] for row in rows}))
+        )
+    }
+    missing = [row for row in rows if tuple(row[c] for c in key_columns) not in existing]
+    if missing:
+        db.session.execute(inventory.insert(), missing)
+
+
+def apply_changes(changes, chunk_size=500):
+    """
+    Apply a change set: set-based upserts for inserted and updated batches,
+    then deletes by id. Untouched batches keep their rows.
+    """
+    inventory = Inventory.__table__
+    upserts = changes.inserted + changes.updated
+    for i in range(0, len(upserts), chunk_size):
+        upsert_inventory_rows(upserts[i:i + chunk_size])
+
+    deleted_ids = [row['id'] for row in changes.deleted]
+    for i in range(0, len(deleted_ids), chunk_size):
+        db.session.execute(inventory.delete().where(inventory.c.id.in_(deleted_ids[i:i + chunk_size])))
+
+
+def discard_staging(upload_id=None, older_than=None):
+    staging = InventoryStaging.__table__
+    query = staging.delete()
+    if upload_id is not None:
+        query = query.where(staging.c.upload_id == upload_id)
+    if older_than is not None:
+        query = query.where(staging.c.created_at < datetime.utcnow() - older_than)
+    db.session.execute(query)
+    db.session.commit()
+
+
+def ingest_inventory(pharmacy_id, binary_stream, chunk_size=5000, max_errors=1000, trace_memory=True,
+                     progress=None, progress_interval=30, add_stock=False):
+    """
+    Stream a CSV upload into the pharmacy's inventory.
+
+    Rows are decoded and validated one at a time and bulk-written to the
+    staging table in chunks of `chunk_size`, committing per chunk so no
+    long transaction or large session builds up. If every row is valid the
+    staged rows are diffed against the pharmacy's inventory and only the
+    inserted, updated and deleted batches are written, in one transaction
+    that also refreshes their medicine_availability rows;
+    `result.changes` holds the change set, which is also handed to the
+    registered inventory listeners. Otherwise the staged rows are discarded
+    and `result.errors` lists the offending lines.
+
+    With `add_stock` the upload adds to the batches it lists instead of
+    replacing the inventory: rows may give a `medicine_id` instead of a
+    name, and medicines missing from the catalog are errors.
+
+    `progress(rows)`, if given, is called with the number of rows read so
+    far before each chunk commit, at least every `progress_interval`
+    seconds while rows are only being validated, and first thing in the
+    transaction that applies the diff. It runs inside the surrounding
+    transaction and may raise to abandon the upload, which is then rolled
+    back like any other failure.
+
+    With `trace_memory` the peak Python allocation during the upload is
+    measured with tracemalloc, which slows allocation-heavy code somewhat,
+    for the whole process. The figure covers every thread, and uploads that
+    start while another one is measuring report no peak memory.
+    """
+    result = IngestResult(uuid.uuid4().hex)
+    started = time.perf_counter()
+    traced = trace_memory and _trace_lock.acquire(blocking=False)
+    tracing = traced and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif traced:
+        tracemalloc.reset_peak()
+
+    try:
+        # Abandoned uploads (crashed workers) must not pile up
+        discard_staging(older_than=timedelta(days=1))
+
+        catalog = {}
+        for medicine_id, name in db.session.query(Medicine.id, Medicine.name):
+            catalog[name.lower()] = medicine_id
+        known_ids = set(catalog.values()) if add_stock else None
+
+        new_medicines = {}
+        chunk = []
+        last_progress = time.monotonic()
+
+        for line_num, row in iter_csv_rows(binary_stream):
+            result.rows += 1
+            try:
+                staged = parse_row(row, line_num, catalog, new_medicines, known_ids)
+            except KeyError as e:
+                result.errors.append(f"Line {line_num}: Missing required column: {e}")
+            except ValueError as e:
+                result.errors.append(f"Line {line_num}: Invalid data format. Check numbers and dates. Details: {e}")
+            except Exception as e:
+                result.errors.append(f"Line {line_num}: An unexpected error occurred: {e}")
+            else:
+                # Once the upload is known to fail, only keep validating
+                if not result.errors:
+                    staged['upload_id'] = result.upload_id
+                    staged['pharmacy_id'] = pharmacy_id
+                    chunk.append(staged)
+
+            if len(result.errors) >= max_errors:
+                result.errors.append(f"Stopped after {max_errors} errors.")
+                break
+
+            if len(chunk) >= chunk_size:
+                _stage_chunk(chunk)
+                if progress is not None:
+                    progress(result.rows)
+                db.session.commit()
+                chunk = []
+                last_progress = time.monotonic()
+            elif progress is not None and time.monotonic() - last_progress >= progress_interval:
+                progress(result.rows)
+                db.session.commit()
+                last_progress = time.monotonic()
+
+        if result.errors:
+            db.session.rollback()
+            discard_staging(result.upload_id)
+            return result
+
+        if chunk:
+            _stage_chunk(chunk)
+            if progress is not None:
+                progress(result.rows)
+            db.session.commit()
+
+        # Everything from here on is one transaction
+        if progress is not None:
+            progress(result.rows)
+        if new_medicines:
+            _create_new_medicines(result.upload_id, new_medicines)
+            result.new_medicines = len(new_medicines)
+
+        changes = diff_inventory(result.upload_id, pharmacy_id, add_stock)
+        apply_changes(changes)
+        refresh_availability(((pharmacy_id, medicine_id) for medicine_id in changes.medicine_ids), commit=False)
+        staging = InventoryStaging.__table__
+        db.session.execute(staging.delete().where(staging.c.upload_id == result.upload_id))
+        db.session.commit()
+        result.changes = changes
+
+    except Exception:
+        db.session.rollback()
+        discard_staging(result.upload_id)
+        raise
+
+    finally:
+        result.elapsed = time.perf_counter() - started
+        if traced:
+            result.peak_memory = tracemalloc.get_traced_memory()[1]
+            if tracing:
+                tracemalloc.stop()
+            _trace_lock.release()
+
+    notify_inventory_listeners(changes)
+    return result
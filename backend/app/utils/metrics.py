@@ -0,0 +1,297 @@
+# app/utils/metrics.py
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Request latency buckets in seconds (Prometheus defaults plus 1 ms and 2.5 ms)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+STAGES = ("geocode", "db", "compute", "serialize")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus exposition format. Values
+    are kept per label combination for the life of the process (one set
+    per worker; Prometheus sums them across scrape targets).
+    """
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return series[-1] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.labels, label_values, [("le", repr(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labels, label_values, [("le", "+Inf")])
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f"{self.name}_sum{labels} {series[-2]}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+request_duration = Histogram(
+    "medilocate_request_duration_seconds", "Request latency by endpoint.", ("endpoint", "method"))
+request_stage_duration = Histogram(
+    "medilocate_request_stage_seconds", "Time spent per request stage (geocode, db, compute, serialize).",
+    ("endpoint", "stage"))
+requests_total = Counter(
+    "medilocate_requests_total", "Requests by endpoint and status code.", ("endpoint", "method", "status"))
+db_queries_per_request = Histogram(
+    "medilocate_db_queries_per_request", "SQL statements executed per request.", ("endpoint",), QUERY_COUNT_BUCKETS)
+db_query_duration = Histogram(
+    "medilocate_db_query_seconds", "Duration of individual SQL statements.", ("endpoint",))
+backend_calls = Counter(
+    "medilocate_backend_calls_total", "Calls into the trie and graph engines by implementation.",
+    ("component", "backend"))
+slow_requests = Counter(
+    "medilocate_slow_requests_total", "Requests slower than SLOW_REQUEST_MS.", ("endpoint",))
+
+REGISTRY = [
+    request_duration, request_stage_duration, requests_total,
+    db_queries_per_request, db_query_duration, backend_calls, slow_requests,
+]
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===============================
+# Per-request recording
+# ===============================
+class RequestMetrics:
+    def __init__(self, capture_statements=False):
+        self.started = time.perf_counter()
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.queries = 0
+        self.capture_statements = capture_statements
+        self.statements = []    # (seconds, statement, parameters) when capturing
+        self.explaining = False
+
+
+def _current():
+    if not has_request_context():
+        return None
+    return g.get("_metrics")
+
+
+def _endpoint():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a block as one stage of the current request; nested and repeated
+    blocks add up. A no-op outside requests.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current()
+        if metrics is not None:
+            metrics.stages[name] += time.perf_counter() - started
+
+
+def record_backend(component, backend):
+    """
+    Count a call into `component` ("trie", "graph", "road") served by
+    `backend` ("cpp" or "python").
+    """
+    backend_calls.inc(component, backend)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("_metrics_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    metrics = _current()
+    if metrics is None or metrics.explaining:
+        return
+    metrics.queries += 1
+    metrics.stages["db"] += elapsed
+    db_query_duration.observe(elapsed, _endpoint())
+    if metrics.capture_statements and not executemany and len(metrics.statements) < 50:
+        metrics.statements.append((elapsed, statement, parameters))
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    started = context.connection.info.get("_metrics_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON provider with `dumps` timed as the serialize stage.
+    """
+
+    def dumps(self, obj, **kwargs):
+        with stage("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
+def explain(statement, parameters):
+    """
+    The database's plan for a captured SELECT, as text lines.
+    """
+    from app import db
+
+    dialect = db.engine.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(prefix + statement, parameters).fetchall()
+    if dialect == "sqlite":
+        return [row[-1] for row in rows]
+    return [" ".join(str(value) for value in row) for row in rows]
+
+
+def log_slow_request(metrics, endpoint, total, explain_plans):
+    stages = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in metrics.stages.items())
+    print(f"🐢 Slow request {request.method} {request.path} ({endpoint}): {total * 1000:.1f} ms "
+          f"[{stages}], {metrics.queries} queries")
+    if not explain_plans:
+        return
+    metrics.explaining = True
+    try:
+        for seconds, statement, parameters in sorted(metrics.statements, key=lambda s: s[0], reverse=True)[:3]:
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            print(f"   {seconds * 1000:.1f} ms: {' '.join(statement.split())[:500]}")
+            try:
+                for line in explain(statement, parameters):
+                    print(f"      {line}")
+            except Exception as e:
+                print("      ❌ Could not explain:", e)
+    finally:
+        metrics.explaining = False
+
+
+_events_registered = False
+
+
+def init_metrics(app):
+    """
+    Record stage timings, SQL statement counts and durations for every
+    request and serve them in the Prometheus text format on /metrics.
+    Requests slower than SLOW_REQUEST_MS are logged with their stages and,
+    with SLOW_REQUEST_EXPLAIN, the plans of their slowest queries.
+    """
+    global _events_registered
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    slow_ms = app.config.get("SLOW_REQUEST_MS", 0)
+    explain_plans = app.config.get("SLOW_REQUEST_EXPLAIN", False)
+
+    if not _events_registered:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        _events_registered = True
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def _start_request_metrics():
+        g._metrics = RequestMetrics(capture_statements=bool(slow_ms and explain_plans))
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        metrics = _current()
+        if metrics is None or request.path == "/metrics":
+            return response
+        total = time.perf_counter() - metrics.started
+        endpoint = _endpoint()
+        # Whatever isn't geocoding, SQL or serialization is Python work
+        metrics.stages["compute"] = max(0.0, total - metrics.stages["geocode"]
+                                        - metrics.stages["db"] - metrics.stages["serialize"])
+        request_duration.observe(total, endpoint, request.method)
+        requests_total.inc(endpoint, request.method, str(response.status_code))
+        for name, seconds in metrics.stages.items():
+            request_stage_duration.observe(seconds, endpoint, name)
+        db_queries_per_request.observe(metrics.queries, endpoint)
+        if slow_ms and total * 1000 >= slow_ms:
+            slow_requests.inc(endpoint)
+            log_slow_request(metrics, endpoint, total, explain_plans)
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,99 @@
+# app/utils/ngram_index.py
+
+import threading
+import time
+
+
+class NGramIndex:
+    """
+    Inverted index from character n-grams to item ids, used to answer
+    case-insensitive substring queries (the `ILIKE '%q%'` semantics of the
+    old searches) without scanning every name.
+
+    A query of at least `n` characters is resolved by intersecting the
+    posting lists of its n-grams and verifying the survivors; shorter queries
+    fall back to a scan of the indexed names, which is still far smaller than
+    the inventory table.
+    """
+
+    def __init__(self, n=3):
+        self.n = n
+        self.texts = {}         # id -> lowercased text
+        self.postings = {}      # n-gram -> set of ids
+        self.max_id = 0         # highest id indexed
+        self.synced_at = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _grams(self, text):
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def add(self, item_id, text):
+        text = text.lower()
+        with self._lock:
+            if item_id in self.texts:
+                self._unlink(item_id)
+            self.texts[item_id] = text
+            for gram in self._grams(text):
+                self.postings.setdefault(gram, set()).add(item_id)
+            self.max_id = max(self.max_id, item_id)
+
+    def ids(self):
+        with self._lock:
+            return set(self.texts)
+
+    def remove(self, item_id):
+        with self._lock:
+            if item_id in self.texts:
+                self._unlink(item_id)
+                del self.texts[item_id]
+
+    def _unlink(self, item_id):
+        for gram in self._grams(self.texts[item_id]):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def rebuild(self, items):
+        """
+        Replace the index contents with an iterable of (id, text).
+        """
+        with self._lock:
+            self.texts = {}
+            self.postings = {}
+            self.max_id = 0
+            for item_id, text in items:
+                self.add(item_id, text)
+            self.synced_at = time.time()
+
+    def search(self, query):
+        """
+        Return the set of ids whose text contains `query`, ignoring case.
+        """
+        query = query.lower()
+        with self._lock:
+            if len(query) < self.n:
+                return {item_id for item_id, text in self.texts.items() if query in text}
+
+            postings = []
+            for gram in self._grams(query):
+                ids = self.postings.get(gram)
+                if not ids:
+                    return set()
+                postings.append(ids)
+
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for ids in postings[1:]:
+                candidates &= ids
+                if not candidates:
+                    return candidates
+
+            return {item_id for item_id in candidates if query in self.texts[item_id]}
+
+
+medicine_name_index = NGramIndex()
@@ -0,0 +1,193 @@
+# app/utils/pharmacy_onboarding.py
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import User
+from app.utils.geocode_utils import geocode_addresses, normalize_address
+from app.utils.inventory_ingest import iter_csv_rows
+from app.utils.search_cache import invalidate_pharmacy
+from app.utils.spatial_index import add_pharmacy
+
+# Bulk registration of pharmacy accounts from a CSV with the register
+# fields: name,email,password,address_line,city,state,postal_code,country.
+# Rows may give one `address` column instead of the address parts, and
+# leave `password` empty when a default password is supplied.
+ADDRESS_COLUMNS = ('address_line', 'city', 'state', 'postal_code', 'country')
+
+
+def compose_address(address_line, city, state, postal_code, country):
+    return f"{address_line}, {city}, {state}, {postal_code}, {country}"
+
+
+class OnboardingResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = []     # {'line', 'email', 'id', 'latitude', 'longitude'}
+        self.failures = []    # {'line', 'email', 'error'}
+        self.unique_addresses = 0
+        self.elapsed = 0.0
+        self.geocode_seconds = 0.0
+
+    def fail(self, row, error):
+        self.failures.append({'line': row['line'], 'email': row.get('email'), 'error': error})
+
+    def stats(self):
+        return {
+            'rows': self.rows,
+            'created': len(self.created),
+            'failed': len(self.failures),
+            'unique_addresses': self.unique_addresses,
+            'geocode_seconds': round(self.geocode_seconds, 3),
+            'seconds': round(self.elapsed, 3),
+        }
+
+
+def parse_pharmacy_row(row, line_num, default_password):
+    """
+    Validate one CSV row. Returns the account fields or raises ValueError.
+    """
+    name = (row.get('name') or '').strip()
+    email = (row.get('email') or '').strip()
+    password = row.get('password') or default_password
+    if row.get('address'):
+        address = row['address'].strip()
+    else:
+        parts = [(row.get(column) or '').strip() for column in ADDRESS_COLUMNS]
+        if not all(parts):
+            raise ValueError(f"Missing address fields: {', '.join(c for c, p in zip(ADDRESS_COLUMNS, parts) if not p)}")
+        address = compose_address(*parts)
+    if not name:
+        raise ValueError("Name is required")
+    if '@' not in email:
+        raise ValueError("A valid email is required")
+    if not password:
+        raise ValueError("Password is required")
+    return {'line': line_num, 'name': name, 'email': email, 'password': password, 'address': address}
+
+
+def _registered_emails(emails, chunk_size=500):
+    found = set()
+    emails = list(emails)
+    for i in range(0, len(emails), chunk_size):
+        found.update(email for (email,) in db.session.query(User.email).filter(User.email.in_(emails[i:i + chunk_size])))
+    return found
+
+
+def _insert_accounts(rows, result):
+    """
+    Insert one chunk of accounts in a single statement. If an email was
+    registered in the meantime the chunk is retried without it.
+    """
+    users = User.__table__
+    while rows:
+        try:
+            db.session.execute(users.insert(), [
+                {
+                    'name': row['name'], 'email': row['email'], 'password': row['password_hash'],
+                    'is_pharmacy': True, 'address': row['address'],
+                    'latitude': row['latitude'], 'longitude': row['longitude'],
+                }
+                for row in rows
+            ])
+            db.session.commit()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            taken = _registered_emails(row['email'] for row in rows)
+            if not taken:
+                raise
+            for row in rows:
+                if row['email'] in taken:
+                    result.fail(row, "Email already registered")
+            rows = [row for row in rows if row['email'] not in taken]
+
+    ids = {}
+    for i in range(0, len(rows), 500):
+        emails = [row['email'] for row in rows[i:i + 500]]
+        ids.update(db.session.query(User.email, User.id).filter(User.email.in_(emails)))
+    for row in rows:
+        user_id = ids[row['email']]
+        result.created.append({
+            'line': row['line'], 'email': row['email'], 'id': user_id,
+            'latitude': row['latitude'], 'longitude': row['longitude'],
+        })
+        add_pharmacy(user_id, row['latitude'], row['longitude'])
+        invalidate_pharmacy(user_id, row['latitude'], row['longitude'])
+
+
+def onboard_pharmacies(binary_stream, default_password=None, dry_run=False, chunk_size=500,
+                       max_rows=None, hash_workers=None):
+    """
+    Register every valid pharmacy in a CSV upload.
+
+    Rows are validated and checked against registered emails first; the
+    distinct addresses are then geocoded concurrently under the geocoder's
+    rate limit with retries (app.utils.geocode_utils.geocode_addresses),
+    passwords hashed on a thread pool (PBKDF2 releases the GIL) and the
+    accounts bulk-inserted `chunk_size` at a time. Rows that fail at any
+    step are listed in `result.failures` and don't stop the others. With
+    `dry_run` nothing is written. Raises ValueError when the file has more
+    than `max_rows` rows.
+    """
+    result = OnboardingResult()
+    started = time.perf_counter()
+
+    rows = []
+    seen_emails = set()
+    for line_num, raw in iter_csv_rows(binary_stream):
+        result.rows += 1
+        if max_rows is not None and result.rows > max_rows:
+            raise ValueError(f"At most {max_rows} pharmacies can be registered per upload")
+        try:
+            row = parse_pharmacy_row(raw, line_num, default_password)
+        except ValueError as e:
+            result.fail({'line': line_num, 'email': raw.get('email')}, str(e))
+            continue
+        if row['email'].lower() in seen_emails:
+            result.fail(row, "Email listed more than once in the file")
+            continue
+        seen_emails.add(row['email'].lower())
+        rows.append(row)
+
+    taken = _registered_emails(row['email'] for row in rows)
+    for row in rows:
+        if row['email'] in taken:
+            result.fail(row, "Email already registered")
+    rows = [row for row in rows if row['email'] not in taken]
+
+    geocode_started = time.perf_counter()
+    locations, errors = geocode_addresses([row['address'] for row in rows])
+    result.geocode_seconds = time.perf_counter() - geocode_started
+    result.unique_addresses = len({normalize_address(row['address']) for row in rows})
+    located = []
+    for row in rows:
+        location = locations.get(row['address'])
+        if location is None:
+            error = errors.get(row['address'])
+            result.fail(row, f"Could not geocode address: {error}" if error else "Invalid address, could not geocode")
+            continue
+        row['latitude'], row['longitude'] = location
+        located.append(row)
+
+    if not dry_run and located:
+        with ThreadPoolExecutor(max_workers=hash_workers or os.cpu_count() or 1) as pool:
+            for row, password_hash in zip(located, pool.map(generate_password_hash, [row['password'] for row in located])):
+                row['password_hash'] = password_hash
+        for i in range(0, len(located), chunk_size):
+            _insert_accounts(located[i:i + chunk_size], result)
+    elif dry_run:
+        result.created = [
+            {'line': row['line'], 'email': row['email'], 'id': None,
+             'latitude': row['latitude'], 'longitude': row['longitude']}
+            for row in located
+        ]
+
+    result.failures.sort(key=lambda failure: failure['line'])
+    result.elapsed = time.perf_counter() - started
+    return result
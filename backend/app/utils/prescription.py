@@ -0,0 +1,122 @@
+# app/utils/prescription.py
+
+import heapq
+
+
+class PrescriptionPlan:
+    """
+    A set of pharmacies that together stock a prescription. `assignment`
+    maps each item to the option (index into the planner's options) it is
+    bought from: the cheapest of the chosen pharmacies, the nearest on ties.
+    """
+
+    def __init__(self, chosen, assignment, total_distance, total_price, score):
+        self.chosen = chosen
+        self.assignment = assignment
+        self.total_distance = total_distance
+        self.total_price = total_price
+        self.score = score
+
+    def sort_key(self):
+        return (len(self.chosen), self.score)
+
+
+def _evaluate(options, chosen, items, km_cost):
+    assignment = {}
+    total_price = 0.0
+    for item in items:
+        best = min(
+            (i for i in chosen if item in options[i][2]),
+            key=lambda i: (options[i][2][item], options[i][1]),
+        )
+        assignment[item] = best
+        total_price += options[best][2][item]
+    # A pharmacy undercut on every item it stocks is dropped from the plan
+    chosen = sorted(set(assignment.values()), key=lambda i: options[i][1])
+    total_distance = sum(options[i][1] for i in chosen)
+    return PrescriptionPlan(chosen, assignment, total_distance, total_price, total_distance * km_cost + total_price)
+
+
+def _greedy_cover(options, items, km_cost):
+    """
+    Classic greedy set cover: repeatedly take the pharmacy with the most
+    uncovered items per unit of cost (distance weighted by km_cost plus
+    the prices of the items it would supply).
+    """
+    uncovered = set(items)
+    chosen = []
+    while uncovered:
+        best, best_ratio = None, 0.0
+        for i, (_, distance, prices) in enumerate(options):
+            if i in chosen:
+                continue
+            new_items = uncovered & prices.keys()
+            if not new_items:
+                continue
+            ratio = len(new_items) / (1.0 + distance * km_cost + sum(prices[item] for item in new_items))
+            if ratio > best_ratio:
+                best, best_ratio = i, ratio
+        if best is None:
+            break
+        chosen.append(best)
+        uncovered -= options[best][2].keys()
+    return chosen
+
+
+def plan_prescription(options, item_count, max_pharmacies=3, limit=5, km_cost=1.0):
+    """
+    Rank sets of pharmacies covering a prescription of `item_count` items.
+
+    `options` is a list of (pharmacy_id, distance_km, {item: price}) with
+    items numbered 0..item_count-1. Plans are ranked by number of
+    pharmacies first, then by distance * km_cost + total price.
+
+    Exact search is bounded: sets are grown only with pharmacies stocking
+    the lowest-numbered item still missing (so no pharmacy is redundant
+    when added), one size at a time up to `max_pharmacies`, stopping at
+    the first size that yields `limit` plans. If no set that small covers
+    everything, a single greedy cover is returned instead.
+
+    Returns (plans, unavailable items).
+    """
+    stocked = set()
+    for _, _, prices in options:
+        stocked.update(prices)
+    unavailable = [item for item in range(item_count) if item not in stocked]
+    items = sorted(stocked)
+    if not items:
+        return [], unavailable
+
+    full = frozenset(items)
+    by_item = {item: [] for item in items}
+    for i in sorted(range(len(options)), key=lambda i: options[i][1]):
+        for item in options[i][2]:
+            by_item[item].append(i)
+
+    plans = []
+    seen = set()
+
+    def extend(chosen, covered, size):
+        if covered == full:
+            plan = _evaluate(options, chosen, items, km_cost)
+            key = frozenset(plan.chosen)
+            if key not in seen:
+                seen.add(key)
+                plans.append(plan)
+            return
+        if len(chosen) == size:
+            return
+        missing = min(full - covered)
+        for i in by_item[missing]:
+            extend(chosen + [i], covered | options[i][2].keys(), size)
+
+    for size in range(1, max_pharmacies + 1):
+        extend([], frozenset(), size)
+        if len(plans) >= limit:
+            break
+
+    if not plans:
+        chosen = _greedy_cover(options, items, km_cost)
+        plans.append(_evaluate(options, chosen, items, km_cost))
+
+    return heapq.nsmallest(limit, plans, key=PrescriptionPlan.sort_key), unavailable
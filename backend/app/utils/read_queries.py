@@ -0,0 +1,112 @@
+# app/utils/read_queries.py
+
+from sqlalchemy import bindparam, select
+
+from app import db
+from app.models import User, Medicine, MedicineAvailability
+
+# Read side of the search endpoints: SQLAlchemy Core statements selecting
+# only the columns each response uses, built once at import. List
+# parameters are expanding bind parameters, so every call reuses the same
+# statement and its compiled form from the engine's cache
+# (SQLALCHEMY_ENGINE_OPTIONS["query_cache_size"]). Results are Row tuples
+# with attribute access; no ORM entities are loaded or tracked.
+users = User.__table__
+medicines = Medicine.__table__
+availability = MedicineAvailability.__table__
+
+_pharmacy_locations = (
+    select(users.c.id, users.c.latitude, users.c.longitude)
+    .where(users.c.is_pharmacy == True)
+    .where(users.c.latitude.isnot(None), users.c.longitude.isnot(None))
+)
+
+_pharmacy_cards = (
+    select(users.c.id, users.c.name, users.c.address, users.c.latitude, users.c.longitude)
+    .where(users.c.is_pharmacy == True)
+    .where(users.c.id.in_(bindparam("pharmacy_ids", expanding=True)))
+)
+
+_availability_rows = (
+    select(
+        availability.c.pharmacy_id,
+        availability.c.medicine_id,
+        availability.c.total_stock,
+        availability.c.min_price,
+        availability.c.earliest_expiry,
+        medicines.c.name.label("medicine_name"),
+        users.c.name.label("pharmacy_name"),
+        users.c.address.label("pharmacy_address"),
+    )
+    .join(medicines, medicines.c.id == availability.c.medicine_id)
+    .join(users, users.c.id == availability.c.pharmacy_id)
+    .where(users.c.is_pharmacy == True)
+    .where(availability.c.pharmacy_id.in_(bindparam("pharmacy_ids", expanding=True)))
+    .where(availability.c.medicine_id.in_(bindparam("medicine_ids", expanding=True)))
+    .order_by(availability.c.pharmacy_id, medicines.c.name)
+)
+
+_stocking_pharmacies = (
+    select(users.c.id)
+    .distinct()
+    .join(availability, availability.c.pharmacy_id == users.c.id)
+    .where(users.c.is_pharmacy == True)
+    .where(users.c.latitude.isnot(None), users.c.longitude.isnot(None))
+    .where(availability.c.medicine_id.in_(bindparam("medicine_ids", expanding=True)))
+)
+
+_medicine_ids_named = select(medicines.c.id).where(medicines.c.name.in_(bindparam("names", expanding=True)))
+
+
+def pharmacy_locations():
+    """
+    (id, latitude, longitude) of every located pharmacy.
+    """
+    return db.session.execute(_pharmacy_locations).all()
+
+
+def pharmacy_cards(pharmacy_ids):
+    """
+    {id: (id, name, address, latitude, longitude)} for the given pharmacy
+    accounts; other ids are left out.
+    """
+    if not pharmacy_ids:
+        return {}
+    rows = db.session.execute(_pharmacy_cards, {"pharmacy_ids": list(pharmacy_ids)})
+    return {row.id: row for row in rows}
+
+
+def pharmacy_card(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "address": row.address,
+        "latitude": row.latitude,
+        "longitude": row.longitude
+    }
+
+
+def availability_rows(pharmacy_ids, medicine_ids):
+    """
+    Summary rows for the given pharmacies and medicines with the medicine
+    and pharmacy names, ordered by pharmacy then medicine name.
+    """
+    if not pharmacy_ids or not medicine_ids:
+        return []
+    params = {"pharmacy_ids": list(pharmacy_ids), "medicine_ids": list(medicine_ids)}
+    return db.session.execute(_availability_rows, params).all()
+
+
+def pharmacies_stocking(medicine_ids):
+    """
+    Ids of located pharmacies holding a summary row for any of the medicines.
+    """
+    if not medicine_ids:
+        return []
+    return db.session.execute(_stocking_pharmacies, {"medicine_ids": list(medicine_ids)}).scalars().all()
+
+
+def medicine_ids_named(names):
+    if not names:
+        return []
+    return db.session.execute(_medicine_ids_named, {"names": list(names)}).scalars().all()
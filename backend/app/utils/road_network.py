@@ -0,0 +1,364 @@
+# app/utils/road_network.py
+
+import csv
+import heapq
+import operator
+import os
+import re
+import struct
+import xml.etree.ElementTree as ET
+from array import array
+from itertools import islice
+
+from app.utils.geo import haversine, rank_by_distance
+from app.utils.graph_interface import CPP_AVAILABLE, dijkstra_graph, INF
+from app.utils.metrics import record_backend
+from app.utils.spatial_index import SpatialIndex
+
+# ===============================
+# Binary format
+# ===============================
+# Header (magic, node count, edge count, top speed in km/h), then the
+# arrays back to back in native little-endian layout: lats[n], lons[n],
+# offsets[n + 1], targets[m], lengths_km[m], times_h[m]. The same layout is
+# read by dijkstra_graph.RoadGraph.load.
+ROAD_MAGIC = b"MROAD\x00\x01\x00"
+_HEADER = struct.Struct("<8sqqd")
+
+# Travel speeds (km/h) when a way has no usable maxspeed tag
+DEFAULT_SPEEDS = {
+    "motorway": 100, "trunk": 80, "primary": 60, "secondary": 50, "tertiary": 40,
+    "unclassified": 30, "residential": 30, "living_street": 10, "service": 20,
+    "motorway_link": 60, "trunk_link": 50, "primary_link": 40, "secondary_link": 40,
+    "tertiary_link": 30, "road": 30,
+}
+DEFAULT_SPEED = 30
+
+
+class RoadNetworkData:
+    """
+    A road graph in compressed sparse row form with node coordinates.
+    Built by the loaders below, written with `save` and read back by the
+    routing engines.
+    """
+
+    def __init__(self, lats, lons, offsets, targets, lengths, times, max_speed):
+        self.lats = lats
+        self.lons = lons
+        self.offsets = offsets
+        self.targets = targets
+        self.lengths = lengths      # km
+        self.times = times          # hours
+        self.max_speed = max_speed  # km/h, bounds the A* time heuristic
+
+    @property
+    def num_nodes(self):
+        return len(self.lats)
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    @classmethod
+    def from_edges(cls, coords, edges):
+        """
+        Compact {node key: (lat, lon)} and [(from key, to key, km or None,
+        km/h)] into dense arrays. Lengths shorter than the straight line are
+        raised to it so the A* heuristic stays admissible; nodes without
+        edges are dropped.
+        """
+        used = {}
+        for u, v, _, _ in edges:
+            for key in (u, v):
+                if key not in used:
+                    used[key] = len(used)
+
+        adjacency = [[] for _ in range(len(used))]
+        max_speed = 1.0
+        for u, v, length, speed in edges:
+            if u == v:
+                continue
+            straight = haversine(*coords[u], *coords[v])
+            length = max(length or 0.0, straight)
+            adjacency[used[u]].append((used[v], length, length / speed))
+            max_speed = max(max_speed, speed)
+
+        lats, lons = array("d"), array("d")
+        for key in used:
+            lat, lon = coords[key]
+            lats.append(lat)
+            lons.append(lon)
+
+        offsets, targets = array("q", [0]), array("q")
+        lengths, times = array("d"), array("d")
+        for edges_out in adjacency:
+            for target, length, hours in edges_out:
+                targets.append(target)
+                lengths.append(length)
+                times.append(hours)
+            offsets.append(len(targets))
+        return cls(lats, lons, offsets, targets, lengths, times, float(max_speed))
+
+    def save(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(ROAD_MAGIC, self.num_nodes, self.num_edges, self.max_speed))
+            for values in (self.lats, self.lons, self.offsets, self.targets, self.lengths, self.times):
+                values.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError("Road graph file is truncated")
+            magic, n, m, max_speed = _HEADER.unpack(header)
+            if magic != ROAD_MAGIC:
+                raise ValueError("Not a road graph file")
+            if n < 0 or m < 0:
+                raise ValueError("Corrupt road graph header")
+            # Check the size up front: array.fromfile raises EOFError on a short read
+            layout = (("d", n), ("d", n), ("q", n + 1), ("q", m), ("d", m), ("d", m))
+            expected = _HEADER.size + sum(array(typecode).itemsize * count for typecode, count in layout)
+            if os.fstat(f.fileno()).st_size < expected:
+                raise ValueError("Road graph file is truncated")
+            arrays = []
+            for typecode, count in layout:
+                values = array(typecode)
+                values.fromfile(f, count)
+                arrays.append(values)
+        # The engines index by these without bounds checks
+        _, _, offsets, targets, _, _ = arrays
+        if offsets[0] != 0 or offsets[-1] != m or not all(map(operator.le, offsets, islice(offsets, 1, None))):
+            raise ValueError("Corrupt road graph offsets")
+        if m and (min(targets) < 0 or max(targets) >= n):
+            raise ValueError("Corrupt road graph targets")
+        return cls(*arrays, max_speed)
+
+
+# ===============================
+# Loaders
+# ===============================
+def parse_speed(value, default):
+    """
+    km/h from an OSM maxspeed tag ("50", "30 mph"); `default` otherwise.
+    """
+    match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", value or "")
+    if not match:
+        return default
+    speed = float(match.group(1))
+    return speed * 1.609344 if match.group(2) else speed
+
+
+def load_osm_xml(path):
+    """
+    Read drivable ways from an OSM XML extract (.osm). PBF extracts can be
+    converted first, e.g. `osmium cat extract.osm.pbf -o extract.osm`.
+    """
+    coords = {}
+    ways = []
+    for _, element in ET.iterparse(path, events=("end",)):
+        if element.tag == "node":
+            coords[element.get("id")] = (float(element.get("lat")), float(element.get("lon")))
+            element.clear()
+        elif element.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in element.findall("tag")}
+            highway = tags.get("highway")
+            if highway in DEFAULT_SPEEDS:
+                refs = [nd.get("ref") for nd in element.findall("nd")]
+                ways.append((refs, tags, highway))
+            element.clear()
+
+    edges = []
+    for refs, tags, highway in ways:
+        refs = [ref for ref in refs if ref in coords]
+        speed = parse_speed(tags.get("maxspeed"), DEFAULT_SPEEDS[highway])
+        oneway = tags.get("oneway")
+        for u, v in zip(refs, refs[1:]):
+            if oneway == "-1":
+                edges.append((v, u, None, speed))
+                continue
+            edges.append((u, v, None, speed))
+            if oneway not in ("yes", "true", "1") and highway != "motorway":
+                edges.append((v, u, None, speed))
+    return RoadNetworkData.from_edges(coords, edges)
+
+
+def load_edge_csv(path):
+    """
+    Read a CSV edge list with columns from_lat, from_lon, to_lat, to_lon and
+    optional length_km, speed_kmh and oneway (edges are two-way unless
+    oneway is 1/true/yes). Endpoints with equal coordinates are one node.
+    """
+    coords = {}
+    edges = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            u = (float(row["from_lat"]), float(row["from_lon"]))
+            v = (float(row["to_lat"]), float(row["to_lon"]))
+            coords[u], coords[v] = u, v
+            length = float(row["length_km"]) if row.get("length_km") else None
+            speed = float(row["speed_kmh"]) if row.get("speed_kmh") else DEFAULT_SPEED
+            edges.append((u, v, length, speed))
+            if (row.get("oneway") or "").strip().lower() not in ("1", "true", "yes"):
+                edges.append((v, u, length, speed))
+    return RoadNetworkData.from_edges(coords, edges)
+
+
+def load_road_source(path):
+    if path.endswith(".csv"):
+        return load_edge_csv(path)
+    if path.endswith(".osm") or path.endswith(".xml"):
+        return load_osm_xml(path)
+    raise ValueError(f"Unsupported road network file: {path} (use .osm XML or a .csv edge list)")
+
+
+# ===============================
+# Routing engines
+# ===============================
+# Python fallback implementation of dijkstra_graph.RoadGraph
+class PythonRoadGraph:
+    def __init__(self, data):
+        self.data = data
+        self.num_nodes = data.num_nodes
+        self.num_edges = data.num_edges
+
+    @classmethod
+    def load(cls, path):
+        return cls(RoadNetworkData.load(path))
+
+    def nearest_node(self, lat, lon):
+        ranked = rank_by_distance(lat, lon, self.data.lats, self.data.lons)
+        return ranked[0][1] if ranked else -1
+
+    def route(self, source, target, by_time=False):
+        """
+        A* from node `source` to node `target`, minimising length or travel
+        time. Returns (path node list, km, hours); an empty path if no
+        route exists.
+        """
+        data = self.data
+        weights = data.times if by_time else data.lengths
+        offsets, targets = data.offsets, data.targets
+        lats, lons = data.lats, data.lons
+        target_lat, target_lon = lats[target], lons[target]
+        scale = 1.0 / data.max_speed if by_time else 1.0
+
+        def estimate(node):
+            return haversine(lats[node], lons[node], target_lat, target_lon) * scale
+
+        best = {source: 0.0}
+        pred = {source: (-1, -1)}
+        pq = [(estimate(source), 0.0, source)]
+        closed = set()
+        while pq:
+            _, cost, u = heapq.heappop(pq)
+            if u in closed:
+                continue
+            if u == target:
+                break
+            closed.add(u)
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                nc = cost + weights[e]
+                if nc < best.get(v, INF):
+                    best[v] = nc
+                    pred[v] = (u, e)
+                    heapq.heappush(pq, (nc + estimate(v), nc, v))
+
+        if target not in pred:
+            return [], INF, INF
+        path, km, hours = [], 0.0, 0.0
+        node = target
+        while node >= 0:
+            path.append(node)
+            node, edge = pred[node]
+            if edge >= 0:
+                km += data.lengths[edge]
+                hours += data.times[edge]
+        path.reverse()
+        return path, km, hours
+
+    def coordinates(self, path):
+        return [(self.data.lats[node], self.data.lons[node]) for node in path]
+
+
+def load_road_graph(path):
+    """
+    Load a preprocessed road graph file into the C++ engine when available,
+    the Python fallback otherwise.
+    """
+    if CPP_AVAILABLE and dijkstra_graph is not None:
+        return dijkstra_graph.RoadGraph.load(path)
+    return PythonRoadGraph.load(path)
+
+
+class RoadNetwork:
+    """
+    Travel distance and time queries between coordinates: both ends are
+    snapped to the nearest road node (refused beyond `snap_max_km`) and
+    routed with A*. Snapping goes through a k-d tree over the nodes built
+    at load, for either engine, instead of their linear `nearest_node`.
+    """
+
+    def __init__(self, graph, snap_max_km=2.0):
+        self.graph = graph
+        self.snap_max_km = snap_max_km
+        self.nodes = SpatialIndex()
+        self.nodes.rebuild(
+            (node, lat, lon)
+            for node, (lat, lon) in enumerate(graph.coordinates(list(range(graph.num_nodes))))
+        )
+
+    def snap(self, lat, lon):
+        hits = self.nodes.nearest(lat, lon, 1, max_km=self.snap_max_km)
+        return hits[0][1] if hits else None
+
+    def route(self, from_lat, from_lon, to_lat, to_lon, by_time=False):
+        """
+        Returns {"distance_km", "duration_min", "geometry"} or None when an
+        end is off the network or no route connects them.
+        """
+        source = self.snap(from_lat, from_lon)
+        target = self.snap(to_lat, to_lon)
+        if source is None or target is None:
+            return None
+        record_backend("road", "python" if isinstance(self.graph, PythonRoadGraph) else "cpp")
+        path, km, hours = self.graph.route(source, target, by_time)
+        if not path:
+            return None
+        return {
+            "distance_km": km,
+            "duration_min": hours * 60,
+            "geometry": [[lat, lon] for lat, lon in self.graph.coordinates(path)],
+        }
+
+
+road_network = None
+
+
+def init_road_network(app):
+    """
+    Load the preprocessed road graph named by ROAD_GRAPH_PATH, if present.
+    Build it offline with `python build_road_graph.py <extract> <output>`.
+    """
+    global road_network
+    path = app.config.get("ROAD_GRAPH_PATH")
+    if not path or not os.path.exists(path):
+        road_network = None
+        return None
+    try:
+        graph = load_road_graph(path)
+        road_network = RoadNetwork(graph, app.config.get("ROAD_SNAP_MAX_KM", 2.0))
+        print(f"✅ Road network loaded: {graph.num_nodes} nodes, {graph.num_edges} edges.")
+    except (OSError, ValueError, RuntimeError) as e:
+        print("❌ Error loading road network:", e)
+        road_network = None
+    return road_network
+
+
+def get_road_network():
+    return road_network
@@ -0,0 +1,154 @@
+# app/utils/routing_graph.py
+
+import threading
+from array import array
+
+from app.utils.geo import haversine, rank_by_distance
+from app.utils.graph_interface import CSRGraph, INF
+from app.utils.spatial_index import pharmacy_index
+
+USER_NODE = "USER"
+
+
+class RoutingGraph:
+    """
+    Sparse k-nearest-neighbour graph over pharmacy locations.
+
+    Each pharmacy is linked to its `k` closest pharmacies (edges are kept in
+    both directions), giving O(N * k) edges instead of the N² of a complete
+    graph. The graph follows the shared spatial index: pharmacies added or
+    removed there are patched in on the next `sync`, and a full rebuild only
+    happens when most of the index changed.
+    """
+
+    def __init__(self, index, k=6):
+        self.index = index
+        self.k = k
+        self.adjacency = {}     # str(id) -> {str(id): km}
+        self.csr = CSRGraph.from_adjacency({})
+        self.version = None
+        self._lock = threading.Lock()
+
+    def sync(self):
+        with self._lock:
+            if self.version == self.index.version:
+                return
+            version = self.index.version
+            current = {str(point_id) for point_id in self.index.ids()}
+            known = set(self.adjacency)
+            added = current - known
+            removed = known - current
+
+            if not known or len(added) + len(removed) > len(current) // 2:
+                self._rebuild(current)
+            else:
+                for node in removed:
+                    self._remove_node(node)
+                for node in added:
+                    self._link_node(node)
+            self.csr = CSRGraph.from_adjacency({node: edges.items() for node, edges in self.adjacency.items()})
+            self.version = version
+
+    def _rebuild(self, nodes):
+        self.adjacency = {node: {} for node in nodes}
+        for node in nodes:
+            self._link_node(node)
+
+    def _link_node(self, node):
+        lat, lon = self.index.get(int(node))
+        edges = self.adjacency.setdefault(node, {})
+        # k + 1 because the node itself is its own nearest neighbour
+        for distance, neighbour_id in self.index.nearest(lat, lon, self.k + 1):
+            neighbour = str(neighbour_id)
+            if neighbour == node:
+                continue
+            edges[neighbour] = distance
+            self.adjacency.setdefault(neighbour, {})[node] = distance
+
+    def _remove_node(self, node):
+        for neighbour in self.adjacency.pop(node, {}):
+            self.adjacency.get(neighbour, {}).pop(node, None)
+
+    def route_to_nearest(self, lat, lon, target_ids, attach_k=None):
+        """
+        Attach the user to their `attach_k` nearest pharmacies and run a
+        single multi-target Dijkstra search towards `target_ids`.
+        Returns (pharmacy_id, distance_km, path) or None.
+        """
+        self.sync()
+        csr = self.csr
+        targets = {str(target) for target in target_ids if target in self.index}
+        if not targets:
+            return None
+
+        sources = {
+            str(pharmacy_id): distance
+            for distance, pharmacy_id in self.index.nearest(lat, lon, attach_k or self.k)
+        }
+        result = csr.nearest_target(sources, targets)
+
+        if result is None:
+            # Target sits in a component the user is not attached to: fall
+            # back to the closest target by straight-line distance.
+            targets = list(targets)
+            coords = [self.index.get(int(target)) for target in targets]
+            distance, nearest = rank_by_distance(
+                lat, lon, [c[0] for c in coords], [c[1] for c in coords]
+            )[0]
+            return int(targets[nearest]), distance, [USER_NODE, targets[nearest]]
+
+        target, distance, path = result
+        return int(target), distance, [USER_NODE] + path
+
+
+    def stop_matrix(self, lat, lon, stop_ids, attach_k=None):
+        """
+        Graph distances between the user (node 0) and the pharmacies in
+        `stop_ids` (nodes 1..n), for the tour solvers. Returns a flat
+        row-major array('d') and {(i, j): hop path} for every leg. Each
+        row is one multi-goal Dijkstra run; stops the graph doesn't connect
+        fall back to straight-line distance. Edges are symmetric, so legs
+        back to the user mirror the outbound ones.
+        """
+        self.sync()
+        csr = self.csr
+        stops = [str(stop) for stop in stop_ids]
+        coords = [(lat, lon)] + [self.index.get(int(stop)) for stop in stops]
+        labels = [USER_NODE] + stops
+        n = len(labels)
+        matrix = array("d", [0.0]) * (n * n)
+        paths = {}
+
+        attach = {
+            str(pharmacy_id): distance
+            for distance, pharmacy_id in self.index.nearest(lat, lon, attach_k or self.k)
+        }
+        for i in range(n):
+            seeds = attach if i == 0 else {stops[i - 1]: 0.0}
+            seeds = {node: d for node, d in seeds.items() if node in csr}
+            dist = pred = None
+            if seeds:
+                _, dist, pred = csr.run(seeds, stops)
+
+            for j in range(1, n):
+                if j == i:
+                    continue
+                target = csr.index.get(stops[j - 1])
+                if dist is not None and target is not None and dist[target] != INF:
+                    distance = dist[target]
+                    path = csr.path_to(pred, stops[j - 1])
+                    if i == 0:
+                        path = [USER_NODE] + path
+                else:
+                    distance = haversine(*coords[i], *coords[j])
+                    path = [labels[i], labels[j]]
+                matrix[i * n + j] = distance
+                paths[(i, j)] = path
+
+        for j in range(1, n):
+            matrix[j * n] = matrix[j]
+            paths[(j, 0)] = list(reversed(paths[(0, j)]))
+        return matrix, paths
+
+
+routing_graph = RoutingGraph(pharmacy_index)
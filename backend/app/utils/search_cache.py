@@ -0,0 +1,154 @@
+# app/utils/search_cache.py
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from app import db
+from app.models import User
+from app.utils.geo import distances_from, geohash_encode, geohash_decode
+from app.utils.inventory_ingest import ORDER_CACHES, register_inventory_listener
+from app.utils.spatial_index import pharmacy_index
+
+
+def normalize_query(text):
+    return re.sub(r"\s+", " ", str(text).strip().lower())
+
+
+class SearchResultCache:
+    """
+    LRU + TTL cache for search responses, keyed by the normalized query and
+    the geohash cell of the searcher.
+
+    Searches in one cell are answered from the cell's centre so every
+    request there shares an entry. Each entry records its search frontier:
+    the distance from the centre out to which pharmacies were examined
+    (infinite when the search ran out of candidates). A change at a
+    pharmacy can only alter entries whose frontier reaches it, so
+    `invalidate_near` drops exactly those. The cache is per process; the
+    TTL bounds how long changes made through other workers go unseen.
+    """
+
+    def __init__(self, max_entries=1024, ttl=120, precision=7):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.precision = precision
+        self._entries = OrderedDict()   # key -> (value, expires_at, lat, lon, frontier_km)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def locate(self, lat, lon):
+        """
+        Return (cell, lat, lon) with the coordinates moved to the cell
+        centre, or (None, lat, lon) when caching is off.
+        """
+        if not self.enabled:
+            return None, lat, lon
+        cell = geohash_encode(lat, lon, self.precision)
+        center_lat, center_lon = geohash_decode(cell)
+        return cell, center_lat, center_lon
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, lat, lon, frontier_km):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl, lat, lon, frontier_km)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_near(self, lat, lon):
+        """
+        Drop every entry whose search frontier reaches (lat, lon).
+        Returns the number of entries dropped.
+        """
+        with self._lock:
+            if not self._entries:
+                return 0
+            keys = list(self._entries)
+            entries = [self._entries[key] for key in keys]
+            distances = distances_from(lat, lon, [e[2] for e in entries], [e[3] for e in entries])
+            stale = [key for key, entry, distance in zip(keys, entries, distances) if distance <= entry[4] + 1e-6]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+search_cache = SearchResultCache()
+
+
+def init_search_cache(app):
+    """
+    Apply the app config to the shared cache (SEARCH_CACHE_SIZE=0 disables it).
+    """
+    config = app.config
+    search_cache.max_entries = config.get("SEARCH_CACHE_SIZE", 1024)
+    search_cache.ttl = config.get("SEARCH_CACHE_TTL", 120)
+    search_cache.precision = config.get("SEARCH_CACHE_GEOHASH_PRECISION", 7)
+    search_cache.clear()
+    return search_cache
+
+
+def invalidate_pharmacy(pharmacy_id, lat=None, lon=None):
+    """
+    Drop cached searches that could see this pharmacy. Call after its
+    inventory changes or it registers, and before its account is deleted.
+    """
+    if lat is None or lon is None:
+        location = pharmacy_index.get(pharmacy_id)
+        if location is None:
+            # Registered through another worker and not indexed here yet
+            location = (
+                db.session.query(User.latitude, User.longitude)
+                .filter(User.id == pharmacy_id)
+                .first()
+            )
+        if location is None or location[0] is None:
+            return 0
+        lat, lon = location
+    return search_cache.invalidate_near(lat, lon)
+
+
+@register_inventory_listener(order=ORDER_CACHES)
+def on_inventory_upload(changes):
+    if changes:
+        invalidate_pharmacy(changes.pharmacy_id)
@@ -0,0 +1,214 @@
+# app/utils/spatial_index.py
+
+import heapq
+import threading
+import time
+from itertools import count
+from math import radians, cos, sin, asin, pi
+
+from app.utils.geo import EARTH_RADIUS_KM, as_coordinate_array, rank_by_distance
+
+
+def _to_unit_vector(lat, lon):
+    """
+    Project a (lat, lon) pair onto the unit sphere. Straight-line (chord)
+    distance between unit vectors grows monotonically with great-circle
+    distance, so a plain 3-d tree gives exact nearest-neighbour answers
+    without any special handling at the poles or the antimeridian.
+    """
+    lat, lon = radians(lat), radians(lon)
+    return (cos(lat) * cos(lon), cos(lat) * sin(lon), sin(lat))
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, chord / 2))
+
+
+def _km_to_chord(km):
+    return 2 * sin(min(km, EARTH_RADIUS_KM * pi) / (2 * EARTH_RADIUS_KM))
+
+
+class SpatialIndex:
+    """
+    In-memory k-d tree over pharmacy coordinates.
+
+    Points are keyed by pharmacy id. `add` and `remove` only touch the point
+    table; the tree is rebuilt lazily on the next query, so a burst of
+    registrations costs a single rebuild.
+    """
+
+    def __init__(self):
+        self._points = {}       # id -> (lat, lon)
+        self._ids = []
+        self._coords = []       # unit vectors, ordered as the implicit tree
+        self._lats = as_coordinate_array([])    # flat copies for batched distance scans
+        self._lons = as_coordinate_array([])
+        self._dirty = False
+        self._lock = threading.RLock()
+        self.version = 0
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, point_id):
+        return point_id in self._points
+
+    def ids(self):
+        with self._lock:
+            return list(self._points)
+
+    def get(self, point_id):
+        return self._points.get(point_id)
+
+    def add(self, point_id, lat, lon):
+        if lat is None or lon is None:
+            return
+        with self._lock:
+            self._points[point_id] = (lat, lon)
+            self._dirty = True
+            self.version += 1
+
+    def remove(self, point_id):
+        with self._lock:
+            if self._points.pop(point_id, None) is not None:
+                self._dirty = True
+                self.version += 1
+
+    def rebuild(self, points):
+        """
+        Replace the index contents with an iterable of (id, lat, lon).
+        """
+        with self._lock:
+            self._points = {
+                point_id: (lat, lon)
+                for point_id, lat, lon in points
+                if lat is not None and lon is not None
+            }
+            self._dirty = True
+            self.version += 1
+            self._build()
+            self.built_at = time.time()
+
+    def _build(self):
+        items = [(point_id, _to_unit_vector(lat, lon)) for point_id, (lat, lon) in self._points.items()]
+
+        def split(lo, hi, depth):
+            if hi - lo <= 1:
+                return
+            axis = depth % 3
+            items[lo:hi] = sorted(items[lo:hi], key=lambda item: item[1][axis])
+            mid = (lo + hi) // 2
+            split(lo, mid, depth + 1)
+            split(mid + 1, hi, depth + 1)
+
+        split(0, len(items), 0)
+        self._ids = [item[0] for item in items]
+        self._coords = [item[1] for item in items]
+        self._lats = as_coordinate_array([self._points[point_id][0] for point_id in self._ids])
+        self._lons = as_coordinate_array([self._points[point_id][1] for point_id in self._ids])
+        self._dirty = False
+
+    def _snapshot(self):
+        with self._lock:
+            if self._dirty:
+                self._build()
+            return self._ids, self._coords
+
+    def iter_nearest(self, lat, lon, max_km=None):
+        """
+        Yield (distance_km, id) pairs in increasing distance from (lat, lon),
+        stopping after `max_km` when given. Best-first traversal: nodes are
+        expanded in order of the distance to their bounding box, so callers
+        that stop early only pay for the part of the tree they consumed.
+        """
+        ids, coords = self._snapshot()
+        if not ids:
+            return
+
+        query = _to_unit_vector(lat, lon)
+        max_d2 = _km_to_chord(max_km) ** 2 if max_km is not None else float("inf")
+        tie = count()
+
+        def box_d2(box):
+            total = 0.0
+            for q, (low, high) in zip(query, box):
+                if q < low:
+                    total += (low - q) ** 2
+                elif q > high:
+                    total += (q - high) ** 2
+            return total
+
+        root_box = ((-1.0, 1.0), (-1.0, 1.0), (-1.0, 1.0))
+        # Heap entries: (squared chord, tiebreak, point index or None, node range)
+        heap = [(0.0, next(tie), None, (0, len(ids), 0, root_box))]
+
+        while heap:
+            d2, _, point, node = heapq.heappop(heap)
+            if d2 > max_d2:
+                return
+            if point is not None:
+                yield _chord_to_km(d2 ** 0.5), ids[point]
+                continue
+
+            lo, hi, depth, box = node
+            mid = (lo + hi) // 2
+            coord = coords[mid]
+            point_d2 = sum((a - b) ** 2 for a, b in zip(query, coord))
+            heapq.heappush(heap, (point_d2, next(tie), mid, None))
+
+            axis = depth % 3
+            split_value = coord[axis]
+            for child_lo, child_hi, bounds in (
+                (lo, mid, (box[axis][0], split_value)),
+                (mid + 1, hi, (split_value, box[axis][1])),
+            ):
+                if child_lo >= child_hi:
+                    continue
+                child_box = box[:axis] + (bounds,) + box[axis + 1:]
+                heapq.heappush(heap, (box_d2(child_box), next(tie), None, (child_lo, child_hi, depth + 1, child_box)))
+
+    def nearest(self, lat, lon, k, max_km=None):
+        """
+        Return up to `k` (distance_km, id) pairs closest to (lat, lon).
+        """
+        results = []
+        if k <= 0:
+            return results
+        for hit in self.iter_nearest(lat, lon, max_km):
+            results.append(hit)
+            if len(results) >= k:
+                break
+        return results
+
+    def within_radius(self, lat, lon, radius_km):
+        """
+        Return every (distance_km, id) pair within `radius_km`, nearest first.
+        A bounded query is answered by a batched scan of the flat coordinate
+        arrays (bounding-box prefilter, then vectorized haversine), which
+        beats walking the tree once the radius holds more than a handful of
+        points.
+        """
+        with self._lock:
+            if self._dirty:
+                self._build()
+            ids, lats, lons = self._ids, self._lats, self._lons
+        return [(distance, ids[i]) for distance, i in rank_by_distance(lat, lon, lats, lons, radius_km)]
+
+
+pharmacy_index = SpatialIndex()
+
+
+def build_pharmacy_index(pharmacies):
+    """
+    Rebuild the shared pharmacy index from (id, latitude, longitude) rows.
+    """
+    pharmacy_index.rebuild(pharmacies)
+
+
+def add_pharmacy(pharmacy_id, lat, lon):
+    pharmacy_index.add(pharmacy_id, lat, lon)
+
+
+def remove_pharmacy(pharmacy_id):
+    pharmacy_index.remove(pharmacy_id)
@@ -0,0 +1,222 @@
+# app/utils/synthetic_data.py
+
+import csv
+import io
+import random
+from datetime import date, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import User, Medicine, Inventory, MedicineAvailability, IngestJob
+from app.utils.availability import rebuild_availability
+
+# Cities the generated pharmacies are spread over: (name, lat, lon, radius
+# in km, relative weight). Within a city, pharmacies gather around a few
+# neighbourhood centres the way real ones follow markets and hospitals.
+CITIES = (
+    ("New York", 40.7306, -73.9866, 20, 8),
+    ("Delhi", 28.6139, 77.2090, 25, 10),
+    ("Mumbai", 19.0760, 72.8777, 20, 9),
+    ("Bengaluru", 12.9716, 77.5946, 18, 7),
+    ("Dehradun", 30.3165, 78.0322, 8, 2),
+    ("London", 51.5072, -0.1276, 18, 6),
+    ("Lagos", 6.5244, 3.3792, 15, 5),
+    ("Sao Paulo", -23.5558, -46.6396, 22, 6),
+)
+NEIGHBOURHOODS_PER_CITY = 12
+
+# Name parts in the style of generic (INN) drug names
+_STEMS = (
+    "ace", "ami", "ato", "azi", "bena", "bisa", "cande", "cefu", "cipro", "clari",
+    "dapo", "dexa", "diclo", "dome", "empa", "esci", "famo", "feno", "fluco", "gaba",
+    "glime", "hydro", "ibu", "indo", "irbe", "keto", "lami", "levo", "lisi", "lora",
+    "meto", "mirta", "napro", "nebi", "olme", "ondan", "panto", "parox", "predni", "queti",
+    "rabe", "ramu", "rosu", "sertra", "sita", "tela", "topi", "trama", "valsa", "zolpi",
+)
+_MIDDLES = ("", "", "", "lo", "ri", "ta", "me", "no", "xa", "di", "ve", "zo")
+_SUFFIXES = (
+    "pril", "olol", "statin", "sartan", "dipine", "prazole", "tidine", "cillin", "mycin",
+    "floxacin", "azole", "vir", "mab", "tinib", "gliptin", "pam", "lukast", "profen",
+    "fenac", "setron", "done", "zepine", "triptan", "semide",
+)
+_STRENGTHS = ("5 mg", "10 mg", "20 mg", "25 mg", "40 mg", "50 mg", "100 mg", "250 mg", "500 mg", "650 mg")
+_FORMS = ("Tablet", "Capsule", "Syrup", "Injection", "Suspension", "Gel", "Drops")
+_MANUFACTURERS = (
+    "Generic Pharma", "Sun Labs", "Cipla Health", "Apex Therapeutics", "Northwind Pharma",
+    "Himalaya Biotech", "Meridian Generics", "Lotus Life Sciences", "Atlas Medica", "Zenith Remedies",
+)
+_STREETS = ("Main Street", "Station Road", "Market Road", "Hospital Road", "Park Avenue", "Mall Road", "High Street")
+
+
+def clustered_coordinates(count, rng=None, cities=CITIES):
+    """
+    `count` (lat, lon, city) points: cities are chosen by weight, then a
+    neighbourhood centre, then a point scattered normally around it.
+    """
+    rng = rng or random.Random()
+    centres = {}
+    for name, lat, lon, radius_km, _ in cities:
+        centres[name] = [
+            (lat + rng.gauss(0, radius_km / 3) / 111.0, lon + rng.gauss(0, radius_km / 3) / 111.0)
+            for _ in range(NEIGHBOURHOODS_PER_CITY)
+        ]
+    chosen = rng.choices(cities, weights=[city[4] for city in cities], k=count)
+    points = []
+    for name, _, _, radius_km, _ in chosen:
+        lat, lon = rng.choice(centres[name])
+        spread = radius_km / 15 / 111.0
+        points.append((round(lat + rng.gauss(0, spread), 6), round(lon + rng.gauss(0, spread), 6), name))
+    return points
+
+
+def medicine_names(count, rng=None):
+    """
+    `count` distinct names such as "Levodipine 20 mg Tablet"; base names are
+    reused across strengths and forms, as in a real catalog.
+    """
+    rng = rng or random.Random()
+    capacity = len(_STEMS) * len(set(_MIDDLES)) * len(_SUFFIXES) * len(_STRENGTHS) * len(_FORMS)
+    if count > capacity:
+        raise ValueError(f"At most {capacity} distinct medicine names can be generated")
+    names = set()
+    result = []
+    while len(result) < count:
+        base = (rng.choice(_STEMS) + rng.choice(_MIDDLES) + rng.choice(_SUFFIXES)).capitalize()
+        name = f"{base} {rng.choice(_STRENGTHS)} {rng.choice(_FORMS)}"
+        if name not in names:
+            names.add(name)
+            result.append(name)
+    return result
+
+
+def street_address(city, rng=None):
+    rng = rng or random.Random()
+    return f"{rng.randint(1, 999)} {rng.choice(_STREETS)}, {city}"
+
+
+def inventory_batches(medicine_ids, batches, rng=None, today=None):
+    """
+    `batches` distinct (medicine_id, expiry_date, price, stock) tuples for
+    one pharmacy. Each medicine gets one batch before any gets a second.
+    """
+    rng = rng or random.Random()
+    today = today or date.today()
+    seen = set()
+    rows = []
+    pool = list(medicine_ids)
+    while pool and len(rows) < batches:
+        picks = rng.sample(pool, min(len(pool), batches - len(rows)))
+        for medicine_id in picks:
+            expiry_date = today + timedelta(days=rng.randint(-30, 900))  # a few already expired
+            price = round(rng.uniform(2, 80), 2)
+            key = (medicine_id, expiry_date, price)
+            if key not in seen:
+                seen.add(key)
+                rows.append((medicine_id, expiry_date, price, rng.randint(0, 500)))
+    return rows
+
+
+def inventory_csv(names, rows, rng=None):
+    """
+    A CSV upload (name,manufacturer,description,stock,price,expiry_date) of
+    `rows` lines drawn from `names`, as bytes.
+    """
+    rng = rng or random.Random()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["name", "manufacturer", "description", "stock", "price", "expiry_date"])
+    today = date.today()
+    for _ in range(rows):
+        writer.writerow([
+            rng.choice(names), rng.choice(_MANUFACTURERS), "",
+            rng.randint(0, 500), round(rng.uniform(2, 80), 2),
+            (today + timedelta(days=rng.randint(30, 900))).isoformat(),
+        ])
+    return buffer.getvalue().encode("utf-8")
+
+
+def clear_data():
+    for model in (IngestJob, MedicineAvailability, Inventory, Medicine, User):
+        db.session.query(model).delete()
+    db.session.commit()
+
+
+def _insert_chunked(table, rows, chunk_size):
+    for i in range(0, len(rows), chunk_size):
+        db.session.execute(table.insert(), rows[i:i + chunk_size])
+
+
+def _medicine_ids(names, chunk_size=500):
+    # IN lists are chunked: SQLite caps the number of bound parameters
+    ids = {}
+    for i in range(0, len(names), chunk_size):
+        ids.update(db.session.query(Medicine.name, Medicine.id).filter(Medicine.name.in_(names[i:i + chunk_size])))
+    return ids
+
+
+def generate_dataset(pharmacies, medicines, batches_per_pharmacy, seed=None, chunk_size=5000,
+                     password="password123", progress=print):
+    """
+    Bulk-load `pharmacies` pharmacy accounts with clustered coordinates,
+    `medicines` catalog entries and `batches_per_pharmacy` inventory
+    batches each, then rebuild the availability summary. Rows go in as
+    multi-row Core inserts, committed per pharmacy chunk, so it runs the
+    same on PostgreSQL and SQLite. Accounts get generated emails
+    (pharmacy<n>@synthetic.test) and share one password hash.
+    Returns the row counts written.
+    """
+    rng = random.Random(seed)
+    first = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+
+    names = medicine_names(medicines, rng)
+    taken = _medicine_ids(names)
+    _insert_chunked(Medicine.__table__, [
+        {"name": name, "manufacturer": rng.choice(_MANUFACTURERS), "description": None}
+        for name in names if name not in taken
+    ], chunk_size)
+    medicine_ids = list(_medicine_ids(names).values())
+    db.session.commit()
+    progress(f"Medicines: {len(names) - len(taken)} created, {len(taken)} already present.")
+
+    password_hash = generate_password_hash(password)
+    points = clustered_coordinates(pharmacies, rng)
+    users = User.__table__
+    inventory = Inventory.__table__
+    batches = 0
+    per_chunk = max(1, chunk_size // max(1, batches_per_pharmacy))
+    for start in range(0, pharmacies, per_chunk):
+        accounts = []
+        for offset, (lat, lon, city) in enumerate(points[start:start + per_chunk]):
+            number = first + start + offset
+            accounts.append({
+                "name": f"{city} Pharmacy {number}",
+                "email": f"pharmacy{number}@synthetic.test",
+                "password": password_hash,
+                "is_pharmacy": True,
+                "address": street_address(city, rng),
+                "latitude": lat,
+                "longitude": lon,
+            })
+        db.session.execute(users.insert(), accounts)
+        emails = [account["email"] for account in accounts]
+        pharmacy_ids = [
+            user_id for (user_id,) in db.session.query(User.id).filter(User.email.in_(emails))
+        ]
+
+        rows = []
+        for pharmacy_id in pharmacy_ids:
+            for medicine_id, expiry_date, price, stock in inventory_batches(medicine_ids, batches_per_pharmacy, rng):
+                rows.append({
+                    "pharmacy_id": pharmacy_id, "medicine_id": medicine_id,
+                    "expiry_date": expiry_date, "price": price, "stock": stock,
+                })
+        _insert_chunked(inventory, rows, chunk_size)
+        db.session.commit()
+        batches += len(rows)
+        done = min(start + per_chunk, pharmacies)
+        if done == pharmacies or done * 10 // pharmacies != start * 10 // pharmacies:
+            progress(f"Pharmacies: {done}/{pharmacies}, {batches} batches.")
+
+    rebuild_availability()
+    return {"pharmacies": pharmacies, "medicines": len(names) - len(taken), "batches": batches}
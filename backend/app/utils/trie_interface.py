@@ -2,11 +2,23 @@
 
 import sys
 import os
+import mmap
+import struct
+import threading
+import heapq
+from array import array
+from bisect import bisect_left
 
-# Ensure Python can find the compiled C++ module (medicine_trie.pyd)
-cpp_module_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'cpp', 'build', 'Release'))
-if cpp_module_path not in sys.path:
-    sys.path.append(cpp_module_path)
+from app.utils.fuzzy_index import SymSpellIndex
+from app.utils.metrics import record_backend
+
+# Ensure Python can find the compiled C++ module: medicine_trie.pyd from a
+# Visual Studio build (build/Release), or the .so a Makefile/Ninja build
+# leaves directly in build/
+for build_dir in (('build', 'Release'), ('build',)):
+    cpp_module_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'cpp', *build_dir))
+    if cpp_module_path not in sys.path:
+        sys.path.append(cpp_module_path)
 
 try:
     import medicine_trie
@@ -19,31 +31,254 @@ except ImportError as e:
 
 # Python fallback implementation
 class PythonMedicineTrie:
-    def __init__(self):
-        self.medicines = set()
-    
-    def insert(self, name):
-        self.medicines.add(name.lower())
-    
-    def search_by_prefix(self, prefix):
-        prefix = prefix.lower()
-        return [med for med in self.medicines if med.startswith(prefix)][:10]
+    """
+    Prefix index with the same interface as medicine_trie.MedicineTrie,
+    kept compact for large catalogs: instead of a node per character, the
+    names are held in sorted order under the key "lowercased name\0name",
+    split into blocks of a few hundred. A prefix selects a contiguous key
+    range found by bisection; blocks wholly inside it answer from a cached
+    top `top_k` list, and only the two boundary blocks are scanned.
+
+    The same name inserted twice keeps one entry with the newer weight;
+    names differing only in case are separate entries, as in the C++ trie.
+    """
+
+    _BLOCK_SIZE = 256
+
+    def __init__(self, top_k=10):
+        self.top_k = top_k
+        self._blocks = []       # sorted lists of keys
+        self._weights = []      # array('d') per block, parallel to its keys
+        self._maxes = []        # last key of each block
+        self._tops = []         # per block: best (-weight, name) entries, None when stale
+
+    def __len__(self):
+        return sum(len(block) for block in self._blocks)
+
+    @staticmethod
+    def _key(name):
+        return f"{name.lower()}\0{name}"
+
+    def _locate(self, key):
+        # Index of the block `key` belongs to (the last block if it sorts after all)
+        return min(bisect_left(self._maxes, key), len(self._maxes) - 1)
+
+    def insert(self, name, weight=1.0):
+        key = self._key(name)
+        if not self._blocks:
+            self._blocks.append([key])
+            self._weights.append(array('d', [weight]))
+            self._maxes.append(key)
+            self._tops.append(None)
+            return
+
+        i = self._locate(key)
+        block, weights = self._blocks[i], self._weights[i]
+        pos = bisect_left(block, key)
+        self._tops[i] = None
+        if pos < len(block) and block[pos] == key:
+            weights[pos] = weight
+            return
+        block.insert(pos, key)
+        weights.insert(pos, weight)
+        self._maxes[i] = block[-1]
+
+        if len(block) > 2 * self._BLOCK_SIZE:
+            half = len(block) // 2
+            self._blocks[i + 1:i + 1] = [block[half:]]
+            self._weights[i + 1:i + 1] = [weights[half:]]
+            self._tops[i + 1:i + 1] = [None]
+            del block[half:]
+            del weights[half:]
+            self._maxes[i:i + 1] = [block[-1], self._blocks[i + 1][-1]]
+
+    def remove(self, name):
+        if not self._blocks:
+            return False
+        key = self._key(name)
+        i = self._locate(key)
+        block = self._blocks[i]
+        pos = bisect_left(block, key)
+        if pos == len(block) or block[pos] != key:
+            return False
+
+        del block[pos]
+        del self._weights[i][pos]
+        if block:
+            self._maxes[i] = block[-1]
+            self._tops[i] = None
+        else:
+            del self._blocks[i], self._weights[i], self._maxes[i], self._tops[i]
+        return True
+
+    def _entries(self, i, lo, hi, k):
+        """
+        (-weight, name) for the entries lo..hi of block i that can rank in
+        its top k: names are only unpacked down to the k-th best weight.
+        Sorting these tuples gives the C++ trie's order, higher weight
+        first, then alphabetical.
+        """
+        block, weights = self._blocks[i], self._weights[i]
+        cutoff = sorted(weights[lo:hi], reverse=True)[k - 1] if hi - lo > k else float("-inf")
+        return [(-weights[j], block[j].split("\0", 1)[1]) for j in range(lo, hi) if weights[j] >= cutoff]
+
+    def _top(self, i):
+        top = self._tops[i]
+        if top is None:
+            entries = self._entries(i, 0, len(self._blocks[i]), self.top_k)
+            top = heapq.nsmallest(self.top_k, entries)
+            self._tops[i] = top
+        return top
+
+    def search_by_prefix(self, prefix, k=10):
+        low = prefix.lower()
+        high = low + "\U0010ffff"
+        candidates = []
+        i = bisect_left(self._maxes, low)
+        while i < len(self._blocks):
+            block = self._blocks[i]
+            if block[0] >= high:
+                break
+            start = bisect_left(block, low) if block[0] < low else 0
+            end = bisect_left(block, high) if self._maxes[i] >= high else len(block)
+            if start == 0 and end == len(block) and k <= self.top_k:
+                candidates.extend(self._top(i))
+            else:
+                candidates.extend(self._entries(i, start, end, k))
+            i += 1
+        return [word for _, word in heapq.nsmallest(k, candidates)]
 
 trie = None
+fuzzy_index = None  # typo-tolerant lookup over the same names
+_weights = {}   # name -> weight, mirrors the trie for snapshots
+_lock = threading.Lock()
 
-def build_trie(medicine_names):
-    global trie
+def _new_trie(top_k):
     if CPP_AVAILABLE and medicine_trie is not None:
-        trie = medicine_trie.MedicineTrie()
-        for name in medicine_names:
-            trie.insert(name)
-    else:
-        # Use Python fallback
-        trie = PythonMedicineTrie()
-        for name in medicine_names:
-            trie.insert(name)
-
-def search_medicine_prefix(prefix):
-    if trie is None:
-        return []
-    return trie.search_by_prefix(prefix)
+        return medicine_trie.MedicineTrie(top_k)
+    # Use Python fallback
+    return PythonMedicineTrie(top_k)
+
+def build_trie(medicines, top_k=10, fuzzy_max_distance=2, fuzzy_prefix_length=7):
+    """
+    Build the autocomplete trie from medicine names or (name, weight) pairs.
+    Completions are ranked by weight, e.g. the number of stocking pharmacies.
+    The fuzzy index is rebuilt from the same names.
+    """
+    global trie, fuzzy_index, _weights
+    new_trie = _new_trie(top_k)
+    new_fuzzy_index = SymSpellIndex(fuzzy_max_distance, fuzzy_prefix_length)
+    weights = {}
+    for entry in medicines:
+        if isinstance(entry, str):
+            name, weight = entry, 1.0
+        else:
+            name, weight = entry[0], float(entry[1])
+        new_trie.insert(name, weight)
+        new_fuzzy_index.insert(name, weight)
+        weights[name] = weight
+
+    with _lock:
+        trie = new_trie
+        fuzzy_index = new_fuzzy_index
+        _weights = weights
+
+def insert_medicine(name, weight=1.0):
+    """
+    Add a medicine to the live trie, or update its ranking weight.
+    """
+    global trie, fuzzy_index
+    with _lock:
+        if trie is None:
+            trie = _new_trie(10)
+            fuzzy_index = SymSpellIndex()
+        trie.insert(name, float(weight))
+        fuzzy_index.insert(name, float(weight))
+        _weights[name] = float(weight)
+
+def remove_medicine(name):
+    with _lock:
+        if trie is None or name not in _weights:
+            return False
+        del _weights[name]
+        fuzzy_index.remove(name)
+        return trie.remove(name)
+
+def medicine_weights():
+    with _lock:
+        return dict(_weights)
+
+def search_medicine_prefix(prefix, limit=10):
+    # Inserts from inventory listeners restructure blocks in several steps,
+    # so reads take the same lock (queries take microseconds)
+    with _lock:
+        current = trie
+        if current is None:
+            return []
+        results = current.search_by_prefix(prefix, limit)
+    record_backend("trie", "python" if isinstance(current, PythonMedicineTrie) else "cpp")
+    return results
+
+def fuzzy_distance_limit(query):
+    # One typo in short queries; the index maximum once there is enough to go on
+    return 1 if len(query.strip()) < 8 else None
+
+def search_medicine_fuzzy(query, limit=10, prefix=False):
+    """
+    [(distance, name)] for the medicine names within a few typos of
+    `query`, closest first; with `prefix`, names that start with something
+    close to it. For use when exact matching finds nothing.
+    """
+    with _lock:
+        if fuzzy_index is None:
+            return []
+        return fuzzy_index.lookup(query, limit, fuzzy_distance_limit(query), prefix)
+
+
+# ===============================
+# Snapshots
+# ===============================
+# Layout: header (magic, entry count, caller metadata), then per entry a
+# float64 weight, a uint16 byte length and the UTF-8 name.
+SNAPSHOT_MAGIC = b"MTRIE\x00\x01\x00"
+_HEADER = struct.Struct("<8sIq")
+_ENTRY = struct.Struct("<dH")
+
+def save_snapshot(path, meta=0):
+    """
+    Write the current trie contents to `path`, atomically replacing any
+    previous snapshot. `meta` is an integer stored alongside (e.g. the
+    highest medicine id included) and handed back by `load_snapshot`.
+    """
+    entries = medicine_weights()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, len(entries), meta))
+        for name, weight in entries.items():
+            encoded = name.encode("utf-8")
+            f.write(_ENTRY.pack(weight, len(encoded)))
+            f.write(encoded)
+    os.replace(tmp_path, path)
+
+def load_snapshot(path):
+    """
+    Read a snapshot written by `save_snapshot`. Returns ([(name, weight)], meta).
+    The file is memory-mapped so workers don't hold a second copy of it.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _HEADER.size:
+            raise ValueError("Trie snapshot is truncated")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, count, meta = _HEADER.unpack_from(data, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError("Not a trie snapshot")
+            entries = []
+            offset = _HEADER.size
+            for _ in range(count):
+                weight, length = _ENTRY.unpack_from(data, offset)
+                offset += _ENTRY.size
+                entries.append((data[offset:offset + length].decode("utf-8"), weight))
+                offset += length
+    return entries, meta
@@ -0,0 +1,358 @@
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Microbenchmarks for the search building blocks on synthetic data. App
+# modules are imported inside the suites, after DATABASE_URL has been
+# pointed at the benchmark database (config is read at import time).
+
+SUITES = ("trie", "graph", "distance", "ingest")
+
+
+def percentiles(samples_ns):
+    """
+    Nearest-rank p50/p95/p99 and mean of per-call timings, in µs.
+    """
+    ordered = sorted(samples_ns)
+    n = len(ordered)
+
+    def rank(p):
+        return ordered[min(n - 1, max(0, int(round(p / 100 * n)) - 1))] / 1000
+
+    return {"p50_us": rank(50), "p95_us": rank(95), "p99_us": rank(99), "mean_us": sum(ordered) / n / 1000}
+
+
+def time_calls(fn, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter_ns()
+        fn(*args)
+        samples.append(time.perf_counter_ns() - start)
+    return percentiles(samples)
+
+
+def rss_mb():
+    # Resident set size where /proc exists (Linux); C++ allocations are
+    # invisible to tracemalloc
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class MemoryProbe:
+    """
+    Peak Python allocation (tracemalloc, which slows the block down, so
+    nothing timed should run under it) and resident memory growth over a
+    block, in MB.
+    """
+
+    def __init__(self, trace=True):
+        self.trace = trace
+        self.python_mb = None
+
+    def __enter__(self):
+        gc.collect()
+        self.rss = rss_mb()
+        if self.trace:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace:
+            self.python_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        rss = rss_mb()
+        self.rss_mb = rss - self.rss if rss is not None and self.rss is not None else None
+        return False
+
+    def report(self, prefix):
+        report = {}
+        if self.python_mb is not None:
+            report[f"{prefix}_python_mb"] = self.python_mb
+        if self.rss_mb is not None:
+            report[f"{prefix}_rss_mb"] = max(0.0, self.rss_mb)
+        return report
+
+
+def with_typo(word, rng):
+    i = rng.randrange(len(word))
+    return word[:i] + rng.choice("aeiourst") + word[i + 1:]
+
+
+def bench_trie(args, rng):
+    from app.utils import trie_interface
+    from app.utils.fuzzy_index import SymSpellIndex
+    from app.utils.synthetic_data import medicine_names
+
+    names = medicine_names(args.medicines, rng)
+    weights = [rng.randint(1, 500) for _ in names]
+    results = {"engine": "C++" if trie_interface.CPP_AVAILABLE else "Python"}
+
+    def build_trie():
+        trie = trie_interface._new_trie(10)
+        for name, weight in zip(names, weights):
+            trie.insert(name, float(weight))
+        return trie
+
+    def build_fuzzy():
+        fuzzy = SymSpellIndex()
+        for name, weight in zip(names, weights):
+            fuzzy.insert(name, weight)
+        return fuzzy
+
+    # Built once for the timing and once more for the memory figures
+    with MemoryProbe() as memory:
+        build_trie()
+    results.update(memory.report("build"))
+    start = time.perf_counter()
+    trie = build_trie()
+    results["build_s"] = time.perf_counter() - start
+
+    prefixes = []
+    for _ in range(args.queries):
+        name = rng.choice(names).lower()
+        prefixes.append((name[:rng.randint(1, 6)], 10))
+    results["prefix_query"] = time_calls(trie.search_by_prefix, prefixes)
+
+    with MemoryProbe() as memory:
+        build_fuzzy()
+    results.update(memory.report("fuzzy_build"))
+    start = time.perf_counter()
+    fuzzy = build_fuzzy()
+    results["fuzzy_build_s"] = time.perf_counter() - start
+
+    typos = [(with_typo(rng.choice(names).split()[0], rng), 5) for _ in range(min(args.queries, 500))]
+    results["fuzzy_lookup"] = time_calls(fuzzy.lookup, typos)
+    return results
+
+
+def bench_graph(args, rng):
+    from app.utils.graph_interface import CPP_AVAILABLE, CSRGraph
+    from app.utils.routing_graph import RoutingGraph
+    from app.utils.spatial_index import SpatialIndex
+    from app.utils.synthetic_data import clustered_coordinates
+
+    points = clustered_coordinates(args.pharmacies, rng)
+    index = SpatialIndex()
+    index.rebuild((i, lat, lon) for i, (lat, lon, _) in enumerate(points))
+    results = {"engine": "C++" if CPP_AVAILABLE else "Python"}
+
+    with MemoryProbe(trace=False) as memory:
+        start = time.perf_counter()
+        graph = RoutingGraph(index, k=6)
+        graph.sync()
+        results["knn_build_s"] = time.perf_counter() - start
+    results.update(memory.report("knn_build"))
+
+    start = time.perf_counter()
+    CSRGraph.from_adjacency({node: edges.items() for node, edges in graph.adjacency.items()})
+    results["csr_build_s"] = time.perf_counter() - start
+
+    nodes = list(graph.adjacency)
+    pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(args.queries)]
+    results["shortest_path"] = time_calls(graph.csr.shortest_path, pairs)
+
+    routes = []
+    for _ in range(args.queries):
+        lat, lon, _ = rng.choice(points)
+        targets = rng.sample(range(len(points)), min(20, len(points)))
+        routes.append((lat + rng.gauss(0, 0.01), lon + rng.gauss(0, 0.01), targets))
+    results["route_to_nearest"] = time_calls(graph.route_to_nearest, routes)
+    return results
+
+
+def bench_distance(args, rng):
+    from app.utils.geo import NUMPY_AVAILABLE, as_coordinate_array, rank_by_distance
+    from app.utils.spatial_index import SpatialIndex
+    from app.utils.synthetic_data import clustered_coordinates
+
+    points = clustered_coordinates(args.pharmacies, rng)
+    lats = as_coordinate_array([lat for lat, _, _ in points])
+    lons = as_coordinate_array([lon for _, lon, _ in points])
+    results = {"engine": "NumPy" if NUMPY_AVAILABLE else "Python"}
+
+    origins = []
+    for _ in range(args.queries):
+        lat, lon, _ = rng.choice(points)
+        origins.append((lat + rng.gauss(0, 0.02), lon + rng.gauss(0, 0.02)))
+
+    results["rank_all"] = time_calls(rank_by_distance, [(lat, lon, lats, lons) for lat, lon in origins])
+    results["rank_within_5km"] = time_calls(rank_by_distance, [(lat, lon, lats, lons, 5.0) for lat, lon in origins])
+
+    index = SpatialIndex()
+    start = time.perf_counter()
+    index.rebuild((i, lat, lon) for i, (lat, lon, _) in enumerate(points))
+    results["index_build_s"] = time.perf_counter() - start
+    results["index_nearest_10"] = time_calls(index.nearest, [(lat, lon, 10) for lat, lon in origins])
+    results["index_within_5km"] = time_calls(index.within_radius, [(lat, lon, 5.0) for lat, lon in origins])
+    return results
+
+
+def bench_ingest(args, rng):
+    from app import create_app, db
+    from app.models import User
+    from app.utils.inventory_ingest import ingest_inventory
+    from app.utils.synthetic_data import generate_dataset, clear_data, inventory_csv, medicine_names
+
+    app = create_app()
+    with app.app_context():
+        results = {"database": db.engine.url.get_backend_name()}
+        db.create_all()
+        if User.query.first() is not None and not args.reset:
+            raise SystemExit("The ingest suite replaces all users, medicines and inventory in the database; "
+                             "pass --reset to allow it on a database that has data.")
+        clear_data()
+        generate_dataset(1, args.medicines, 0, seed=args.seed, progress=lambda message: None)
+        pharmacy_id = db.session.query(db.func.max(User.id)).scalar()
+
+        # Four fifths known medicines, the rest created by the upload
+        known = medicine_names(args.medicines, random.Random(args.seed))
+        unknown = [f"New {name}" for name in known[:max(1, args.medicines // 4)]]
+        data = inventory_csv(known + unknown, args.rows, rng)
+
+        for label, payload in (("first_upload", data), ("unchanged_upload", data),
+                               ("changed_upload", inventory_csv(known, args.rows, rng))):
+            result = ingest_inventory(pharmacy_id, io.BytesIO(payload))
+            if result.errors:
+                raise RuntimeError(f"Ingestion failed: {result.errors[:3]}")
+            results[f"{label}_s"] = result.elapsed
+            results[f"{label}_us_per_row"] = result.elapsed / max(1, result.rows) * 1e6
+            results[f"{label}_python_mb"] = result.peak_memory / 2**20
+    return results
+
+
+BENCHMARKS = {"trie": bench_trie, "graph": bench_graph, "distance": bench_distance, "ingest": bench_ingest}
+
+
+def flatten(results):
+    """
+    {"suite.metric": number} for the comparable (lower is better) numbers.
+    """
+    flat = {}
+    for suite, metrics in results.items():
+        for name, value in metrics.items():
+            if isinstance(value, dict):
+                for stat, number in value.items():
+                    flat[f"{suite}.{name}.{stat}"] = number
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                flat[f"{suite}.{name}"] = value
+    return flat
+
+
+def compare(current, baseline, threshold):
+    """
+    Print every metric next to its baseline value; returns the metrics
+    more than `threshold` (a fraction) above the baseline.
+    """
+    for suite, metrics in current.items():
+        for name in ("engine", "database"):
+            old = baseline.get(suite, {}).get(name)
+            if name in metrics and old is not None and old != metrics[name]:
+                print(f"⚠️ {suite}: {name} is {metrics[name]}, the baseline used {old}")
+    current, baseline = flatten(current), flatten(baseline)
+    regressions = []
+    print(f"\n{'metric':<45} {'baseline':>12} {'current':>12} {'change':>9}")
+    for key in sorted(current):
+        if key not in baseline:
+            continue
+        old, new = baseline[key], current[key]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  slower"
+            regressions.append(key)
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{key:<45} {old:>12.3f} {new:>12.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def print_results(results):
+    for suite, metrics in results.items():
+        print(f"\n[{suite}]")
+        for name, value in metrics.items():
+            if isinstance(value, dict):
+                print(f"  {name:<28} " + "  ".join(f"{stat} {number:,.1f}" for stat, number in value.items()))
+            elif isinstance(value, float):
+                print(f"  {name:<28} {value:,.3f}")
+            else:
+                print(f"  {name:<28} {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the trie, graph engine, distance ranking and ingestion.")
+    parser.add_argument("suites", nargs="*", metavar="suite",
+                        help=f"suites to run (default: all of {', '.join(SUITES)})")
+    parser.add_argument("--medicines", type=int, default=100000, help="catalog size for the trie and ingestion")
+    parser.add_argument("--pharmacies", type=int, default=10000, help="pharmacy locations for graph and distance")
+    parser.add_argument("--queries", type=int, default=2000, help="timed calls per measurement")
+    parser.add_argument("--rows", type=int, default=50000, help="CSV rows per ingestion run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", help="database URL for the ingest suite (default: a temporary SQLite file)")
+    parser.add_argument("--reset", action="store_true",
+                        help="let the ingest suite delete the existing data in --database")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON, e.g. as a baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="fractional slowdown reported as a regression (default 0.2)")
+    args = parser.parse_args()
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite: {', '.join(sorted(unknown))}")
+
+    tmpdir = None
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmpdir.name, "benchmark.db")
+
+    try:
+        results = {}
+        for suite in args.suites or SUITES:
+            print(f"Running {suite}...", flush=True)
+            results[suite] = BENCHMARKS[suite](args, random.Random(args.seed))
+    finally:
+        if tmpdir is not None:
+            try:
+                tmpdir.cleanup()
+            except OSError:
+                pass
+    print_results(results)
+
+    output = {
+        "meta": {
+            "python": platform.python_version(), "machine": platform.machine(),
+            "medicines": args.medicines, "pharmacies": args.pharmacies,
+            "queries": args.queries, "rows": args.rows, "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2, default=str)
+        print(f"\n✅ Results saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metrics regressed by more than {args.threshold:.0%}")
+            return 1
+        print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
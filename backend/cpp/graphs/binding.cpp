@@ -1,14 +1,169 @@
 // cpp/graphs/binding.cpp
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
+#include <string>
 #include "dijkstra.h"
+#include "tour.h"
+#include "road.h"
 
 namespace py = pybind11;
 using namespace medilocate;
 
+namespace {
+
+bool is_int64(const py::buffer_info& info) {
+    return info.itemsize == 8 && (info.format == "q" || info.format == "l" || info.format == "<q" || info.format == "<l");
+}
+
+bool is_float64(const py::buffer_info& info) {
+    return info.itemsize == 8 && (info.format == "d" || info.format == "<d");
+}
+
+void require_1d(const py::buffer_info& info, const char* name) {
+    if (info.ndim != 1 || info.strides[0] != info.itemsize) {
+        throw std::invalid_argument(std::string(name) + " must be a contiguous 1-d buffer");
+    }
+}
+
+// Holds references to the caller's offsets/targets/weights buffers so the
+// CSR view stays valid for the lifetime of the object. Nothing is copied.
+class PyCSRGraph {
+public:
+    PyCSRGraph(py::buffer offsets, py::buffer targets, py::buffer weights)
+        : offsets_(offsets), targets_(targets), weights_(weights) {
+        py::buffer_info o = offsets_.request();
+        py::buffer_info t = targets_.request();
+        py::buffer_info w = weights_.request();
+        require_1d(o, "offsets");
+        require_1d(t, "targets");
+        require_1d(w, "weights");
+        if (!is_int64(o) || !is_int64(t)) throw std::invalid_argument("offsets and targets must be int64 buffers");
+        if (!is_float64(w)) throw std::invalid_argument("weights must be a float64 buffer");
+        if (o.shape[0] < 1) throw std::invalid_argument("offsets must hold num_nodes + 1 entries");
+        if (t.shape[0] != w.shape[0]) throw std::invalid_argument("targets and weights must have the same length");
+
+        view_.offsets = static_cast<const int64_t*>(o.ptr);
+        view_.targets = static_cast<const int64_t*>(t.ptr);
+        view_.weights = static_cast<const double*>(w.ptr);
+        view_.num_nodes = o.shape[0] - 1;
+        if (view_.offsets[view_.num_nodes] != t.shape[0]) {
+            throw std::invalid_argument("offsets[-1] must equal the number of edges");
+        }
+    }
+
+    int64_t num_nodes() const { return view_.num_nodes; }
+
+    int64_t run(const std::vector<int64_t>& sources,
+                const std::vector<double>& source_dists,
+                const std::vector<int64_t>& goals,
+                bool stop_at_first_goal,
+                py::buffer dist_out,
+                py::buffer pred_out) const {
+        py::buffer_info d = dist_out.request(true);
+        py::buffer_info p = pred_out.request(true);
+        require_1d(d, "dist");
+        require_1d(p, "pred");
+        if (!is_float64(d) || !is_int64(p)) throw std::invalid_argument("dist must be float64 and pred int64");
+        if (d.shape[0] != view_.num_nodes || p.shape[0] != view_.num_nodes) {
+            throw std::invalid_argument("dist and pred must hold one slot per node");
+        }
+
+        double* dist = static_cast<double*>(d.ptr);
+        int64_t* pred = static_cast<int64_t*>(p.ptr);
+
+        py::gil_scoped_release release;
+        return dijkstra_csr(view_, sources, source_dists, goals, stop_at_first_goal, dist, pred);
+    }
+
+private:
+    py::buffer offsets_;
+    py::buffer targets_;
+    py::buffer weights_;
+    CSRView view_;
+};
+
+// Validate a flat float64 n*n distance matrix and return n.
+int64_t square_matrix(const py::buffer_info& info) {
+    require_1d(info, "matrix");
+    if (!is_float64(info)) throw std::invalid_argument("matrix must be a float64 buffer");
+    int64_t n = 0;
+    while (n * n < info.shape[0]) ++n;
+    if (n * n != info.shape[0]) throw std::invalid_argument("matrix must hold n * n entries");
+    return n;
+}
+
+py::tuple solve_tour(py::buffer matrix, bool return_to_start, bool exact, double time_budget_ms) {
+    py::buffer_info info = matrix.request();
+    const int64_t n = square_matrix(info);
+    const double* data = static_cast<const double*>(info.ptr);
+    std::vector<int64_t> order;
+    double cost;
+    {
+        py::gil_scoped_release release;
+        order = exact ? solve_tour_exact(data, n, return_to_start)
+                      : solve_tour_heuristic(data, n, return_to_start, time_budget_ms);
+        cost = tour_cost(data, n, order, return_to_start);
+    }
+    return py::make_tuple(order, cost);
+}
+
+py::tuple route_road(const RoadGraph& graph, int64_t source, int64_t target, bool by_time) {
+    std::vector<int64_t> path;
+    double km = 0.0, hours = 0.0;
+    {
+        py::gil_scoped_release release;
+        path = graph.route(source, target, by_time, km, hours);
+    }
+    return py::make_tuple(path, km, hours);
+}
+
+py::list road_coordinates(const RoadGraph& graph, const std::vector<int64_t>& path) {
+    py::list coords;
+    for (int64_t node : path) {
+        if (node < 0 || node >= graph.num_nodes()) throw std::out_of_range("node index out of range");
+        coords.append(py::make_tuple(graph.lat(node), graph.lon(node)));
+    }
+    return coords;
+}
+
+}  // namespace
+
 PYBIND11_MODULE(dijkstra_graph, m) {
     m.doc() = "Dijkstra C++ module exposed using pybind11";
-    m.def("find_shortest_path", &dijkstra,
-          "Find the shortest path between two nodes",
-          py::arg("graph"), py::arg("start"), py::arg("end"));
+
+    py::class_<PyCSRGraph>(m, "CSRGraph")
+        .def(py::init<py::buffer, py::buffer, py::buffer>(),
+             py::arg("offsets"), py::arg("targets"), py::arg("weights"))
+        .def_property_readonly("num_nodes", &PyCSRGraph::num_nodes)
+        .def("run", &PyCSRGraph::run,
+             "Multi-source Dijkstra writing distances and predecessors into the given buffers",
+             py::arg("sources"), py::arg("source_dists"), py::arg("goals"),
+             py::arg("stop_at_first_goal"), py::arg("dist"), py::arg("pred"));
+
+    m.attr("MAX_EXACT_TOUR_NODES") = kMaxExactTourNodes;
+
+    m.def("solve_tour_exact",
+          [](py::buffer matrix, bool return_to_start) { return solve_tour(matrix, return_to_start, true, 0.0); },
+          "Optimal visiting order (Held-Karp) over a flat n*n float64 matrix; returns (order, cost)",
+          py::arg("matrix"), py::arg("return_to_start") = false);
+
+    m.def("solve_tour_heuristic",
+          [](py::buffer matrix, bool return_to_start, double time_budget_ms) {
+              return solve_tour(matrix, return_to_start, false, time_budget_ms);
+          },
+          "Nearest-neighbour + 2-opt/Or-opt visiting order within a time budget; returns (order, cost)",
+          py::arg("matrix"), py::arg("return_to_start") = false, py::arg("time_budget_ms") = 50.0);
+
+    py::class_<RoadGraph>(m, "RoadGraph")
+        .def_static("load", [](const std::string& path) { return RoadGraph(path); },
+                    "Load a road graph file written by app/utils/road_network.py", py::arg("path"))
+        .def_property_readonly("num_nodes", &RoadGraph::num_nodes)
+        .def_property_readonly("num_edges", &RoadGraph::num_edges)
+        .def("nearest_node", &RoadGraph::nearest_node,
+             "Closest road node to (lat, lon), or -1", py::arg("lat"), py::arg("lon"))
+        .def("route", &route_road,
+             "A* between two nodes by length or travel time; returns (path, km, hours)",
+             py::arg("source"), py::arg("target"), py::arg("by_time") = false)
+        .def("coordinates", &road_coordinates,
+             "(lat, lon) of each node of a path", py::arg("path"));
 }
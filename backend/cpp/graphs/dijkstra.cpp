@@ -1,55 +1,81 @@
 // cpp/graphs/dijkstra.cpp
 #include "dijkstra.h"
-#include <set>
-#include <limits>
 #include <algorithm>
+#include <queue>
+#include <limits>
+#include <functional>
+#include <stdexcept>
 
 namespace medilocate {
 
-std::vector<std::string> dijkstra(const Graph& graph, const std::string& start, const std::string& end) {
-    std::unordered_map<std::string, double> distances;
-    std::unordered_map<std::string, std::string> previous;
-    std::set<std::pair<double, std::string>> pq;
+int64_t dijkstra_csr(const CSRView& graph,
+                     const std::vector<int64_t>& sources,
+                     const std::vector<double>& source_dists,
+                     const std::vector<int64_t>& goals,
+                     bool stop_at_first_goal,
+                     double* dist,
+                     int64_t* pred) {
+    const int64_t n = graph.num_nodes;
+    const double inf = std::numeric_limits<double>::infinity();
 
-    for (const auto& node : graph) {
-        distances[node.first] = std::numeric_limits<double>::infinity();
+    if (sources.size() != source_dists.size()) {
+        throw std::invalid_argument("sources and source_dists must have the same length");
     }
 
-    distances[start] = 0.0;
-    pq.insert({0.0, start});
+    std::fill(dist, dist + n, inf);
+    std::fill(pred, pred + n, -1);
 
-    while (!pq.empty()) {
-        auto [curr_dist, u] = *pq.begin();
-        pq.erase(pq.begin());
-
-        if (u == end) break;
-
-        for (const auto& [v, weight] : graph.at(u)) {
-            double new_dist = curr_dist + weight;
-            if (new_dist < distances[v]) {
-                pq.erase({distances[v], v}); // remove old if exists
-                distances[v] = new_dist;
-                previous[v] = u;
-                pq.insert({new_dist, v});
-            }
+    // 0 = not a goal, 1 = pending goal, 2 = settled goal
+    std::vector<char> goal_state(n, 0);
+    int64_t goals_left = 0;
+    for (int64_t g : goals) {
+        if (g < 0 || g >= n) throw std::out_of_range("goal index out of range");
+        if (!goal_state[g]) {
+            goal_state[g] = 1;
+            ++goals_left;
         }
     }
 
-    std::vector<std::string> path;
-    std::string curr = end;
-    while (previous.find(curr) != previous.end()) {
-        path.push_back(curr);
-        curr = previous[curr];
+    // Lazy-deletion binary heap instead of a decrease-key std::set
+    using Entry = std::pair<double, int64_t>;
+    std::priority_queue<Entry, std::vector<Entry>, std::greater<Entry>> pq;
+
+    for (size_t i = 0; i < sources.size(); ++i) {
+        int64_t s = sources[i];
+        if (s < 0 || s >= n) throw std::out_of_range("source index out of range");
+        if (source_dists[i] < dist[s]) {
+            dist[s] = source_dists[i];
+            pq.push({source_dists[i], s});
+        }
     }
 
-    if (curr == start) {
-        path.push_back(start);
-        std::reverse(path.begin(), path.end());
-    } else {
-        path.clear();  // No path found
+    int64_t first_goal = -1;
+
+    while (!pq.empty()) {
+        auto [d, u] = pq.top();
+        pq.pop();
+
+        if (d > dist[u]) continue;  // stale entry
+
+        if (goal_state[u] == 1) {
+            goal_state[u] = 2;
+            --goals_left;
+            if (first_goal < 0) first_goal = u;
+            if (stop_at_first_goal || goals_left == 0) break;
+        }
+
+        for (int64_t e = graph.offsets[u]; e < graph.offsets[u + 1]; ++e) {
+            int64_t v = graph.targets[e];
+            double nd = d + graph.weights[e];
+            if (nd < dist[v]) {
+                dist[v] = nd;
+                pred[v] = u;
+                pq.push({nd, v});
+            }
+        }
     }
 
-    return path;
+    return first_goal;
 }
 
 }
@@ -2,15 +2,35 @@
 #ifndef DIJKSTRA_H
 #define DIJKSTRA_H
 
-#include <string>
-#include <unordered_map>
+#include <cstdint>
 #include <vector>
 
 namespace medilocate {
 
-    using Graph = std::unordered_map<std::string, std::vector<std::pair<std::string, double>>>;
+    // Read-only view over a graph in compressed sparse row form. The edges of
+    // node u are targets[offsets[u] .. offsets[u + 1]) with matching weights.
+    // The buffers are owned by the caller (Python arrays), never copied.
+    struct CSRView {
+        const int64_t* offsets;
+        const int64_t* targets;
+        const double* weights;
+        int64_t num_nodes;
+    };
 
-    std::vector<std::string> dijkstra(const Graph& graph, const std::string& start, const std::string& end);
+    // Multi-source Dijkstra over integer node ids. Each source starts at its
+    // matching entry in source_dists. dist and pred must hold num_nodes slots
+    // and are fully overwritten (unreached nodes: infinity / -1).
+    //
+    // With goals given the search exits early: at the first goal settled when
+    // stop_at_first_goal is set, otherwise once every goal is settled.
+    // Returns the first goal settled, or -1.
+    int64_t dijkstra_csr(const CSRView& graph,
+                         const std::vector<int64_t>& sources,
+                         const std::vector<double>& source_dists,
+                         const std::vector<int64_t>& goals,
+                         bool stop_at_first_goal,
+                         double* dist,
+                         int64_t* pred);
 
 }
 
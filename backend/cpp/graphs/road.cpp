@@ -0,0 +1,145 @@
+// cpp/graphs/road.cpp
+#include "road.h"
+#include <algorithm>
+#include <cmath>
+#include <cstring>
+#include <fstream>
+#include <functional>
+#include <limits>
+#include <queue>
+#include <stdexcept>
+#include <tuple>
+
+namespace medilocate {
+
+namespace {
+
+const char kRoadMagic[8] = {'M', 'R', 'O', 'A', 'D', '\0', '\x01', '\0'};
+const double kEarthRadiusKm = 6371.0;
+const double kDegToRad = 3.14159265358979323846 / 180.0;
+
+double haversine(double lat1, double lon1, double lat2, double lon2) {
+    const double p1 = lat1 * kDegToRad;
+    const double p2 = lat2 * kDegToRad;
+    const double dlat = p2 - p1;
+    const double dlon = (lon2 - lon1) * kDegToRad;
+    const double a = std::sin(dlat / 2) * std::sin(dlat / 2) +
+                     std::cos(p1) * std::cos(p2) * std::sin(dlon / 2) * std::sin(dlon / 2);
+    return 2 * kEarthRadiusKm * std::asin(std::min(1.0, std::sqrt(a)));
+}
+
+template <typename T>
+void read_array(std::ifstream& in, std::vector<T>& out, int64_t count) {
+    out.resize(static_cast<size_t>(count));
+    in.read(reinterpret_cast<char*>(out.data()), static_cast<std::streamsize>(count * sizeof(T)));
+    if (!in) throw std::runtime_error("Road graph file is truncated");
+}
+
+}  // namespace
+
+RoadGraph::RoadGraph(const std::string& path) {
+    std::ifstream in(path, std::ios::binary);
+    if (!in) throw std::runtime_error("Cannot open road graph file: " + path);
+
+    char magic[8];
+    int64_t n = 0, m = 0;
+    in.read(magic, sizeof(magic));
+    in.read(reinterpret_cast<char*>(&n), sizeof(n));
+    in.read(reinterpret_cast<char*>(&m), sizeof(m));
+    in.read(reinterpret_cast<char*>(&max_speed_), sizeof(max_speed_));
+    if (!in) throw std::runtime_error("Road graph file is truncated");
+    if (std::memcmp(magic, kRoadMagic, sizeof(magic)) != 0) throw std::runtime_error("Not a road graph file");
+    if (n < 0 || m < 0) throw std::runtime_error("Corrupt road graph header");
+
+    read_array(in, lats_, n);
+    read_array(in, lons_, n);
+    read_array(in, offsets_, n + 1);
+    read_array(in, targets_, m);
+    read_array(in, lengths_, m);
+    read_array(in, times_, m);
+    // Searches index by these without bounds checks
+    if (offsets_[0] != 0 || offsets_[n] != m || !std::is_sorted(offsets_.begin(), offsets_.end())) {
+        throw std::runtime_error("Corrupt road graph offsets");
+    }
+    for (const int64_t v : targets_) {
+        if (v < 0 || v >= n) throw std::runtime_error("Corrupt road graph targets");
+    }
+    if (max_speed_ <= 0) max_speed_ = 1.0;
+}
+
+int64_t RoadGraph::nearest_node(double lat, double lon) const {
+    int64_t best = -1;
+    double best_km = std::numeric_limits<double>::infinity();
+    for (int64_t i = 0; i < num_nodes(); ++i) {
+        const double km = haversine(lat, lon, lats_[i], lons_[i]);
+        if (km < best_km) {
+            best_km = km;
+            best = i;
+        }
+    }
+    return best;
+}
+
+std::vector<int64_t> RoadGraph::route(int64_t source, int64_t target, bool by_time,
+                                      double& km, double& hours) const {
+    const int64_t n = num_nodes();
+    if (source < 0 || source >= n || target < 0 || target >= n) {
+        throw std::out_of_range("node index out of range");
+    }
+    const double inf = std::numeric_limits<double>::infinity();
+    const std::vector<double>& weights = by_time ? times_ : lengths_;
+    const double scale = by_time ? 1.0 / max_speed_ : 1.0;
+    const double target_lat = lats_[target];
+    const double target_lon = lons_[target];
+    auto estimate = [&](int64_t node) {
+        return haversine(lats_[node], lons_[node], target_lat, target_lon) * scale;
+    };
+
+    std::vector<double> best(n, inf);
+    std::vector<int64_t> pred_edge(n, -1);
+    std::vector<int64_t> pred_node(n, -1);
+    std::vector<char> closed(n, 0);
+
+    // (estimated total, cost so far, node)
+    using Entry = std::tuple<double, double, int64_t>;
+    std::priority_queue<Entry, std::vector<Entry>, std::greater<Entry>> pq;
+    best[source] = 0.0;
+    pq.emplace(estimate(source), 0.0, source);
+
+    while (!pq.empty()) {
+        auto [_, cost, u] = pq.top();
+        pq.pop();
+        if (closed[u]) continue;
+        if (u == target) break;
+        closed[u] = 1;
+        for (int64_t e = offsets_[u]; e < offsets_[u + 1]; ++e) {
+            const int64_t v = targets_[e];
+            const double nc = cost + weights[e];
+            if (nc < best[v]) {
+                best[v] = nc;
+                pred_node[v] = u;
+                pred_edge[v] = e;
+                pq.emplace(nc + estimate(v), nc, v);
+            }
+        }
+    }
+
+    km = 0.0;
+    hours = 0.0;
+    std::vector<int64_t> path;
+    if (best[target] == inf) {
+        km = hours = inf;
+        return path;
+    }
+    for (int64_t node = target; node >= 0; node = pred_node[node]) {
+        path.push_back(node);
+        if (pred_edge[node] >= 0) {
+            km += lengths_[pred_edge[node]];
+            hours += times_[pred_edge[node]];
+        }
+    }
+    std::reverse(path.begin(), path.end());
+    return path;
+}
+
+}
@@ -0,0 +1,48 @@
+// cpp/graphs/road.h
+#ifndef ROAD_H
+#define ROAD_H
+
+#include <cstdint>
+#include <string>
+#include <vector>
+
+namespace medilocate {
+
+    // Road network loaded from the binary file written by
+    // app/utils/road_network.py: a header (8-byte magic, int64 node count,
+    // int64 edge count, float64 top speed in km/h) followed by lats[n],
+    // lons[n], offsets[n + 1], targets[m], lengths_km[m] and times_h[m].
+    class RoadGraph {
+    public:
+        explicit RoadGraph(const std::string& path);
+
+        int64_t num_nodes() const { return static_cast<int64_t>(lats_.size()); }
+        int64_t num_edges() const { return static_cast<int64_t>(targets_.size()); }
+
+        // Closest node by great-circle distance, or -1 for an empty graph.
+        int64_t nearest_node(double lat, double lon) const;
+
+        // A* from source to target minimising length (km) or travel time
+        // (hours). The haversine heuristic is admissible because every edge
+        // is at least as long as the straight line between its ends, and
+        // for time it is divided by the fastest speed in the graph.
+        // Returns the node path (empty if unreachable) and fills the totals.
+        std::vector<int64_t> route(int64_t source, int64_t target, bool by_time,
+                                   double& km, double& hours) const;
+
+        double lat(int64_t node) const { return lats_[node]; }
+        double lon(int64_t node) const { return lons_[node]; }
+
+    private:
+        std::vector<double> lats_;
+        std::vector<double> lons_;
+        std::vector<int64_t> offsets_;
+        std::vector<int64_t> targets_;
+        std::vector<double> lengths_;
+        std::vector<double> times_;
+        double max_speed_ = 1.0;
+    };
+
+}
+
+#endif
@@ -0,0 +1,167 @@
+// cpp/graphs/tour.cpp
+#include "tour.h"
+#include <algorithm>
+#include <chrono>
+#include <limits>
+#include <stdexcept>
+
+namespace medilocate {
+
+namespace {
+
+inline double edge(const double* matrix, int64_t n, int64_t a, int64_t b) {
+    return matrix[a * n + b];
+}
+
+// Cost of the link leaving position i of the order (to i + 1, or back to the
+// start for the last position of a closed tour; 0 for the end of a path).
+inline double link(const double* matrix, int64_t n, const std::vector<int64_t>& order, int64_t i,
+                   bool return_to_start) {
+    if (i + 1 < n) return edge(matrix, n, order[i], order[i + 1]);
+    return return_to_start ? edge(matrix, n, order[i], order[0]) : 0.0;
+}
+
+// First improving 2-opt move (reverse order[i..k]), applied in place.
+bool improve_two_opt(const double* matrix, int64_t n, std::vector<int64_t>& order, bool return_to_start) {
+    for (int64_t i = 1; i < n - 1; ++i) {
+        for (int64_t k = i + 1; k < n; ++k) {
+            const int64_t a = order[i - 1], b = order[i], c = order[k];
+            const bool has_next = k + 1 < n || return_to_start;
+            const int64_t d = k + 1 < n ? order[k + 1] : order[0];
+            double before = edge(matrix, n, a, b);
+            double after = edge(matrix, n, a, c);
+            if (has_next) {
+                before += edge(matrix, n, c, d);
+                after += edge(matrix, n, b, d);
+            }
+            if (after < before - 1e-9) {
+                std::reverse(order.begin() + i, order.begin() + k + 1);
+                return true;
+            }
+        }
+    }
+    return false;
+}
+
+// First improving Or-opt move: relocate a run of 1-3 nodes elsewhere.
+bool improve_or_opt(const double* matrix, int64_t n, std::vector<int64_t>& order, bool return_to_start) {
+    const double base = tour_cost(matrix, n, order, return_to_start);
+    std::vector<int64_t> candidate;
+    candidate.reserve(n);
+    std::vector<int64_t> rest;
+    rest.reserve(n);
+    for (int64_t len = 1; len <= 3 && len < n; ++len) {
+        for (int64_t i = 1; i + len <= n; ++i) {
+            // Take order[i, i + len) out and try it at every other position
+            // of the remaining sequence (never before the start node).
+            rest.assign(order.begin(), order.begin() + i);
+            rest.insert(rest.end(), order.begin() + i + len, order.end());
+            for (int64_t at = 1; at <= static_cast<int64_t>(rest.size()); ++at) {
+                if (at == i) continue;
+                candidate.assign(rest.begin(), rest.begin() + at);
+                candidate.insert(candidate.end(), order.begin() + i, order.begin() + i + len);
+                candidate.insert(candidate.end(), rest.begin() + at, rest.end());
+                if (tour_cost(matrix, n, candidate, return_to_start) < base - 1e-9) {
+                    order.swap(candidate);
+                    return true;
+                }
+            }
+        }
+    }
+    return false;
+}
+
+}  // namespace
+
+double tour_cost(const double* matrix, int64_t n, const std::vector<int64_t>& order, bool return_to_start) {
+    double total = 0.0;
+    for (int64_t i = 0; i < n; ++i) total += link(matrix, n, order, i, return_to_start);
+    return total;
+}
+
+std::vector<int64_t> solve_tour_exact(const double* matrix, int64_t n, bool return_to_start) {
+    if (n <= 0) return {};
+    if (n > kMaxExactTourNodes) throw std::invalid_argument("too many nodes for the exact tour solver");
+    if (n == 1) return {0};
+
+    // Subsets of nodes 1..n-1 as bitmasks; dp[mask * m + j] is the cheapest
+    // route from 0 through `mask` ending at node j + 1.
+    const int64_t m = n - 1;
+    const int64_t full = (int64_t{1} << m) - 1;
+    const double inf = std::numeric_limits<double>::infinity();
+    std::vector<double> dp((full + 1) * m, inf);
+    std::vector<int8_t> parent((full + 1) * m, -1);
+
+    for (int64_t j = 0; j < m; ++j) dp[(int64_t{1} << j) * m + j] = edge(matrix, n, 0, j + 1);
+
+    for (int64_t mask = 1; mask <= full; ++mask) {
+        for (int64_t j = 0; j < m; ++j) {
+            if (!(mask & (int64_t{1} << j))) continue;
+            const double cost = dp[mask * m + j];
+            if (cost == inf) continue;
+            for (int64_t k = 0; k < m; ++k) {
+                if (mask & (int64_t{1} << k)) continue;
+                const int64_t next = mask | (int64_t{1} << k);
+                const double candidate = cost + edge(matrix, n, j + 1, k + 1);
+                if (candidate < dp[next * m + k]) {
+                    dp[next * m + k] = candidate;
+                    parent[next * m + k] = static_cast<int8_t>(j);
+                }
+            }
+        }
+    }
+
+    int64_t last = 0;
+    double best = inf;
+    for (int64_t j = 0; j < m; ++j) {
+        double cost = dp[full * m + j] + (return_to_start ? edge(matrix, n, j + 1, 0) : 0.0);
+        if (cost < best) {
+            best = cost;
+            last = j;
+        }
+    }
+
+    std::vector<int64_t> order;
+    int64_t mask = full;
+    int64_t j = last;
+    while (j >= 0) {
+        order.push_back(j + 1);
+        int64_t prev = parent[mask * m + j];
+        mask &= ~(int64_t{1} << j);
+        j = prev;
+    }
+    order.push_back(0);
+    std::reverse(order.begin(), order.end());
+    return order;
+}
+
+std::vector<int64_t> solve_tour_heuristic(const double* matrix, int64_t n, bool return_to_start,
+                                          double time_budget_ms) {
+    if (n <= 0) return {};
+    const auto deadline = std::chrono::steady_clock::now() +
+                          std::chrono::duration_cast<std::chrono::steady_clock::duration>(
+                              std::chrono::duration<double, std::milli>(time_budget_ms));
+
+    // Nearest-neighbour construction
+    std::vector<int64_t> order{0};
+    std::vector<char> visited(n, 0);
+    visited[0] = 1;
+    for (int64_t step = 1; step < n; ++step) {
+        const int64_t from = order.back();
+        int64_t best = -1;
+        for (int64_t j = 0; j < n; ++j) {
+            if (!visited[j] && (best < 0 || edge(matrix, n, from, j) < edge(matrix, n, from, best))) best = j;
+        }
+        visited[best] = 1;
+        order.push_back(best);
+    }
+
+    while (std::chrono::steady_clock::now() < deadline) {
+        if (improve_two_opt(matrix, n, order, return_to_start)) continue;
+        if (improve_or_opt(matrix, n, order, return_to_start)) continue;
+        break;
+    }
+    return order;
+}
+
+}
@@ -0,0 +1,32 @@
+// cpp/graphs/tour.h
+#ifndef TOUR_H
+#define TOUR_H
+
+#include <cstdint>
+#include <vector>
+
+namespace medilocate {
+
+    // Visiting-order solvers over a dense n x n distance matrix (row-major,
+    // matrix[i * n + j] = cost of going from i to j). Node 0 is the start;
+    // the returned order begins with 0 and lists every node once. With
+    // return_to_start the cost includes the leg back to node 0, otherwise
+    // the route ends at the last node visited.
+
+    // Largest matrix the exact solver accepts (its table grows as 2^n * n).
+    constexpr int64_t kMaxExactTourNodes = 18;
+
+    // Held-Karp dynamic programming: optimal, O(2^n * n^2) time.
+    std::vector<int64_t> solve_tour_exact(const double* matrix, int64_t n, bool return_to_start);
+
+    // Nearest-neighbour construction improved with 2-opt and Or-opt moves
+    // until no move helps or time_budget_ms runs out. The 2-opt move
+    // assumes a symmetric matrix.
+    std::vector<int64_t> solve_tour_heuristic(const double* matrix, int64_t n, bool return_to_start,
+                                              double time_budget_ms);
+
+    double tour_cost(const double* matrix, int64_t n, const std::vector<int64_t>& order, bool return_to_start);
+
+}
+
+#endif
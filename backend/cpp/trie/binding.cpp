@@ -6,7 +6,8 @@ namespace py = pybind11;
 
 PYBIND11_MODULE(medicine_trie, m) {
     py::class_<MedicineTrie>(m, "MedicineTrie")
-        .def(py::init<>())
-        .def("insert", &MedicineTrie::insert)
-        .def("search_by_prefix", &MedicineTrie::search_by_prefix);
+        .def(py::init<size_t>(), py::arg("top_k") = 10)
+        .def("insert", &MedicineTrie::insert, py::arg("word"), py::arg("weight") = 1.0)
+        .def("remove", &MedicineTrie::remove, py::arg("word"))
+        .def("search_by_prefix", &MedicineTrie::search_by_prefix, py::arg("prefix"), py::arg("k") = 10);
 }
@@ -1,6 +1,7 @@
 #include "medicine_trie.h"
 #include <iostream>
-#include <algorithm>  // for transform
+#include <algorithm>  // for transform, partial_sort
+#include <utility>
 
 using namespace std;
 
@@ -11,10 +12,16 @@ string to_lowercase(const string& input) {
     return lowered;
 }
 
+// Ranking order shared with the Python fallback
+static bool ranks_before(const Completion& a, const Completion& b) {
+    if (a.weight != b.weight) return a.weight > b.weight;
+    return a.word < b.word;
+}
+
 // ===============================
 // TrieNode
 // ===============================
-TrieNode::TrieNode() : is_end_of_word(false) {}
+TrieNode::TrieNode() {}
 
 TrieNode::~TrieNode() {
     for (auto& pair : children) {
@@ -25,7 +32,7 @@ TrieNode::~TrieNode() {
 // ===============================
 // MedicineTrie
 // ===============================
-MedicineTrie::MedicineTrie() {
+MedicineTrie::MedicineTrie(size_t top_k) : top_k(top_k) {
     root = new TrieNode();
 }
 
@@ -33,26 +40,79 @@ MedicineTrie::~MedicineTrie() {
     delete root;
 }
 
-void MedicineTrie::insert(const string& word) {
+void MedicineTrie::insert(const string& word, double weight) {
     string lower_word = to_lowercase(word);
     TrieNode* node = root;
+    vector<TrieNode*> path{root};
 
     for (char ch : lower_word) {
         if (!node->children.count(ch)) {
             node->children[ch] = new TrieNode();
         }
         node = node->children[ch];
+        path.push_back(node);
     }
 
-    node->is_end_of_word = true;
-    node->original_words.push_back(word);  // preserve original casing
+    node->words[word] = weight;  // preserve original casing, dedupe exact repeats
+
+    // Re-rank bottom-up: each node's cache is built from its own words and
+    // its children's caches, so only the nodes on this word's path change.
+    for (auto it = path.rbegin(); it != path.rend(); ++it) {
+        refresh(*it);
+    }
 }
 
-void MedicineTrie::collect_all_words(TrieNode* node, vector<string>& results) {
-    if (node->is_end_of_word) {
-        for (const string& word : node->original_words) {
-            results.push_back(word);
+bool MedicineTrie::remove(const string& word) {
+    string lower_word = to_lowercase(word);
+    TrieNode* node = root;
+    vector<TrieNode*> path{root};
+
+    for (char ch : lower_word) {
+        auto it = node->children.find(ch);
+        if (it == node->children.end()) {
+            return false;
         }
+        node = it->second;
+        path.push_back(node);
+    }
+
+    if (!node->words.erase(word)) {
+        return false;
+    }
+
+    // Prune nodes left without words or children, then re-rank what remains
+    for (size_t i = path.size() - 1; i > 0; --i) {
+        TrieNode* current = path[i];
+        if (!current->words.empty() || !current->children.empty()) break;
+        path[i - 1]->children.erase(lower_word[i - 1]);
+        delete current;
+        path.pop_back();
+    }
+    for (auto it = path.rbegin(); it != path.rend(); ++it) {
+        refresh(*it);
+    }
+    return true;
+}
+
+void MedicineTrie::refresh(TrieNode* node) {
+    vector<Completion> candidates;
+    for (const auto& [word, weight] : node->words) {
+        candidates.push_back({weight, word});
+    }
+    for (const auto& pair : node->children) {
+        const auto& child_top = pair.second->top;
+        candidates.insert(candidates.end(), child_top.begin(), child_top.end());
+    }
+
+    size_t keep = min(top_k, candidates.size());
+    partial_sort(candidates.begin(), candidates.begin() + keep, candidates.end(), ranks_before);
+    candidates.resize(keep);
+    node->top = move(candidates);
+}
+
+void MedicineTrie::collect_all_words(TrieNode* node, vector<Completion>& results) {
+    for (const auto& [word, weight] : node->words) {
+        results.push_back({weight, word});
     }
 
     for (const auto& pair : node->children) {
@@ -60,7 +120,7 @@ void MedicineTrie::collect_all_words(TrieNode* node, vector<string>& results) {
     }
 }
 
-vector<string> MedicineTrie::search_by_prefix(const string& prefix) {
+vector<string> MedicineTrie::search_by_prefix(const string& prefix, size_t k) {
     string lower_prefix = to_lowercase(prefix);
     TrieNode* node = root;
 
@@ -72,6 +132,22 @@ vector<string> MedicineTrie::search_by_prefix(const string& prefix) {
     }
 
     vector<string> results;
-    collect_all_words(node, results);
+
+    if (k <= top_k) {
+        // Served straight from the node's cache, no subtree walk
+        for (size_t i = 0; i < node->top.size() && i < k; ++i) {
+            results.push_back(node->top[i].word);
+        }
+        return results;
+    }
+
+    // Larger than the cache: rank the whole subtree
+    vector<Completion> all;
+    collect_all_words(node, all);
+    size_t keep = min(k, all.size());
+    partial_sort(all.begin(), all.begin() + keep, all.end(), ranks_before);
+    for (size_t i = 0; i < keep; ++i) {
+        results.push_back(all[i].word);
+    }
     return results;
 }
@@ -1,17 +1,24 @@
 #ifndef MEDICINE_TRIE_H
 #define MEDICINE_TRIE_H
 
+#include <cstddef>
 #include <string>
 #include <unordered_map>
 #include <vector>
 
 using namespace std;
 
+// A ranked completion: higher weight first, then alphabetical
+struct Completion {
+    double weight;
+    string word;
+};
+
 class TrieNode {
 public:
-    bool is_end_of_word;
     unordered_map<char, TrieNode*> children;
-    vector<string> original_words;
+    unordered_map<string, double> words;  // original casing -> weight (terminal nodes only)
+    vector<Completion> top;               // best completions in this subtree, ranked
 
     TrieNode();
     ~TrieNode();
@@ -20,13 +27,16 @@ public:
 class MedicineTrie {
 private:
     TrieNode* root;
-    void collect_all_words(TrieNode* node, vector<string>& results);
+    size_t top_k;
+    void refresh(TrieNode* node);
+    void collect_all_words(TrieNode* node, vector<Completion>& results);
 
 public:
-    MedicineTrie();
+    explicit MedicineTrie(size_t top_k = 10);
     ~MedicineTrie();
-    void insert(const string& word);
-    vector<string> search_by_prefix(const string& prefix);
+    void insert(const string& word, double weight = 1.0);
+    bool remove(const string& word);
+    vector<string> search_by_prefix(const string& prefix, size_t k = 10);
 };
 
 #endif  // MEDICINE_TRIE_H
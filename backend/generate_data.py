@@ -0,0 +1,31 @@
+import argparse
+import time
+
+from app import create_app, db
+from app.utils.synthetic_data import generate_dataset, clear_data
+
+
+# Bulk-load a synthetic dataset into DATABASE_URL (PostgreSQL or SQLite)
+def main():
+    parser = argparse.ArgumentParser(description="Generate pharmacies, medicines and inventory at scale.")
+    parser.add_argument("--pharmacies", type=int, default=1000)
+    parser.add_argument("--medicines", type=int, default=5000)
+    parser.add_argument("--batches", type=int, default=200, help="inventory batches per pharmacy")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for repeatable datasets")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per insert statement")
+    parser.add_argument("--reset", action="store_true", help="delete all existing users, medicines and inventory first")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if args.reset:
+            clear_data()
+        start = time.perf_counter()
+        counts = generate_dataset(args.pharmacies, args.medicines, args.batches, args.seed, args.chunk_size)
+        print(f"✅ Generated {counts['pharmacies']} pharmacies, {counts['medicines']} medicines and "
+              f"{counts['batches']} inventory batches in {time.perf_counter() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
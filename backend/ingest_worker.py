@@ -0,0 +1,35 @@
+import argparse
+import time
+
+from app import create_app, db
+from app.utils import ingest_jobs
+
+
+# Run ingestion workers outside the web processes (start the app with
+# INGEST_WORKERS=0 so uploads are only queued there). Any number of these
+# can share the queue; INGEST_JOB_DIR must be visible to all of them.
+def main():
+    parser = argparse.ArgumentParser(description="Process queued inventory uploads.")
+    parser.add_argument("--workers", type=int, default=None, help="worker threads (default: INGEST_WORKERS)")
+    args = parser.parse_args()
+
+    app = create_app()
+    if args.workers is not None:
+        app.config["INGEST_WORKERS"] = args.workers
+    with app.app_context():
+        db.create_all()
+    pool = ingest_jobs.init_ingest_jobs(app)
+    if pool.workers <= 0:
+        parser.error("at least one worker is needed")
+    # No caches here to keep in step with other processes' jobs
+    pool.start(sync=False)
+    try:
+        while pool.running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping after the current jobs...")
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
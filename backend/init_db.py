@@ -1,9 +1,289 @@
+import sqlite3
+import warnings
+
+from sqlalchemy import func, inspect, select, text
+
 from app import create_app, db
+from app.models import Medicine, Inventory, InventoryStaging, MedicineAvailability, IngestJob
+from app.utils.availability import rebuild_availability
 
 # Create app instance
 app = create_app()
 
+
+DUPLICATED_COLUMNS = ('name', 'manufacturer', 'description')
+
+
+def _merge_orphan_batches(has_name):
+    """
+    Point batches whose medicine_id matches no medicine (the old upload
+    route stored 0 when the CSV had no medicine_id) at the medicine of the
+    same name, creating it if needed. A batch that then collides with an
+    existing one adds its stock to it. Returns (moved, dropped) counts;
+    batches without a usable name are dropped.
+    """
+    inventory = Inventory.__table__
+    details = 'name, manufacturer, description' if has_name else 'NULL, NULL, NULL'
+    orphans = db.session.execute(text(
+        f"SELECT id, pharmacy_id, expiry_date, price, stock, {details} FROM inventory "
+        "WHERE medicine_id IS NULL OR medicine_id NOT IN (SELECT id FROM medicines)"
+    )).all()
+    if not orphans:
+        return 0, 0
+
+    ids_by_name = {name.lower(): medicine_id for medicine_id, name in db.session.query(Medicine.id, Medicine.name)}
+    moved = dropped = 0
+    for row_id, pharmacy_id, expiry_date, price, stock, name, manufacturer, description in orphans:
+        key = (name or '').strip().lower()
+        if not key:
+            db.session.execute(inventory.delete().where(inventory.c.id == row_id))
+            dropped += 1
+            continue
+        if key not in ids_by_name:
+            medicine = Medicine(name=name.strip(), manufacturer=manufacturer, description=description)
+            db.session.add(medicine)
+            db.session.flush()
+            ids_by_name[key] = medicine.id
+        medicine_id = ids_by_name[key]
+
+        existing = db.session.execute(
+            select(inventory.c.id).where(
+                inventory.c.pharmacy_id == pharmacy_id,
+                inventory.c.medicine_id == medicine_id,
+                inventory.c.expiry_date == expiry_date,
+                inventory.c.price == price,
+                inventory.c.id != row_id,
+            )
+        ).scalar()
+        if existing is None:
+            db.session.execute(inventory.update().where(inventory.c.id == row_id).values(medicine_id=medicine_id))
+        else:
+            db.session.execute(
+                inventory.update().where(inventory.c.id == existing)
+                .values(stock=func.coalesce(inventory.c.stock, 0) + (stock or 0))
+            )
+            db.session.execute(inventory.delete().where(inventory.c.id == row_id))
+        moved += 1
+    return moved, dropped
+
+
+def _merge_duplicate_batches():
+    """
+    Fold rows sharing a (pharmacy, medicine, expiry, price) batch key into
+    the oldest one, summing the stock. Returns the number of merged keys.
+    """
+    duplicates = (
+        db.session.query(
+            Inventory.pharmacy_id, Inventory.medicine_id, Inventory.expiry_date, Inventory.price,
+            func.min(Inventory.id), func.sum(Inventory.stock),
+        )
+        .group_by(Inventory.pharmacy_id, Inventory.medicine_id, Inventory.expiry_date, Inventory.price)
+        .having(func.count(Inventory.id) > 1)
+        .all()
+    )
+    for pharmacy_id, medicine_id, expiry_date, price, keep_id, stock in duplicates:
+        Inventory.query.filter(
+            Inventory.pharmacy_id == pharmacy_id,
+            Inventory.medicine_id == medicine_id,
+            Inventory.expiry_date == expiry_date,
+            Inventory.price == price,
+            Inventory.id != keep_id,
+        ).delete(synchronize_session=False)
+        db.session.query(Inventory).filter_by(id=keep_id).update({'stock': stock})
+    return len(duplicates)
+
+
+def _merge_duplicate_medicines():
+    """
+    Names used to be unique only by exact spelling, and concurrent uploads
+    could each create the same new medicine. Fold every case-insensitive
+    duplicate into the oldest entry: its batches move over, adding their
+    stock to a batch that already has their key. Returns the number of
+    medicines removed.
+    """
+    inventory = Inventory.__table__
+    staging = InventoryStaging.__table__
+    lowered = func.lower(Medicine.name)
+    removed = 0
+    for (key,) in db.session.query(lowered).group_by(lowered).having(func.count(Medicine.id) > 1).all():
+        keep_id, *duplicate_ids = [
+            medicine_id for (medicine_id,) in
+            db.session.query(Medicine.id).filter(lowered == key).order_by(Medicine.id)
+        ]
+        batches = {
+            (pharmacy_id, expiry_date, price): row_id
+            for row_id, pharmacy_id, expiry_date, price in db.session.execute(
+                select(inventory.c.id, inventory.c.pharmacy_id, inventory.c.expiry_date, inventory.c.price)
+                .where(inventory.c.medicine_id == keep_id)
+            )
+        }
+        moving = db.session.execute(
+            select(inventory.c.id, inventory.c.pharmacy_id, inventory.c.expiry_date, inventory.c.price, inventory.c.stock)
+            .where(inventory.c.medicine_id.in_(duplicate_ids))
+        ).all()
+        for row_id, pharmacy_id, expiry_date, price, stock in moving:
+            existing = batches.get((pharmacy_id, expiry_date, price))
+            if existing is None:
+                db.session.execute(inventory.update().where(inventory.c.id == row_id).values(medicine_id=keep_id))
+                batches[(pharmacy_id, expiry_date, price)] = row_id
+            else:
+                db.session.execute(
+                    inventory.update().where(inventory.c.id == existing)
+                    .values(stock=func.coalesce(inventory.c.stock, 0) + (stock or 0))
+                )
+                db.session.execute(inventory.delete().where(inventory.c.id == row_id))
+
+        db.session.execute(staging.update().where(staging.c.medicine_id.in_(duplicate_ids)).values(medicine_id=keep_id))
+        MedicineAvailability.query.filter(MedicineAvailability.medicine_id.in_(duplicate_ids)).delete(synchronize_session=False)
+        Medicine.query.filter(Medicine.id.in_(duplicate_ids)).delete(synchronize_session=False)
+        removed += len(duplicate_ids)
+    return removed
+
+
+def _drop_inventory_columns(columns):
+    connection = db.session.connection()
+    if connection.dialect.name != 'sqlite' or sqlite3.sqlite_version_info >= (3, 35, 0):
+        for column in columns:
+            connection.execute(text(f"ALTER TABLE inventory DROP COLUMN {column}"))
+        return
+
+    # SQLite before 3.35 has no DROP COLUMN: copy into a fresh table, which
+    # carries the batch key, so duplicate batches must be merged first
+    for index in inspect(connection).get_indexes('inventory'):
+        connection.execute(text(f"DROP INDEX {index['name']}"))
+    connection.execute(text("ALTER TABLE inventory RENAME TO inventory_old"))
+    Inventory.__table__.create(connection)
+    kept = ', '.join(c.name for c in Inventory.__table__.columns)
+    connection.execute(text(f"INSERT INTO inventory ({kept}) SELECT {kept} FROM inventory_old"))
+    connection.execute(text("DROP TABLE inventory_old"))
+
+
+def normalize_inventory():
+    """
+    Inventory batches used to copy the medicine's name, manufacturer and
+    description. Backfill medicines missing those details from their
+    batches, re-link batches whose medicine_id matches no medicine by their
+    name, merge batches that now share a batch key, then drop the copied
+    columns, all in one transaction. The staging table only holds in-flight
+    uploads and is recreated without them.
+    """
+    inspector = inspect(db.engine)
+    duplicated = [c['name'] for c in inspector.get_columns('inventory') if c['name'] in DUPLICATED_COLUMNS]
+    staging_columns = [c['name'] for c in inspector.get_columns('inventory_staging')]
+    if not duplicated and not any(c in staging_columns for c in DUPLICATED_COLUMNS):
+        return
+
+    try:
+        for column in ('manufacturer', 'description'):
+            if column in duplicated:
+                db.session.execute(text(
+                    f"UPDATE medicines SET {column} = ("
+                    f"SELECT MAX(inventory.{column}) FROM inventory WHERE inventory.medicine_id = medicines.id"
+                    f") WHERE {column} IS NULL"
+                ))
+        moved, dropped = _merge_orphan_batches('name' in duplicated)
+        merged = _merge_duplicate_batches()
+        if duplicated:
+            _drop_inventory_columns(duplicated)
+
+        if any(c in staging_columns for c in DUPLICATED_COLUMNS):
+            connection = db.session.connection()
+            InventoryStaging.__table__.drop(connection)
+            InventoryStaging.__table__.create(connection)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if moved or dropped or merged:
+        rebuild_availability()
+    print(f"Normalized inventory: dropped {', '.join(duplicated) or 'no'} columns, "
+          f"re-linked {moved} batches, removed {dropped} without a medicine, "
+          f"merged {merged} duplicate batches.")
+
+
+def ensure_indexes():
+    """
+    create_all skips tables that already exist, so add indexes introduced
+    since, and drop the single-column availability index the composite
+    (medicine_id, pharmacy_id) index replaces.
+    """
+    # Reflection skips (and warns about) the lower(name) expression index,
+    # which ensure_unique_medicine_names creates
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', 'Skipped unsupported reflection of expression-based index')
+        for model in (Medicine, Inventory, MedicineAvailability, IngestJob):
+            for index in model.__table__.indexes:
+                if index.name != 'uq_medicines_name_lower':
+                    index.create(db.engine, checkfirst=True)
+    names = [index['name'] for index in inspect(db.engine).get_indexes('medicine_availability')]
+    if 'ix_medicine_availability_medicine_id' in names:
+        db.session.execute(text("DROP INDEX ix_medicine_availability_medicine_id"))
+        db.session.commit()
+
+
+def ensure_inventory_batch_key():
+    """
+    Databases created before the batch key existed may hold several rows
+    per (pharmacy, medicine, expiry, price). Merge them, summing the stock,
+    and add the unique index the upload upserts rely on.
+    """
+    inspector = inspect(db.engine)
+    batch_columns = ['pharmacy_id', 'medicine_id', 'expiry_date', 'price']
+    unique_keys = [c['column_names'] for c in inspector.get_unique_constraints('inventory')]
+    unique_keys += [i['column_names'] for i in inspector.get_indexes('inventory') if i['unique']]
+    if any(sorted(columns) == sorted(batch_columns) for columns in unique_keys):
+        return
+
+    merged = _merge_duplicate_batches()
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX uq_inventory_batch ON inventory (pharmacy_id, medicine_id, expiry_date, price)"
+    ))
+    db.session.commit()
+    print(f"Added inventory batch key, merged {merged} duplicate batches.")
+
+
+def ensure_unique_medicine_names():
+    """
+    Merge medicines whose names differ only in case and add the unique
+    index on lower(name). Expression indexes aren't reflected, so it is
+    created with IF NOT EXISTS rather than by ensure_indexes.
+    """
+    try:
+        removed = _merge_duplicate_medicines()
+        db.session.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_medicines_name_lower ON medicines (lower(name))"
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if removed:
+        rebuild_availability()
+        print(f"Merged {removed} duplicate medicines.")
+
+
+def ensure_ingest_job_mode():
+    """
+    Job tables created before add-to-stock uploads lack the `mode` column;
+    their jobs all replaced the inventory.
+    """
+    columns = [c['name'] for c in inspect(db.engine).get_columns('ingest_jobs')]
+    if 'mode' in columns:
+        return
+    db.session.execute(text("ALTER TABLE ingest_jobs ADD COLUMN mode VARCHAR(16) NOT NULL DEFAULT 'replace'"))
+    db.session.commit()
+    print("Added the ingestion job mode column.")
+
+
 # Use app context to initialize database
 with app.app_context():
     db.create_all()
+    normalize_inventory()
+    ensure_inventory_batch_key()
+    ensure_ingest_job_mode()
+    ensure_unique_medicine_names()
+    ensure_indexes()
+    if MedicineAvailability.query.first() is None and Inventory.query.first() is not None:
+        rebuild_availability()
+        print("Built the medicine availability summary.")
     print("Database tables created.")
@@ -0,0 +1,261 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app, db
+from app.models import Medicine, User
+from app.utils.synthetic_data import (
+    CITIES, clear_data, generate_dataset, inventory_csv, street_address,
+)
+from benchmark import percentiles, with_typo
+from config import Config
+
+ENDPOINTS = ("search_by_prefix", "search_medicine", "find_nearest_path", "inventory_upload")
+
+
+def load_test_config(database_url):
+    """
+    Config for the app under test: the given database, the synthetic
+    geocoder and no files shared with a development instance.
+    """
+    engine_options = dict(Config.SQLALCHEMY_ENGINE_OPTIONS)
+    if database_url.startswith("sqlite"):
+        engine_options = {k: v for k, v in engine_options.items() if k in ("pool_pre_ping", "query_cache_size")}
+    return type("LoadTestConfig", (Config,), {
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "SQLALCHEMY_ENGINE_OPTIONS": engine_options,
+        "GEOCODER_BACKEND": "synthetic",
+        "GEOCODER_RATE_LIMIT": 0,
+        "GEOCODE_CACHE_PATH": None,
+        "TRIE_SNAPSHOT_PATH": None,
+        "ROAD_GRAPH_PATH": None,
+        "INGEST_TRACE_MEMORY": False,
+        "INGEST_JOB_DIR": os.path.join(tempfile.gettempdir(), "medilocate_load_test_jobs"),
+    })
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Recorder:
+    """
+    Latencies and outcomes per endpoint for one client thread; merged at
+    the end so the hot path takes no lock.
+    """
+
+    def __init__(self):
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.client_errors = dict.fromkeys(ENDPOINTS, 0)   # 4xx
+        self.errors = dict.fromkeys(ENDPOINTS, 0)          # 5xx and failed connections
+
+    def add(self, endpoint, elapsed_ns, status):
+        self.latencies[endpoint].append(elapsed_ns)
+        if status is None or status >= 500:
+            self.errors[endpoint] += 1
+        elif status >= 400:
+            self.client_errors[endpoint] += 1
+
+    def merge(self, other):
+        for name in ENDPOINTS:
+            self.latencies[name].extend(other.latencies[name])
+            self.client_errors[name] += other.client_errors[name]
+            self.errors[name] += other.errors[name]
+
+
+class Client:
+    def __init__(self, host, port, recorder):
+        self.host = host
+        self.port = port
+        self.recorder = recorder
+
+    def request(self, endpoint, method, path, body=None, headers=None):
+        start = time.perf_counter_ns()
+        status = None
+        try:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            finally:
+                conn.close()
+        except OSError:
+            pass
+        self.recorder.add(endpoint, time.perf_counter_ns() - start, status)
+        return status
+
+    def post_json(self, endpoint, path, payload):
+        return self.request(endpoint, "POST", path, json.dumps(payload), {"Content-Type": "application/json"})
+
+    def upload(self, token, data):
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="file"; filename="inventory.csv"\r\n'
+            "Content-Type: text/csv\r\n\r\n"
+        ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+        return self.request("inventory_upload", "POST", "/api/inventory/upload", body, {
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            "Authorization": f"Bearer {token}",
+        })
+
+
+def run_sessions(client, args, names, tokens, deadline, seed):
+    """
+    One virtual user: type part of a medicine name (one autocomplete call
+    per keystroke), search for it from a random address, sometimes ask for
+    the nearest path; now and then a pharmacy uploads its inventory.
+    """
+    rng = random.Random(seed)
+    think = args.think_ms / 1000
+    while time.time() < deadline:
+        name = rng.choice(names)
+        typed = name.lower()[:rng.randint(3, 8)]
+        for i in range(1, len(typed) + 1):
+            client.request("search_by_prefix", "GET", "/api/search_by_prefix?" + urlencode({"prefix": typed[:i]}))
+            if think:
+                time.sleep(think)
+
+        query = with_typo(name.split()[0], rng) if rng.random() < args.typo_share else name
+        address = street_address(rng.choice(CITIES)[0], rng)
+        client.post_json("search_medicine", "/api/search_medicine", {"address": address, "medicine_name": query})
+        if rng.random() < args.nearest_share:
+            client.post_json("find_nearest_path", "/api/find_nearest_path", {"address": address, "medicine_name": query})
+        if tokens and rng.random() < args.upload_share:
+            client.upload(rng.choice(tokens), inventory_csv(names, args.upload_rows, rng))
+
+
+def report(recorder, elapsed):
+    rows = {}
+    total = 0
+    print(f"\n{'endpoint':<20} {'requests':>9} {'req/s':>8} {'4xx':>6} {'errors':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name in ENDPOINTS:
+        samples = recorder.latencies[name]
+        if not samples:
+            continue
+        total += len(samples)
+        stats = {k.replace("_us", "_ms"): v / 1000 for k, v in percentiles(samples).items()}
+        rows[name] = {
+            "requests": len(samples),
+            "throughput_rps": len(samples) / elapsed,
+            "client_errors": recorder.client_errors[name],
+            "errors": recorder.errors[name],
+            "error_rate": recorder.errors[name] / len(samples),
+            **stats,
+        }
+        row = rows[name]
+        print(f"{name:<20} {row['requests']:>9} {row['throughput_rps']:>8.1f} {row['client_errors']:>6} "
+              f"{row['errors']:>7} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['mean_ms']:>8.1f}")
+    print(f"\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay autocomplete, search and upload traffic against the app.")
+    parser.add_argument("--database", help="database URL (default: a temporary SQLite file)")
+    parser.add_argument("--reseed", action="store_true", help="replace the data in --database with a fresh dataset")
+    parser.add_argument("--pharmacies", type=int, default=500)
+    parser.add_argument("--medicines", type=int, default=5000)
+    parser.add_argument("--batches", type=int, default=100, help="inventory batches per pharmacy")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=8, help="simultaneous virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between keystrokes")
+    parser.add_argument("--nearest-share", type=float, default=0.3, help="share of searches followed by find_nearest_path")
+    parser.add_argument("--typo-share", type=float, default=0.05, help="share of searches with a typo")
+    parser.add_argument("--upload-share", type=float, default=0.02, help="share of sessions ending in an upload")
+    parser.add_argument("--upload-rows", type=int, default=200)
+    parser.add_argument("--port", type=int, default=0, help="port for the app (default: any free port)")
+    parser.add_argument("--save", metavar="FILE", help="write the per-endpoint results as JSON")
+    args = parser.parse_args()
+
+    tmpdir = None
+    database = args.database
+    if database is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        database = "sqlite:///" + os.path.join(tmpdir.name, "load_test.db")
+
+    app = create_app(load_test_config(database))
+    with app.app_context():
+        db.create_all()
+        if args.reseed or args.database is None or User.query.first() is None:
+            clear_data()
+            print("Seeding...", flush=True)
+            generate_dataset(args.pharmacies, args.medicines, args.batches, args.seed, progress=lambda message: None)
+        names = [name for (name,) in db.session.query(Medicine.name).limit(args.medicines)]
+        emails = [
+            email for (email,) in
+            db.session.query(User.email).filter(User.email.like("pharmacy%@synthetic.test")).limit(args.concurrency)
+        ]
+
+    server = make_server("127.0.0.1", args.port, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = "127.0.0.1", server.server_port
+    print(f"App listening on http://{host}:{port}, {len(names)} medicines, {args.concurrency} users", flush=True)
+
+    try:
+        setup = Client(host, port, Recorder())
+        tokens = []
+        for email in emails:
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+            conn.request("POST", "/login", json.dumps({"email": email, "password": "password123"}),
+                         {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            if response.status == 200:
+                tokens.append(json.loads(response.read())["access_token"])
+            conn.close()
+        # Warm up: the first request loads the trie and the indexes
+        setup.request("search_by_prefix", "GET", "/api/search_by_prefix?prefix=a")
+
+        recorder = Recorder()
+        clients = [Recorder() for _ in range(args.concurrency)]
+        deadline = time.time() + args.duration
+        threads = [
+            threading.Thread(target=run_sessions, args=(Client(host, port, clients[i]), args, names, tokens, deadline, args.seed + i))
+            for i in range(args.concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        for client_recorder in clients:
+            recorder.merge(client_recorder)
+        results = report(recorder, elapsed)
+    finally:
+        server.shutdown()
+        if tmpdir is not None:
+            with app.app_context():
+                db.engine.dispose()
+            try:
+                tmpdir.cleanup()
+            except OSError:
+                pass
+
+    if args.save:
+        meta = {k: v for k, v in vars(args).items() if k not in ("save", "database")}
+        meta["database"] = app.config["SQLALCHEMY_DATABASE_URI"].split("://")[0]
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "elapsed_s": elapsed, "endpoints": results}, f, indent=2)
+        print(f"✅ Results saved to {args.save}")
+    errors = sum(row["errors"] for row in results.values())
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+import argparse
+import csv
+import sys
+
+from app import create_app, db
+from app.utils import geocode_utils
+from app.utils.pharmacy_onboarding import onboard_pharmacies
+
+
+# Register a pharmacy chain from a CSV file:
+# name,email,password,address_line,city,state,postal_code,country
+# (or a single address column). Geocoding goes through the configured
+# GEOCODER_BACKEND with its cache, rate limit and retries.
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-register pharmacy accounts from a CSV file.")
+    parser.add_argument("csv", help="pharmacies to register")
+    parser.add_argument("--default-password", help="password for rows that leave it empty")
+    parser.add_argument("--rate", type=float, default=None, help="geocoder requests per second (default: GEOCODER_RATE_LIMIT)")
+    parser.add_argument("--workers", type=int, default=None, help="geocoding threads (default: GEOCODER_WORKERS)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="accounts per insert (default: ONBOARDING_CHUNK_SIZE)")
+    parser.add_argument("--dry-run", action="store_true", help="validate and geocode without registering anyone")
+    parser.add_argument("--failures", metavar="FILE", help="write the failed rows (line,email,error) to a CSV file")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        geocoder = geocode_utils.geocoder
+        if args.rate is not None:
+            geocoder.limiter = geocode_utils.RateLimiter(args.rate)
+        if args.workers is not None:
+            geocoder.workers = args.workers
+        with open(args.csv, "rb") as f:
+            result = onboard_pharmacies(
+                f,
+                default_password=args.default_password,
+                dry_run=args.dry_run,
+                chunk_size=args.chunk_size or app.config["ONBOARDING_CHUNK_SIZE"],
+            )
+
+    stats = result.stats()
+    verb = "Validated" if args.dry_run else "Registered"
+    print(f"✅ {verb} {stats['created']} of {stats['rows']} pharmacies in {stats['seconds']:.1f}s "
+          f"({stats['unique_addresses']} distinct addresses geocoded in {stats['geocode_seconds']:.1f}s).")
+    if result.failures:
+        print(f"❌ {len(result.failures)} rows failed:")
+        for failure in result.failures[:20]:
+            print(f"   line {failure['line']} ({failure['email']}): {failure['error']}")
+        if len(result.failures) > 20:
+            print(f"   ... and {len(result.failures) - 20} more")
+    if args.failures:
+        with open(args.failures, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["line", "email", "error"])
+            writer.writeheader()
+            writer.writerows(result.failures)
+        print(f"Failures written to {args.failures}")
+    return 1 if result.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
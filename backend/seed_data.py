@@ -1,5 +1,6 @@
 from app import create_app, db
-from app.models import User, Medicine, Inventory
+from app.models import User, Medicine, Inventory, MedicineAvailability, IngestJob
+from app.utils.availability import rebuild_availability
 from datetime import date, timedelta
 import random
 from werkzeug.security import generate_password_hash
@@ -9,6 +10,8 @@ app = create_app()
 def seed_data():
     with app.app_context():
         # Clear existing data
+        db.session.query(IngestJob).delete()
+        db.session.query(MedicineAvailability).delete()
         db.session.query(Inventory).delete()
         db.session.query(Medicine).delete()
         db.session.query(User).delete()
@@ -105,9 +108,6 @@ def seed_data():
                 inventory = Inventory(
                     pharmacy_id=pharmacy.id,
                     medicine_id=medicine.id,
-                    name=medicine.name,
-                    manufacturer=medicine.manufacturer,
-                    description=medicine.description,
                     stock=stock,
                     price=price,
                     expiry_date=expiry_date
@@ -115,6 +115,7 @@ def seed_data():
                 db.session.add(inventory)
 
         db.session.commit()
+        rebuild_availability()
         print("✅ Database seeded successfully!")
         print(f"Created {len(pharmacy_users)} pharmacies")
         print(f"Created {len(medicine_objects)} medicines")
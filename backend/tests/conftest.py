@@ -0,0 +1,62 @@
+# tests/conftest.py
+
+import pytest
+
+from app import create_app, db
+from app.models import User
+from app.utils import ingest_jobs, trie_interface
+from app.utils.ngram_index import medicine_name_index
+from app.utils.spatial_index import add_pharmacy, pharmacy_index
+from config import Config
+
+
+def make_config(tmp_path):
+    """
+    A throwaway SQLite database, the synthetic geocoder, no background
+    workers and no files shared with a development instance.
+    """
+    engine_options = {k: v for k, v in Config.SQLALCHEMY_ENGINE_OPTIONS.items()
+                      if k in ("pool_pre_ping", "query_cache_size")}
+    return type("TestConfig", (Config,), {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'medilocate.db'}",
+        "SQLALCHEMY_ENGINE_OPTIONS": engine_options,
+        "GEOCODER_BACKEND": "synthetic",
+        "GEOCODER_RATE_LIMIT": 0,
+        "GEOCODE_CACHE_PATH": None,
+        "TRIE_SNAPSHOT_PATH": None,
+        "ROAD_GRAPH_PATH": None,
+        "METRICS_ENABLED": False,
+        "INGEST_WORKERS": 0,
+        "INGEST_TRACE_MEMORY": False,
+        "INGEST_JOB_DIR": str(tmp_path / "jobs"),
+    })
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(make_config(tmp_path))
+    # Process-wide indexes outlive an app; start each test from empty ones
+    trie_interface.build_trie([])
+    medicine_name_index.rebuild([])
+    pharmacy_index.rebuild([])
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    ingest_jobs.ingest_workers.stop(timeout=5)
+
+
+@pytest.fixture
+def make_pharmacy(app):
+    """
+    Create a pharmacy account at (lat, lon) and return its id.
+    """
+    def make(email, lat=30.3165, lon=78.0322):
+        user = User(name=email.split("@")[0], email=email, password="x", is_pharmacy=True,
+                    address="Dehradun", latitude=lat, longitude=lon)
+        db.session.add(user)
+        db.session.commit()
+        add_pharmacy(user.id, lat, lon)
+        return user.id
+    return make
@@ -0,0 +1,95 @@
+# tests/test_auth.py
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import db
+from app.models import User
+from app.utils.auth_utils import AuthUser, UserCache, load_user, token_claims, user_cache
+
+
+def make_user(email, is_pharmacy=False):
+    user = User(name=email.split("@")[0], email=email, password="x", is_pharmacy=is_pharmacy)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def bearer(user, claims=True):
+    token = create_access_token(identity=user.email, additional_claims=token_claims(user) if claims else None)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_least_recently_used_users_are_evicted():
+    cache = UserCache(max_entries=2, ttl=60)
+    cache.set(AuthUser(1, "a@example.com", False))
+    cache.set(AuthUser(2, "b@example.com", True))
+    assert cache.get(1).email == "a@example.com"
+    cache.set(AuthUser(3, "c@example.com", False))
+
+    assert (cache.get(1) is None, cache.get(2) is None, cache.get(3) is None) == (False, True, False)
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+
+def test_expired_and_disabled_caches_miss():
+    expired = UserCache(ttl=0)
+    expired.set(AuthUser(1, "a@example.com", False))
+    disabled = UserCache(max_entries=0)
+    disabled.set(AuthUser(1, "a@example.com", False))
+
+    assert expired.get(1) is None
+    assert disabled.get(1) is None
+
+
+def test_load_user_caches_by_id_and_checks_the_email(app):
+    user = make_user("cached@example.com", is_pharmacy=True)
+    claims = token_claims(user)
+
+    loaded = load_user(user.email, claims)
+    assert (loaded.id, loaded.email, loaded.is_pharmacy) == (user.id, user.email, True)
+    # Served from the cache: the row is no longer consulted
+    db.session.delete(user)
+    db.session.commit()
+    assert load_user("cached@example.com", claims) is loaded
+
+    user_cache.clear()
+    assert load_user("cached@example.com", claims) is None
+    # An id recycled by another account doesn't accept the old token
+    other = make_user("other@example.com")
+    assert load_user("cached@example.com", {"user_id": other.id}) is None
+
+
+def test_tokens_without_claims_resolve_by_email(app):
+    user = make_user("legacy@example.com")
+
+    loaded = load_user(user.email, {})
+    assert (loaded.id, loaded.is_pharmacy) == (user.id, False)
+    assert load_user("missing@example.com", {}) is None
+
+
+@pytest.mark.parametrize("is_pharmacy, claims, status", [
+    (True, True, 200),
+    (False, True, 403),
+    (True, False, 200),
+    (False, False, 403),
+])
+def test_pharmacy_required(app, is_pharmacy, claims, status):
+    user = make_user("role@example.com", is_pharmacy)
+
+    response = app.test_client().get("/api/inventory/jobs", headers=bearer(user, claims))
+
+    assert response.status_code == status
+
+
+def test_deleted_account_tokens_stop_working(app):
+    user = make_user("deleted@example.com", is_pharmacy=True)
+    headers = bearer(user)
+    client = app.test_client()
+    assert client.get("/api/profile", headers=headers).status_code == 200
+
+    assert client.delete("/api/profile", headers=headers).status_code == 200
+
+    assert client.get("/api/profile", headers=headers).status_code == 404
+    assert client.get("/api/inventory/jobs", headers=headers).status_code == 404
+    assert client.get("/api/inventory/jobs").status_code == 401
@@ -0,0 +1,126 @@
+# tests/test_fuzzy_index.py
+
+import random
+
+import pytest
+
+from app.utils.fuzzy_index import SymSpellIndex, edit_distance
+
+
+def osa_row(a, b):
+    """
+    Brute-force answer: the last row of the full optimal string alignment
+    table, i.e. the distances from `a` to every beginning of `b`.
+    """
+    d = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)]
+
+
+def osa(a, b):
+    return osa_row(a, b)[-1]
+
+
+def prefix_osa(a, b):
+    return min(osa_row(a, b))
+
+
+def typo(rng, word, edits):
+    for _ in range(edits):
+        if not word:
+            return rng.choice("abcde")
+        i = rng.randrange(len(word))
+        kind = rng.choice("sidt")
+        if kind == "s":
+            word = word[:i] + rng.choice("abcde") + word[i + 1:]
+        elif kind == "i":
+            word = word[:i] + rng.choice("abcde") + word[i:]
+        elif kind == "d" and len(word) > 1:
+            word = word[:i] + word[i + 1:]
+        elif kind == "t" and i + 1 < len(word):
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+def random_word(rng, low=4, high=12):
+    return "".join(rng.choice("abcde") for _ in range(rng.randint(low, high)))
+
+
+def test_edit_distance_matches_brute_force():
+    rng = random.Random(17)
+    for _ in range(3000):
+        a = random_word(rng, 0, 9)
+        b = typo(rng, a, rng.randint(0, 3)) if rng.random() < 0.7 else random_word(rng, 0, 9)
+        for max_distance in (0, 1, 2, 3):
+            want = osa(a, b)
+            assert edit_distance(a, b, max_distance) == (want if want <= max_distance else max_distance + 1)
+            want = prefix_osa(a, b)
+            assert edit_distance(a, b, max_distance, prefix=True) == (want if want <= max_distance else max_distance + 1)
+
+
+def expected(terms, query, max_distance, prefix=False):
+    """
+    Brute-force lookup: every name within max_distance, by distance, then
+    weight, then name.
+    """
+    query = query.lower()
+    matches = []
+    for name, weight in terms.items():
+        distance = (prefix_osa if prefix else osa)(query, name.lower())
+        if distance <= max_distance:
+            matches.append((distance, -weight, name))
+    return [(distance, name) for distance, _, name in sorted(matches)]
+
+
+@pytest.fixture
+def catalog():
+    rng = random.Random(23)
+    terms = {}
+    for _ in range(600):
+        name = random_word(rng)
+        terms[name.capitalize() if rng.random() < 0.5 else name] = float(rng.randint(1, 9))
+    index = SymSpellIndex(max_distance=2, prefix_length=7)
+    for name, weight in terms.items():
+        index.insert(name, weight)
+    return rng, terms, index
+
+
+def test_lookup_matches_brute_force(catalog):
+    rng, terms, index = catalog
+    names = sorted(terms)
+    for _ in range(100):
+        query = typo(rng, rng.choice(names), rng.randint(0, 3))
+        want = expected(terms, query, 2)
+        assert index.lookup(query, limit=1000) == want
+        assert index.lookup(query, limit=1000, max_distance=1) == [hit for hit in want if hit[0] <= 1]
+
+
+def test_prefix_lookup_matches_brute_force_once_the_prefix_is_typed(catalog):
+    rng, terms, index = catalog
+    names = [name for name in sorted(terms) if len(name) >= 9]
+    for _ in range(100):
+        name = rng.choice(names)
+        query = typo(rng, name[:rng.randint(7, len(name))], rng.randint(0, 2))
+        found = index.lookup(query, limit=1000, prefix=True)
+        if len(query) >= 7:
+            assert found == expected(terms, query, 2, prefix=True)
+        else:
+            assert set(found) <= set(expected(terms, query, 2, prefix=True))
+
+
+def test_removed_names_are_not_found(catalog):
+    _, terms, index = catalog
+    index.insert("Paracetamol", 5.0)
+    index.insert("PARACETAMOL", 1.0)
+    assert index.lookup("paracetmol", limit=3) == [(1, "Paracetamol"), (1, "PARACETAMOL")]
+
+    assert index.remove("Paracetamol")
+    assert not index.remove("Paracetamol")
+    assert index.lookup("paracetmol") == [(1, "PARACETAMOL")]
+    assert index.remove("PARACETAMOL")
+    assert index.lookup("paracetmol") == []
+    assert len(index) == len({name.lower() for name in terms})
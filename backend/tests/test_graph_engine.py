@@ -0,0 +1,148 @@
+# tests/test_graph_engine.py
+
+import random
+from array import array
+
+import pytest
+
+from app.utils import graph_interface
+from app.utils.graph_interface import INF, CSRGraph, PythonCSRGraph
+
+ENGINES = [
+    pytest.param(PythonCSRGraph, id="python"),
+    pytest.param(
+        getattr(graph_interface.dijkstra_graph, "CSRGraph", None), id="cpp",
+        marks=pytest.mark.skipif(not graph_interface.CPP_AVAILABLE, reason="dijkstra_graph is not built"),
+    ),
+]
+
+
+def random_graph(rng, n, edges):
+    adjacency = {node: [] for node in range(n)}
+    for _ in range(edges):
+        adjacency[rng.randrange(n)].append((rng.randrange(n), round(rng.uniform(0.1, 10.0), 3)))
+    return adjacency
+
+
+def to_csr(adjacency):
+    offsets, targets, weights = array("q", [0]), array("q"), array("d")
+    for node in range(len(adjacency)):
+        for neighbour, weight in adjacency[node]:
+            targets.append(neighbour)
+            weights.append(weight)
+        offsets.append(len(targets))
+    return offsets, targets, weights
+
+
+def expected(adjacency, sources):
+    """
+    Brute-force answer: Bellman-Ford from {node: start distance}.
+    """
+    dist = [INF] * len(adjacency)
+    for node, d in sources.items():
+        dist[node] = min(dist[node], d)
+    for _ in range(len(adjacency)):
+        changed = False
+        for node, edges in adjacency.items():
+            for neighbour, weight in edges:
+                if dist[node] + weight < dist[neighbour]:
+                    dist[neighbour] = dist[node] + weight
+                    changed = True
+        if not changed:
+            break
+    return dist
+
+
+def run(engine, n, sources, goals=(), stop_at_first_goal=False):
+    dist = array("d", [INF]) * n
+    pred = array("q", [-1]) * n
+    reached = engine.run(list(sources), list(sources.values()), list(goals), stop_at_first_goal, dist, pred)
+    return reached, dist, pred
+
+
+@pytest.mark.parametrize("make_engine", ENGINES)
+def test_distances_match_brute_force(make_engine):
+    rng = random.Random(8)
+    for n, edges in ((1, 0), (30, 60), (200, 1200)):
+        adjacency = random_graph(rng, n, edges)
+        engine = make_engine(*to_csr(adjacency))
+        for _ in range(5):
+            sources = {rng.randrange(n): rng.choice((0.0, 1.5)) for _ in range(rng.choice((1, 3)))}
+            _, dist, pred = run(engine, n, sources)
+
+            assert list(dist) == pytest.approx(expected(adjacency, sources))
+            # Predecessors form shortest-path trees rooted at the sources
+            for node in range(n):
+                if pred[node] >= 0:
+                    weight = min(w for v, w in adjacency[pred[node]] if v == node)
+                    assert dist[node] == pytest.approx(dist[pred[node]] + weight)
+                elif dist[node] != INF:
+                    assert node in sources
+
+
+@pytest.mark.parametrize("make_engine", ENGINES)
+def test_search_stops_at_the_nearest_goal(make_engine):
+    rng = random.Random(3)
+    n = 150
+    adjacency = random_graph(rng, n, 700)
+    engine = make_engine(*to_csr(adjacency))
+
+    for _ in range(20):
+        sources = {rng.randrange(n): 0.0}
+        goals = rng.sample(range(n), 5)
+        want = expected(adjacency, sources)
+        reached, dist, _ = run(engine, n, sources, goals, stop_at_first_goal=True)
+
+        best = min(want[goal] for goal in goals)
+        if best == INF:
+            assert reached == -1
+        else:
+            assert reached in goals
+            assert dist[reached] == pytest.approx(best)
+
+
+@pytest.mark.parametrize("make_engine", ENGINES)
+def test_inconsistent_buffers_are_rejected(make_engine):
+    with pytest.raises(ValueError):
+        make_engine(array("q", [0, 2]), array("q", [1]), array("d", [1.0]))
+    with pytest.raises(ValueError):
+        make_engine(array("q", [0, 1]), array("q", [0]), array("d", []))
+
+
+@pytest.mark.skipif(not graph_interface.CPP_AVAILABLE, reason="dijkstra_graph is not built")
+def test_engines_agree_on_paths():
+    rng = random.Random(12)
+    adjacency = {
+        f"n{node}": [(f"n{v}", w) for v, w in edges]
+        for node, edges in random_graph(rng, 300, 2000).items()
+    }
+    cpp = CSRGraph.from_adjacency(adjacency)
+    python = CSRGraph.from_adjacency(adjacency)
+    python._engine = PythonCSRGraph(python.offsets, python.targets, python.weights)
+    assert cpp.backend == "cpp"
+
+    for _ in range(30):
+        start, end = rng.sample(sorted(adjacency), 2)
+        assert cpp.distances(start) == pytest.approx(python.distances(start))
+        cpp_path, python_path = cpp.shortest_path(start, end), python.shortest_path(start, end)
+        assert (cpp_path is None) == (python_path is None)
+        targets = set(rng.sample(sorted(adjacency), 4))
+        cpp_hit, python_hit = cpp.nearest_target({start: 0.0}, targets), python.nearest_target({start: 0.0}, targets)
+        assert (cpp_hit is None) == (python_hit is None)
+        if cpp_hit is not None:
+            assert cpp_hit[1] == pytest.approx(python_hit[1])
+
+
+def test_wrapper_maps_node_ids_and_rebuilds_paths():
+    graph = CSRGraph.from_adjacency({
+        "A": [("B", 1.0), ("C", 4.0)],
+        "B": [("C", 1.0), ("D", 5.0)],
+        "C": [("D", 1.0)],
+    })
+
+    assert len(graph) == 4 and "D" in graph
+    assert graph.shortest_path("A", "D") == ["A", "B", "C", "D"]
+    assert graph.distances("B") == {"B": 0.0, "C": 1.0, "D": 2.0}
+    assert graph.nearest_target({"A": 0.5, "C": 3.0}, {"C", "D"}) == ("C", 2.5, ["A", "B", "C"])
+    assert graph.shortest_path("D", "A") is None
+    assert graph.nearest_target({"X": 0.0}, {"D"}) is None
@@ -0,0 +1,193 @@
+# tests/test_ingest_jobs.py
+
+import io
+import json
+import os
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from werkzeug.datastructures import FileStorage
+
+from app import db
+from app.models import IngestJob, Inventory, InventoryStaging, User
+from app.utils import ingest_jobs
+from app.utils.auth_utils import token_claims
+from app.utils.ingest_jobs import (
+    CompletedJobFeed, claim_job, claim_next_job, enqueue_upload, requeue_stale_jobs, run_job,
+)
+from app.utils.inventory_ingest import ingest_inventory
+
+CSV = b"name,stock,price,expiry_date\nParacetamol,10,2.5,2030-01-01\nIbuprofen,4,3.0,2030-06-01\n"
+
+
+def enqueue(app, pharmacy_id, data=CSV):
+    job = enqueue_upload(pharmacy_id, FileStorage(io.BytesIO(data), "inventory.csv"), app.config["INGEST_JOB_DIR"])
+    return job.id
+
+
+def status(job_id):
+    db.session.expire_all()
+    return db.session.get(IngestJob, job_id).status
+
+
+def test_enqueue_spools_the_file_and_counts_rows(app, make_pharmacy):
+    job_id = enqueue(app, make_pharmacy("spool@example.com"))
+
+    job = db.session.get(IngestJob, job_id)
+    assert (job.status, job.total_rows, job.rows_processed) == ("queued", 2, 0)
+    with open(job.file_path, "rb") as f:
+        assert f.read() == CSV
+
+
+def test_claim_job_is_exclusive(app, make_pharmacy):
+    pharmacy_id = make_pharmacy("exclusive@example.com")
+    job_id = enqueue(app, pharmacy_id)
+
+    assert claim_job(job_id, pharmacy_id, "host:1:0")
+    assert not claim_job(job_id, pharmacy_id, "host:2:0")
+    assert db.session.get(IngestJob, job_id).worker == "host:1:0"
+
+
+def test_pharmacy_jobs_run_one_at_a_time_in_upload_order(app, make_pharmacy):
+    first_pharmacy = make_pharmacy("first@example.com")
+    second_pharmacy = make_pharmacy("second@example.com", 30.32, 78.04)
+    first = enqueue(app, first_pharmacy)
+    second = enqueue(app, first_pharmacy)
+    other = enqueue(app, second_pharmacy)
+
+    # Other pharmacies' jobs run concurrently; a pharmacy's next job waits
+    assert claim_next_job("host:1:0") == first
+    assert claim_next_job("host:1:1") == other
+    assert claim_next_job("host:1:2") is None
+
+    run_job(first, "host:1:0", app.config)
+    assert status(first) == "succeeded"
+    assert claim_next_job("host:1:2") == second
+
+
+def test_run_job_records_the_outcome_and_removes_the_file(app, make_pharmacy):
+    pharmacy_id = make_pharmacy("run@example.com")
+    job_id = enqueue(app, pharmacy_id)
+    path = db.session.get(IngestJob, job_id).file_path
+    claim_job(job_id, pharmacy_id, "host:1:0")
+
+    run_job(job_id, "host:1:0", app.config)
+
+    job = db.session.get(IngestJob, job_id)
+    result = json.loads(job.result)
+    assert (job.status, job.rows_processed) == ("succeeded", 2)
+    assert result["changes"]["inserted"] == 2
+    assert len(result["medicine_ids"]) == 2
+    assert Inventory.query.filter_by(pharmacy_id=pharmacy_id).count() == 2
+    assert not os.path.exists(path)
+
+
+def test_legacy_upload_route_queues_an_add_to_stock_job(app, make_pharmacy):
+    pharmacy_id = make_pharmacy("legacy@example.com")
+    replaced = enqueue(app, pharmacy_id)
+    claim_job(replaced, pharmacy_id, "host:1:0")
+    run_job(replaced, "host:1:0", app.config)
+    user = db.session.get(User, pharmacy_id)
+    token = create_access_token(identity=user.email, additional_claims=token_claims(user))
+
+    response = app.test_client().post(
+        "/api/upload",
+        data={"file": (io.BytesIO(b"name,stock,price,expiry_date\nParacetamol,5,2.5,2030-01-01\n"), "more.csv")},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    assert db.session.get(IngestJob, job_id).mode == "add"
+    claim_job(job_id, pharmacy_id, "host:1:0")
+    run_job(job_id, "host:1:0", app.config)
+    assert status(job_id) == "succeeded"
+    assert sorted(row.stock for row in Inventory.query.filter_by(pharmacy_id=pharmacy_id)) == [4, 15]
+
+
+def test_invalid_file_fails_the_job(app, make_pharmacy):
+    pharmacy_id = make_pharmacy("invalid@example.com")
+    job_id = enqueue(app, pharmacy_id, b"name,stock,price,expiry_date\nParacetamol,ten,2.5,2030-01-01\n")
+    claim_job(job_id, pharmacy_id, "host:1:0")
+
+    run_job(job_id, "host:1:0", app.config)
+
+    job = db.session.get(IngestJob, job_id)
+    assert job.status == "failed"
+    assert json.loads(job.errors)[0].startswith("Line 2:")
+    assert Inventory.query.count() == 0
+
+
+def test_stalled_jobs_are_requeued(app, make_pharmacy):
+    pharmacy_id = make_pharmacy("stale@example.com")
+    stalled = enqueue(app, pharmacy_id)
+    claim_job(stalled, pharmacy_id, "host:1:0")
+    assert requeue_stale_jobs(60) == 0
+
+    job = db.session.get(IngestJob, stalled)
+    job.updated_at = datetime.utcnow() - timedelta(seconds=120)
+    db.session.commit()
+
+    assert requeue_stale_jobs(60) == 1
+    job = db.session.get(IngestJob, stalled)
+    assert (job.status, job.worker, job.started_at) == ("queued", None, None)
+    assert claim_next_job("host:2:0") == stalled
+
+
+def test_requeued_job_is_abandoned_by_its_stalled_worker(app, make_pharmacy):
+    pharmacy_id = make_pharmacy("requeued@example.com")
+    job_id = enqueue(app, pharmacy_id)
+    path = db.session.get(IngestJob, job_id).file_path
+    claim_job(job_id, pharmacy_id, "host:1:0")
+    job = db.session.get(IngestJob, job_id)
+    job.updated_at = datetime.utcnow() - timedelta(seconds=120)
+    db.session.commit()
+    requeue_stale_jobs(60)
+    assert claim_next_job("host:2:0") == job_id
+
+    # The stalled worker wakes up: it must neither ingest nor clean up
+    run_job(job_id, "host:1:0", app.config)
+    job = db.session.get(IngestJob, job_id)
+    assert (job.status, job.worker, job.rows_processed) == ("running", "host:2:0", 0)
+    assert os.path.exists(path)
+    assert Inventory.query.count() == 0
+    assert InventoryStaging.query.count() == 0
+
+    run_job(job_id, "host:2:0", app.config)
+    assert status(job_id) == "succeeded"
+    assert Inventory.query.filter_by(pharmacy_id=pharmacy_id).count() == 2
+    assert not os.path.exists(path)
+
+
+def test_progress_is_reported_while_rows_are_only_validated(app, make_pharmacy):
+    pharmacy_id = make_pharmacy("heartbeat@example.com")
+    rows = "".join(f"Med{i},x,1.0,2030-01-01\n" for i in range(50))
+    beats = []
+    result = ingest_inventory(
+        pharmacy_id, io.BytesIO(("name,stock,price,expiry_date\n" + rows).encode()),
+        max_errors=100, trace_memory=False, progress=beats.append, progress_interval=0,
+    )
+
+    assert len(result.errors) == 50
+    assert beats == list(range(1, 51))
+
+
+def test_feed_replays_jobs_completed_by_other_processes(app, make_pharmacy, monkeypatch):
+    replayed = []
+    monkeypatch.setattr(ingest_jobs, "notify_inventory_listeners", replayed.append)
+    pharmacy_id = make_pharmacy("feed@example.com")
+    web = CompletedJobFeed("web:1")
+    worker = CompletedJobFeed("worker:7")
+
+    job_id = enqueue(app, pharmacy_id)
+    claim_job(job_id, pharmacy_id, "worker:7:0")
+    run_job(job_id, "worker:7:0", app.config)
+
+    # The worker process already notified its listeners
+    assert worker.poll() == 0
+    assert web.poll() == 1
+    assert replayed[0].pharmacy_id == pharmacy_id
+    assert replayed[0].medicine_ids == set(json.loads(db.session.get(IngestJob, job_id).result)["medicine_ids"])
+    # Each job is replayed once
+    assert web.poll() == 0
+    assert len(replayed) == 1
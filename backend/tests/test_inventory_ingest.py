@@ -0,0 +1,167 @@
+# tests/test_inventory_ingest.py
+
+import io
+from datetime import date
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Inventory, InventoryStaging, Medicine, MedicineAvailability
+from app.utils.inventory_ingest import ingest_inventory, upsert_inventory_rows
+
+
+def upload(pharmacy_id, *rows):
+    csv = "name,stock,price,expiry_date\n" + "".join(f"{row}\n" for row in rows)
+    return ingest_inventory(pharmacy_id, io.BytesIO(csv.encode()), trace_memory=False)
+
+
+def batches(pharmacy_id):
+    return {
+        (row.medicine.name, row.expiry_date.isoformat(), row.price): row.stock
+        for row in Inventory.query.filter_by(pharmacy_id=pharmacy_id)
+    }
+
+
+def test_first_upload_inserts_batches_and_new_medicines(make_pharmacy):
+    pharmacy_id = make_pharmacy("first@example.com")
+
+    result = upload(pharmacy_id, "Paracetamol,10,2.5,2030-01-01", "Ibuprofen,4,3.0,2030-06-01")
+
+    assert result.errors == []
+    assert result.new_medicines == 2
+    assert result.changes.counts() == {'inserted': 2, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    assert batches(pharmacy_id) == {
+        ("Paracetamol", "2030-01-01", 2.5): 10,
+        ("Ibuprofen", "2030-06-01", 3.0): 4,
+    }
+
+
+def test_reupload_writes_only_the_difference(make_pharmacy):
+    pharmacy_id = make_pharmacy("diff@example.com")
+    upload(pharmacy_id, "Paracetamol,10,2.5,2030-01-01", "Ibuprofen,4,3.0,2030-06-01", "Cetirizine,7,1.0,2030-03-01")
+    kept_id = Inventory.query.filter_by(pharmacy_id=pharmacy_id, stock=10).one().id
+
+    result = upload(pharmacy_id, "paracetamol,10,2.5,2030-01-01", "Ibuprofen,6,3.0,2030-06-01", "Aspirin,3,0.5,2030-02-01")
+
+    assert result.changes.counts() == {'inserted': 1, 'updated': 1, 'deleted': 1, 'unchanged': 1}
+    assert result.changes.updated[0]['previous_stock'] == 4
+    assert batches(pharmacy_id) == {
+        ("Paracetamol", "2030-01-01", 2.5): 10,
+        ("Ibuprofen", "2030-06-01", 3.0): 6,
+        ("Aspirin", "2030-02-01", 0.5): 3,
+    }
+    # Unchanged batches keep their rows
+    assert db.session.get(Inventory, kept_id).stock == 10
+    # Names are matched case-insensitively against the catalog
+    assert Medicine.query.filter(Medicine.name.ilike("paracetamol")).count() == 1
+
+
+def test_batch_listed_twice_has_its_stock_summed(make_pharmacy):
+    pharmacy_id = make_pharmacy("repeat@example.com")
+
+    result = upload(pharmacy_id, "Paracetamol,10,2.5,2030-01-01", "Paracetamol,5,2.5,2030-01-01")
+
+    assert result.changes.counts()['inserted'] == 1
+    assert batches(pharmacy_id) == {("Paracetamol", "2030-01-01", 2.5): 15}
+
+
+def test_medicine_created_by_a_concurrent_upload_is_reused(make_pharmacy):
+    pharmacy_id = make_pharmacy("race@example.com")
+
+    def create_concurrently(rows):
+        # Another pharmacy's job commits the same new name after the catalog was read
+        if Medicine.query.count() == 0:
+            db.session.add(Medicine(name="PARACETAMOL"))
+
+    csv = "name,stock,price,expiry_date\nParacetamol,10,2.5,2030-01-01\nIbuprofen,4,3.0,2030-06-01\n"
+    result = ingest_inventory(pharmacy_id, io.BytesIO(csv.encode()), trace_memory=False, progress=create_concurrently)
+
+    assert result.errors == []
+    assert sorted(medicine.name for medicine in Medicine.query) == ["Ibuprofen", "PARACETAMOL"]
+    assert batches(pharmacy_id) == {
+        ("PARACETAMOL", "2030-01-01", 2.5): 10,
+        ("Ibuprofen", "2030-06-01", 3.0): 4,
+    }
+
+
+def test_medicine_names_are_unique_regardless_of_case(app):
+    db.session.add(Medicine(name="Paracetamol"))
+    db.session.commit()
+    db.session.add(Medicine(name="paracetamol"))
+
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_upload_with_invalid_rows_changes_nothing(make_pharmacy):
+    pharmacy_id = make_pharmacy("invalid@example.com")
+    upload(pharmacy_id, "Paracetamol,10,2.5,2030-01-01")
+
+    result = upload(pharmacy_id, "Paracetamol,1,2.5,2030-01-01", "Ibuprofen,many,3.0,2030-06-01", ",1,1.0,2030-01-01")
+
+    assert result.changes is None
+    assert [error.split(":")[0] for error in result.errors] == ["Line 3", "Line 4"]
+    assert batches(pharmacy_id) == {("Paracetamol", "2030-01-01", 2.5): 10}
+    assert InventoryStaging.query.count() == 0
+
+
+def test_upload_refreshes_availability_in_the_same_transaction(make_pharmacy):
+    pharmacy_id = make_pharmacy("availability@example.com")
+    upload(pharmacy_id, "Paracetamol,10,2.5,2030-01-01", "Paracetamol,4,2.0,2030-02-01")
+
+    (summary,) = MedicineAvailability.query.filter_by(pharmacy_id=pharmacy_id).all()
+    assert (summary.total_stock, summary.min_price) == (14, 2.0)
+
+    upload(pharmacy_id)
+    assert MedicineAvailability.query.filter_by(pharmacy_id=pharmacy_id).count() == 0
+
+
+def test_upsert_updates_existing_batches_in_place(make_pharmacy):
+    pharmacy_id = make_pharmacy("upsert@example.com")
+    medicine = Medicine(name="Paracetamol")
+    db.session.add(medicine)
+    db.session.commit()
+    batch = {'pharmacy_id': pharmacy_id, 'medicine_id': medicine.id, 'expiry_date': date(2030, 1, 1), 'price': 2.5}
+
+    upsert_inventory_rows([dict(batch, stock=10)])
+    db.session.commit()
+    row_id = Inventory.query.one().id
+    upsert_inventory_rows([dict(batch, stock=3), dict(batch, price=3.0, stock=1)])
+    db.session.commit()
+
+    rows = {row.price: (row.id, row.stock) for row in Inventory.query}
+    assert rows[2.5] == (row_id, 3)
+    assert rows[3.0][1] == 1
+
+
+def test_add_stock_upload_adds_to_listed_batches_only(make_pharmacy):
+    pharmacy_id = make_pharmacy("add@example.com")
+    upload(pharmacy_id, "Paracetamol,10,2.5,2030-01-01", "Ibuprofen,4,3.0,2030-06-01")
+    ibuprofen_id = Medicine.query.filter_by(name="Ibuprofen").one().id
+    csv = ("medicine_id,name,stock,price,expiry_date\n"
+           ",paracetamol,5,2.5,2030-01-01\n"
+           f"{ibuprofen_id},,0,3.0,2030-06-01\n"
+           f"{ibuprofen_id},,2,3.5,2030-06-01\n")
+
+    result = ingest_inventory(pharmacy_id, io.BytesIO(csv.encode()), trace_memory=False, add_stock=True)
+
+    assert result.changes.counts() == {'inserted': 1, 'updated': 1, 'deleted': 0, 'unchanged': 1}
+    assert batches(pharmacy_id) == {
+        ("Paracetamol", "2030-01-01", 2.5): 15,
+        ("Ibuprofen", "2030-06-01", 3.0): 4,
+        ("Ibuprofen", "2030-06-01", 3.5): 2,
+    }
+
+
+def test_add_stock_upload_rejects_unknown_medicines(make_pharmacy):
+    pharmacy_id = make_pharmacy("unknown@example.com")
+    upload(pharmacy_id, "Paracetamol,10,2.5,2030-01-01")
+    csv = "medicine_id,name,stock,price,expiry_date\n,Aspirin,1,0.5,2030-01-01\n999,,1,0.5,2030-01-01\n"
+
+    result = ingest_inventory(pharmacy_id, io.BytesIO(csv.encode()), trace_memory=False, add_stock=True)
+
+    assert [error.split(":")[0] for error in result.errors] == ["Line 2", "Line 3"]
+    assert Medicine.query.count() == 1
+    assert batches(pharmacy_id) == {("Paracetamol", "2030-01-01", 2.5): 10}
@@ -0,0 +1,107 @@
+# tests/test_metrics.py
+
+import random
+
+import pytest
+
+from app import create_app, db
+from app.models import Medicine
+from app.utils import ingest_jobs, metrics
+from app.utils.metrics import Counter, Histogram, render_metrics, stage
+from conftest import make_config
+
+
+def parse(lines):
+    """
+    {sample name with labels: value} from exposition-format lines.
+    """
+    samples = {}
+    for line in lines:
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_histogram_buckets_match_brute_force():
+    rng = random.Random(3)
+    histogram = Histogram("latency_seconds", "Latency.", ("endpoint",), buckets=(0.01, 0.1, 1.0))
+    values = {"/a": [rng.expovariate(5) for _ in range(500)], "/b": [0.01, 0.1, 5.0]}
+    for endpoint, observed in values.items():
+        for value in observed:
+            histogram.observe(value, endpoint)
+
+    samples = parse(histogram.render())
+    for endpoint, observed in values.items():
+        for bound in ("0.01", "0.1", "1.0"):
+            assert samples[f'latency_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}}'] == sum(
+                value <= float(bound) for value in observed
+            )
+        assert samples[f'latency_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}}'] == len(observed)
+        assert samples[f'latency_seconds_sum{{endpoint="{endpoint}"}}'] == pytest.approx(sum(observed))
+        assert histogram.count(endpoint) == len(observed)
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("calls_total", "Calls.", ("path",))
+    counter.inc('say "hi"\n')
+    counter.inc('say "hi"\n', amount=2)
+
+    assert counter.render()[-1] == 'calls_total{path="say \\"hi\\"\\n"} 3'
+
+
+def test_stage_is_a_no_op_outside_requests():
+    with stage("compute"):
+        pass
+
+
+@pytest.fixture
+def client(tmp_path):
+    config = type("MetricsConfig", (make_config(tmp_path),), {
+        "METRICS_ENABLED": True,
+        "SLOW_REQUEST_MS": 0.001,
+        "SLOW_REQUEST_EXPLAIN": True,
+    })
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Medicine(name="Paracetamol"))
+        db.session.commit()
+        yield app.test_client()
+        db.session.remove()
+        db.drop_all()
+    ingest_jobs.ingest_workers.stop(timeout=5)
+
+
+def test_requests_are_timed_by_stage_and_logged_when_slow(client, capsys):
+    endpoint = "/api/search_by_prefix"
+    before = {
+        "requests": metrics.requests_total.value(endpoint, "GET", "200"),
+        "latency": metrics.request_duration.count(endpoint, "GET"),
+        "queries": metrics.db_queries_per_request.count(endpoint),
+        "stages": {name: metrics.request_stage_duration.count(endpoint, name) for name in metrics.STAGES},
+    }
+
+    response = client.get("/api/search_by_prefix?prefix=para")
+
+    assert response.status_code == 200
+    assert metrics.requests_total.value(endpoint, "GET", "200") == before["requests"] + 1
+    assert metrics.request_duration.count(endpoint, "GET") == before["latency"] + 1
+    assert metrics.db_queries_per_request.count(endpoint) == before["queries"] + 1
+    for name in metrics.STAGES:
+        assert metrics.request_stage_duration.count(endpoint, name) == before["stages"][name] + 1
+    assert metrics.slow_requests.value(endpoint) >= 1
+    assert f"Slow request GET /api/search_by_prefix ({endpoint})" in capsys.readouterr().out
+
+
+def test_metrics_endpoint_serves_the_registry(client):
+    client.get("/api/search_by_prefix?prefix=para")
+    response = client.get("/metrics")
+
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    for metric in metrics.REGISTRY:
+        assert f"# TYPE {metric.name} " in body
+    assert 'medilocate_requests_total{endpoint="/api/search_by_prefix",method="GET",status="200"}' in body
+    # Scrapes are not recorded themselves
+    assert 'endpoint="/metrics"' not in render_metrics()
@@ -0,0 +1,197 @@
+# tests/test_pharmacy_onboarding.py
+
+import csv
+import io
+import random
+
+import pytest
+from werkzeug.security import check_password_hash
+
+from app import db
+from app.models import User
+from app.utils import pharmacy_onboarding
+from app.utils.geocode_utils import SyntheticBackend, set_backend
+from app.utils.pharmacy_onboarding import ADDRESS_COLUMNS, onboard_pharmacies
+from app.utils.spatial_index import pharmacy_index
+
+FIELDS = ("name", "email", "password", "address") + ADDRESS_COLUMNS
+
+
+class PartialBackend(SyntheticBackend):
+    """
+    The synthetic geocoder, except that addresses in "Atlantis" don't exist.
+    """
+
+    def geocode(self, address):
+        return None if "atlantis" in address.lower() else super().geocode(address)
+
+
+def random_rows(rng, count, registered):
+    rows = []
+    for i in range(count):
+        row = {"name": f"Pharmacy {i}", "email": f"p{i}@example.com", "password": rng.choice(("", "secret"))}
+        if rng.random() < 0.5:
+            row["address"] = f"{i} Main St, {rng.choice(('Dehradun', 'Atlantis'))}"
+        else:
+            row.update(address_line=f"{i} Main St", city=rng.choice(("Dehradun", "Atlantis")),
+                       state="UK", postal_code="248001", country="India")
+        kind = rng.random()
+        if kind < 0.1:
+            row["name"] = ""
+        elif kind < 0.2:
+            row["email"] = "not-an-email"
+        elif kind < 0.3 and "address" not in row:
+            row["city"] = ""
+        elif kind < 0.45 and rows:
+            row["email"] = rng.choice(rows)["email"].upper()
+        elif kind < 0.55 and registered:
+            row["email"] = rng.choice(registered)
+        rows.append(row)
+    return rows
+
+
+def to_csv(rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return io.BytesIO(out.getvalue().encode("utf-8"))
+
+
+def expected(rows, registered, default_password):
+    """
+    Brute-force answer: ({email: line} of the accounts created, {line:
+    error prefix} of the rows that fail), checking each row on its own.
+    """
+    created, failed, seen = {}, {}, set()
+    for line, row in enumerate(rows, start=2):
+        parts = [row.get(column, "") for column in ADDRESS_COLUMNS]
+        address = row.get("address") or ", ".join(parts)
+        if not row.get("address") and not all(parts):
+            failed[line] = "Missing address fields"
+        elif not row["name"]:
+            failed[line] = "Name is required"
+        elif "@" not in row["email"]:
+            failed[line] = "A valid email is required"
+        elif not (row["password"] or default_password):
+            failed[line] = "Password is required"
+        elif row["email"].lower() in seen:
+            failed[line] = "Email listed more than once"
+        elif row["email"] in registered:
+            seen.add(row["email"].lower())
+            failed[line] = "Email already registered"
+        elif "atlantis" in address.lower():
+            seen.add(row["email"].lower())
+            failed[line] = "Invalid address"
+        else:
+            seen.add(row["email"].lower())
+            created[row["email"]] = line
+    return created, failed
+
+
+def assert_matches(result, rows, registered, default_password):
+    created, failed = expected(rows, registered, default_password)
+    assert {entry["email"]: entry["line"] for entry in result.created} == created
+    assert [failure["line"] for failure in result.failures] == sorted(failed)
+    for failure in result.failures:
+        assert failure["error"].startswith(failed[failure["line"]])
+    backend = SyntheticBackend()
+    by_line = {line: row for line, row in enumerate(rows, start=2)}
+    for entry in result.created:
+        row = by_line[entry["line"]]
+        address = row.get("address") or ", ".join(row[column] for column in ADDRESS_COLUMNS)
+        assert (entry["latitude"], entry["longitude"]) == pytest.approx(backend.geocode(address))
+    assert result.stats()["rows"] == len(rows)
+
+
+def register(emails):
+    for email in emails:
+        db.session.add(User(name="existing", email=email, password="x", is_pharmacy=True))
+    db.session.commit()
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("default_password", [None, "changeme"])
+def test_onboarding_matches_brute_force(app, seed, default_password):
+    rng = random.Random(seed)
+    set_backend(PartialBackend())
+    registered = ["taken0@example.com", "taken1@example.com"]
+    register(registered)
+    rows = random_rows(rng, 20, registered)
+
+    result = onboard_pharmacies(to_csv(rows), default_password=default_password, chunk_size=3, hash_workers=4)
+
+    assert_matches(result, rows, registered, default_password)
+    assert User.query.count() == len(registered) + len(result.created)
+    assert len(pharmacy_index) == len(result.created)
+    by_line = {line: row for line, row in enumerate(rows, start=2)}
+    for entry in result.created:
+        user = db.session.get(User, entry["id"])
+        assert (user.email, user.is_pharmacy) == (entry["email"], True)
+        assert (user.latitude, user.longitude) == (entry["latitude"], entry["longitude"])
+        assert check_password_hash(user.password, by_line[entry["line"]]["password"] or default_password)
+
+
+def test_dry_run_writes_nothing(app):
+    rng = random.Random(8)
+    set_backend(PartialBackend())
+    rows = random_rows(rng, 20, [])
+
+    result = onboard_pharmacies(to_csv(rows), default_password="changeme", dry_run=True)
+
+    assert_matches(result, rows, [], "changeme")
+    assert all(entry["id"] is None for entry in result.created)
+    assert User.query.count() == 0
+    assert len(pharmacy_index) == 0
+
+
+def test_emails_registered_during_the_upload_fail_alone(app, monkeypatch):
+    rows = [{"name": f"Pharmacy {i}", "email": f"p{i}@example.com", "password": "secret",
+             "address": f"{i} Main St, Dehradun"} for i in range(5)]
+    geocode_addresses = pharmacy_onboarding.geocode_addresses
+
+    def register_then_geocode(addresses):
+        # Someone signs up with one of the emails after the duplicate check
+        register(["p3@example.com"])
+        return geocode_addresses(addresses)
+
+    monkeypatch.setattr(pharmacy_onboarding, "geocode_addresses", register_then_geocode)
+    result = onboard_pharmacies(to_csv(rows), chunk_size=10)
+
+    assert [entry["email"] for entry in result.created] == ["p0@example.com", "p1@example.com",
+                                                            "p2@example.com", "p4@example.com"]
+    assert result.failures == [{"line": 5, "email": "p3@example.com", "error": "Email already registered"}]
+
+
+def test_too_many_rows_are_refused(app):
+    rows = [{"name": "P", "email": f"p{i}@example.com", "password": "x", "address": "Dehradun"} for i in range(3)]
+
+    with pytest.raises(ValueError):
+        onboard_pharmacies(to_csv(rows), max_rows=2)
+
+
+def test_bulk_route_needs_the_onboarding_key(app):
+    app.config["ONBOARDING_API_KEY"] = "operator-key"
+    rows = [{"name": "One", "email": "one@example.com", "password": "secret", "address": "1 Main St, Dehradun"},
+            {"name": "", "email": "two@example.com", "password": "secret", "address": "2 Main St, Dehradun"}]
+    client = app.test_client()
+
+    def post(key, dry_run="false"):
+        data = {"file": (to_csv(rows), "chain.csv"), "dry_run": dry_run}
+        return client.post("/api/pharmacies/bulk", data=data, headers={"X-Onboarding-Key": key},
+                           content_type="multipart/form-data")
+
+    assert post("wrong").status_code == 403
+    response = post("operator-key", dry_run="true")
+    assert response.status_code == 200
+    assert User.query.count() == 0
+
+    response = post("operator-key")
+    assert response.status_code == 201
+    body = response.get_json()
+    assert [entry["email"] for entry in body["created"]] == ["one@example.com"]
+    assert [failure["line"] for failure in body["failures"]] == [3]
+    assert body["stats"]["created"] == 1
+
+    app.config["ONBOARDING_API_KEY"] = ""
+    assert post("operator-key").status_code == 404
@@ -0,0 +1,100 @@
+# tests/test_prescription.py
+
+import random
+from itertools import combinations
+
+import pytest
+
+from app.utils.prescription import plan_prescription
+
+
+def random_options(rng, pharmacies, item_count, stock_rate):
+    options = []
+    for pharmacy_id in range(pharmacies):
+        prices = {item: round(rng.uniform(1, 20), 2) for item in range(item_count) if rng.random() < stock_rate}
+        options.append((pharmacy_id, round(rng.uniform(0.2, 15), 2), prices))
+    return options
+
+
+def cost(options, chosen, items, km_cost):
+    """
+    Buy each item where it is cheapest among `chosen` (nearest on ties);
+    only pharmacies something is bought from count towards the distance.
+    """
+    used = set()
+    price = 0.0
+    for item in items:
+        best = min((i for i in chosen if item in options[i][2]), key=lambda i: (options[i][2][item], options[i][1]))
+        used.add(best)
+        price += options[best][2][item]
+    return len(used), sum(options[i][1] for i in used) * km_cost + price
+
+
+def expected(options, items, max_pharmacies, km_cost):
+    """
+    Brute-force answer: the best (size, score) over every set of pharmacies
+    of the smallest size that covers the prescription.
+    """
+    for size in range(1, max_pharmacies + 1):
+        covers = [
+            cost(options, chosen, items, km_cost)
+            for chosen in combinations(range(len(options)), size)
+            if set(items) <= set().union(*(options[i][2].keys() for i in chosen))
+        ]
+        if covers:
+            return min(covers)
+    return None
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_best_plan_matches_brute_force(seed):
+    rng = random.Random(seed)
+    item_count = rng.randint(1, 6)
+    options = random_options(rng, rng.randint(1, 12), item_count, rng.choice((0.2, 0.4, 0.7)))
+    km_cost = rng.choice((0.0, 1.0, 5.0))
+
+    plans, unavailable = plan_prescription(options, item_count, max_pharmacies=3, limit=5, km_cost=km_cost)
+
+    items = [item for item in range(item_count) if item not in unavailable]
+    assert unavailable == [item for item in range(item_count) if all(item not in prices for _, _, prices in options)]
+    if not items:
+        assert plans == []
+        return
+    for plan in plans:
+        assert set(plan.assignment) == set(items)
+        assert (len(plan.chosen), plan.score) == pytest.approx(cost(options, plan.chosen, items, km_cost))
+    assert [plan.sort_key() for plan in plans] == sorted(plan.sort_key() for plan in plans)
+
+    best = expected(options, items, 3, km_cost)
+    if best is not None:
+        assert plans[0].sort_key() == pytest.approx(best)
+    else:
+        # Nothing small enough covers it all: one greedy cover instead
+        assert len(plans) == 1
+
+
+def test_items_are_bought_where_cheapest_and_undercut_pharmacies_dropped():
+    options = [
+        (10, 1.0, {0: 5.0, 1: 5.0}),
+        (11, 2.0, {0: 4.0, 1: 4.0}),
+        (12, 0.5, {2: 1.0}),
+    ]
+
+    plans, unavailable = plan_prescription(options, 4, max_pharmacies=3, limit=10, km_cost=1.0)
+
+    assert unavailable == [3]
+    # {10, 11, 12} buys nothing from 10 and collapses into {11, 12}
+    assert [sorted(options[i][0] for i in plan.chosen) for plan in plans] == [[11, 12], [10, 12]]
+    assert plans[0].assignment == {0: 1, 1: 1, 2: 2}
+    assert (plans[0].total_distance, plans[0].total_price, plans[0].score) == (2.5, 9.0, 11.5)
+
+
+def test_greedy_cover_when_more_pharmacies_are_needed():
+    # Every pharmacy stocks a single item
+    options = [(i, float(i + 1), {i: 1.0}) for i in range(5)]
+
+    plans, _ = plan_prescription(options, 5, max_pharmacies=3)
+
+    assert len(plans) == 1
+    assert sorted(plans[0].chosen) == [0, 1, 2, 3, 4]
+    assert plans[0].total_price == 5.0
@@ -0,0 +1,81 @@
+# tests/test_road_network.py
+
+import random
+from array import array
+
+import pytest
+
+from app.utils import graph_interface
+from app.utils.road_network import INF, PythonRoadGraph, RoadNetworkData
+
+needs_cpp = pytest.mark.skipif(not graph_interface.CPP_AVAILABLE, reason="dijkstra_graph is not built")
+
+# The C++ loader reports a corrupt file as RuntimeError
+LOADERS = [
+    pytest.param(PythonRoadGraph.load, ValueError, id="python"),
+    pytest.param(getattr(getattr(graph_interface.dijkstra_graph, "RoadGraph", None), "load", None),
+                 RuntimeError, id="cpp", marks=needs_cpp),
+]
+
+
+def random_network(rng, n, m):
+    coords = {i: (30.3 + rng.uniform(0, 0.1), 78.0 + rng.uniform(0, 0.1)) for i in range(n)}
+    edges = [(i, (i + 1) % n, None, 30) for i in range(n)]
+    for _ in range(m):
+        edges.append((rng.randrange(n), rng.randrange(n), rng.choice((None, rng.uniform(0, 20))), rng.choice((20, 50, 80))))
+    return RoadNetworkData.from_edges(coords, edges)
+
+
+def expected(data, source, by_time):
+    """
+    Brute-force answer: Bellman-Ford distances from `source`.
+    """
+    weights = data.times if by_time else data.lengths
+    dist = [INF] * data.num_nodes
+    dist[source] = 0.0
+    for _ in range(data.num_nodes):
+        for u in range(data.num_nodes):
+            for e in range(data.offsets[u], data.offsets[u + 1]):
+                dist[data.targets[e]] = min(dist[data.targets[e]], dist[u] + weights[e])
+    return dist
+
+
+@pytest.mark.parametrize("load, _", LOADERS)
+def test_routes_match_brute_force_after_a_round_trip(tmp_path, load, _):
+    rng = random.Random(4)
+    data = random_network(rng, 40, 80)
+    data.save(str(tmp_path / "roads.bin"))
+    graph = load(str(tmp_path / "roads.bin"))
+    assert (graph.num_nodes, graph.num_edges) == (data.num_nodes, data.num_edges)
+
+    edges = {}
+    for u in range(data.num_nodes):
+        for e in range(data.offsets[u], data.offsets[u + 1]):
+            edges.setdefault((u, data.targets[e]), []).append(e)
+    for by_time in (False, True):
+        for source in rng.sample(range(data.num_nodes), 5):
+            dist = expected(data, source, by_time)
+            for target in rng.sample(range(data.num_nodes), 5):
+                path, km, hours = graph.route(source, target, by_time)
+                path = list(path)
+                assert (path[0], path[-1]) == (source, target)
+                assert all((u, v) in edges for u, v in zip(path, path[1:]))
+                assert (hours if by_time else km) == pytest.approx(dist[target])
+
+
+@pytest.mark.parametrize("load, error", LOADERS)
+@pytest.mark.parametrize("offsets, targets", [
+    ([0, 1, 2, 4], [1, 2, 0]),      # offsets[-1] != number of edges
+    ([0, 2, 1, 3], [1, 2, 0]),      # offsets go backwards
+    ([1, 1, 2, 3], [1, 2, 0]),      # offsets don't start at 0
+    ([0, 1, 2, 3], [1, 3, 0]),      # target past the last node
+    ([0, 1, 2, 3], [1, -1, 0]),     # negative target
+])
+def test_corrupt_csr_arrays_are_rejected(tmp_path, load, error, offsets, targets):
+    lats, lons = array("d", [30.0, 30.1, 30.2]), array("d", [78.0, 78.1, 78.2])
+    weights = array("d", [1.0] * len(targets))
+    data = RoadNetworkData(lats, lons, array("q", offsets), array("q", targets), weights, weights, 50.0)
+    data.save(str(tmp_path / "roads.bin"))
+
+    with pytest.raises(error, match="Corrupt road graph"):
+        load(str(tmp_path / "roads.bin"))
@@ -0,0 +1,134 @@
+# tests/test_routing_graph.py
+
+import random
+
+import pytest
+
+from app.utils.geo import haversine
+from app.utils.routing_graph import USER_NODE, RoutingGraph
+from app.utils.spatial_index import SpatialIndex
+
+
+def make_graph(points, k=4):
+    index = SpatialIndex()
+    index.rebuild(points)
+    return index, RoutingGraph(index, k)
+
+
+def knn_edges(points, k):
+    """
+    Brute-force k-nearest-neighbour graph, kept in both directions.
+    """
+    edges = {str(point_id): {} for point_id, _, _ in points}
+    for point_id, lat, lon in points:
+        neighbours = sorted(
+            (haversine(lat, lon, olat, olon), str(other)) for other, olat, olon in points if other != point_id
+        )[:k]
+        for distance, other in neighbours:
+            edges[str(point_id)][other] = distance
+            edges[other][str(point_id)] = distance
+    return edges
+
+
+def shortest_distances(edges, sources):
+    """
+    Bellman-Ford style relaxation until nothing improves.
+    """
+    dist = dict(sources)
+    changed = True
+    while changed:
+        changed = False
+        for node, d in list(dist.items()):
+            for other, w in edges[node].items():
+                if d + w < dist.get(other, float("inf")) - 1e-12:
+                    dist[other] = d + w
+                    changed = True
+    return dist
+
+
+def attach(points, lat, lon, k):
+    return dict(sorted((haversine(lat, lon, plat, plon), str(point_id)) for point_id, plat, plon in points)[:k])
+
+
+def expected(points, k, lat, lon, target_ids, attach_k):
+    sources = {node: d for d, node in attach(points, lat, lon, attach_k).items()}
+    dist = shortest_distances(knn_edges(points, k), sources)
+    reachable = [(dist[str(t)], t) for t in target_ids if str(t) in dist]
+    return min(reachable) if reachable else None
+
+
+def path_length(edges, sources, path):
+    assert path[0] == USER_NODE
+    total = sources[path[1]]
+    for a, b in zip(path[1:], path[2:]):
+        total += edges[a][b]
+    return total
+
+
+def test_route_to_nearest_matches_brute_force():
+    rng = random.Random(4)
+    points = [(i, rng.uniform(30.2, 30.45), rng.uniform(77.9, 78.15)) for i in range(250)]
+    index, graph = make_graph(points)
+    edges = knn_edges(points, 4)
+
+    for _ in range(25):
+        lat, lon = rng.uniform(30.2, 30.45), rng.uniform(77.9, 78.15)
+        targets = rng.sample(range(250), rng.choice((1, 3, 20)))
+        want = expected(points, 4, lat, lon, targets, 6)
+        pharmacy_id, distance, path = graph.route_to_nearest(lat, lon, targets, attach_k=6)
+
+        assert distance == pytest.approx(want[0])
+        assert pharmacy_id in targets
+        assert path[-1] == str(pharmacy_id)
+        sources = {node: d for d, node in attach(points, lat, lon, 6).items()}
+        assert path_length(edges, sources, path) == pytest.approx(distance)
+
+
+def test_graph_follows_index_changes():
+    rng = random.Random(9)
+    points = [(i, rng.uniform(30.2, 30.45), rng.uniform(77.9, 78.15)) for i in range(120)]
+    index, graph = make_graph(points)
+    graph.sync()
+
+    # A few changes are patched into the existing graph
+    removed = {3, 50, 77}
+    for point_id in removed:
+        index.remove(point_id)
+    added = [(200 + i, rng.uniform(30.2, 30.45), rng.uniform(77.9, 78.15)) for i in range(5)]
+    for point_id, lat, lon in added:
+        index.add(point_id, lat, lon)
+    current = [p for p in points if p[0] not in removed] + added
+    coords = {str(point_id): (lat, lon) for point_id, lat, lon in current}
+    lat, lon = 30.3165, 78.0322
+    graph.route_to_nearest(lat, lon, [0])
+
+    assert set(graph.adjacency) == set(coords)
+    for node, edges in graph.adjacency.items():
+        for other, distance in edges.items():
+            assert distance == pytest.approx(haversine(*coords[node], *coords[other]))
+            assert graph.adjacency[other][node] == distance
+    for point_id, plat, plon in added:
+        assert set(attach(current, plat, plon, 5).values()) - {str(point_id)} <= set(graph.adjacency[str(point_id)])
+
+    sources = {node: d for d, node in attach(current, lat, lon, 4).items()}
+    dist = shortest_distances(graph.adjacency, sources)
+    for _ in range(10):
+        targets = [point_id for point_id, _, _ in rng.sample(current, 4)] + [3]
+        _, distance, path = graph.route_to_nearest(lat, lon, targets)
+        assert distance == pytest.approx(min(dist[str(t)] for t in targets if t not in removed))
+        assert not removed & {int(node) for node in path[1:]}
+
+
+def test_unreachable_targets_fall_back_to_straight_line():
+    # Two clusters too far apart for a 2-nearest-neighbour graph to link
+    points = [
+        (1, 30.31, 78.03), (2, 30.311, 78.031), (3, 30.312, 78.032),
+        (4, 12.97, 77.59), (5, 12.971, 77.591), (6, 12.972, 77.592),
+    ]
+    _, graph = make_graph(points, k=2)
+
+    pharmacy_id, distance, path = graph.route_to_nearest(30.31, 78.03, [4, 5], attach_k=2)
+    assert pharmacy_id == 5
+    assert distance == pytest.approx(haversine(30.31, 78.03, 12.971, 77.591))
+    assert path == [USER_NODE, "5"]
+    assert graph.route_to_nearest(30.31, 78.03, [99]) is None
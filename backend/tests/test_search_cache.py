@@ -0,0 +1,71 @@
+# tests/test_search_cache.py
+
+import io
+
+from app.utils.inventory_ingest import ingest_inventory
+from app.utils.search_cache import SearchResultCache, invalidate_pharmacy, search_cache
+from app.utils.spatial_index import remove_pharmacy
+
+CSV = b"name,stock,price,expiry_date\nParacetamol,10,2.5,2030-01-01\n"
+DEHRADUN = (30.3165, 78.0322)
+MUSSOORIE = (30.4598, 78.0644)     # about 16 km away
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SearchResultCache(max_entries=2, ttl=60)
+    cache.set("a", 1, *DEHRADUN, 1.0)
+    cache.set("b", 2, *DEHRADUN, 1.0)
+    assert cache.get("a") == 1
+    cache.set("c", 3, *DEHRADUN, 1.0)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_misses():
+    cache = SearchResultCache(ttl=0)
+    cache.set("a", 1, *DEHRADUN, 1.0)
+
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 0
+
+
+def test_searches_in_one_cell_share_its_centre():
+    cache = SearchResultCache(precision=7)
+    cell, lat, lon = cache.locate(*DEHRADUN)
+
+    assert cache.locate(DEHRADUN[0] + 0.0001, DEHRADUN[1] + 0.0001) == (cell, lat, lon)
+    assert SearchResultCache(max_entries=0).locate(*DEHRADUN) == (None, *DEHRADUN)
+
+
+def test_invalidation_drops_entries_whose_frontier_reaches_the_change():
+    cache = SearchResultCache()
+    cache.set("near", 1, *DEHRADUN, 2.0)
+    cache.set("far", 2, *MUSSOORIE, 5.0)
+    cache.set("exhaustive", 3, *MUSSOORIE, float("inf"))
+
+    assert cache.invalidate_near(DEHRADUN[0] + 0.01, DEHRADUN[1]) == 2
+    assert (cache.get("near"), cache.get("far"), cache.get("exhaustive")) == (None, 2, None)
+
+
+def test_invalidate_pharmacy_looks_up_unindexed_pharmacies(app, make_pharmacy):
+    pharmacy_id = make_pharmacy("unindexed@example.com", *MUSSOORIE)
+    remove_pharmacy(pharmacy_id)
+    search_cache.set("far", 1, *MUSSOORIE, 1.0)
+
+    assert invalidate_pharmacy(pharmacy_id) == 1
+    assert invalidate_pharmacy(pharmacy_id + 1) == 0
+
+
+def test_committed_upload_invalidates_searches_that_could_see_the_pharmacy(app, make_pharmacy):
+    pharmacy_id = make_pharmacy("cached@example.com", *DEHRADUN)
+    search_cache.set("near", 1, *DEHRADUN, 1.0)
+    search_cache.set("far", 2, *MUSSOORIE, 1.0)
+
+    ingest_inventory(pharmacy_id, io.BytesIO(CSV), trace_memory=False)
+    assert (search_cache.get("near"), search_cache.get("far")) == (None, 2)
+
+    # An upload that changes nothing leaves the cache alone
+    search_cache.set("near", 1, *DEHRADUN, 1.0)
+    ingest_inventory(pharmacy_id, io.BytesIO(CSV), trace_memory=False)
+    assert search_cache.get("near") == 1
@@ -0,0 +1,77 @@
+# tests/test_spatial_index.py
+
+import random
+
+import pytest
+
+from app.utils.geo import haversine
+from app.utils.spatial_index import SpatialIndex
+
+
+def random_points(rng, n, lat_range=(-80.0, 80.0), lon_range=(-180.0, 180.0)):
+    return [(i, rng.uniform(*lat_range), rng.uniform(*lon_range)) for i in range(n)]
+
+
+def expected(points, lat, lon, max_km=None):
+    """
+    Brute-force answer: every point by haversine distance, nearest first.
+    """
+    hits = sorted((haversine(lat, lon, plat, plon), point_id) for point_id, plat, plon in points)
+    return [(d, point_id) for d, point_id in hits if max_km is None or d <= max_km]
+
+
+def assert_same_hits(actual, wanted):
+    assert [point_id for _, point_id in actual] == [point_id for _, point_id in wanted]
+    assert [d for d, _ in actual] == pytest.approx([d for d, _ in wanted], abs=1e-6)
+
+
+def test_nearest_matches_brute_force():
+    rng = random.Random(11)
+    points = random_points(rng, 2000)
+    index = SpatialIndex()
+    index.rebuild(points)
+
+    for lat, lon in [(rng.uniform(-85, 85), rng.uniform(-180, 180)) for _ in range(40)]:
+        for k in (1, 7, 50):
+            assert_same_hits(index.nearest(lat, lon, k), expected(points, lat, lon)[:k])
+        assert_same_hits(index.nearest(lat, lon, 100, max_km=800), expected(points, lat, lon, 800)[:100])
+
+
+def test_within_radius_matches_brute_force():
+    rng = random.Random(5)
+    # A dense city plus scattered points, as the pharmacy table looks
+    points = random_points(rng, 1500, (30.2, 30.45), (77.9, 78.15)) + [
+        (1500 + i, lat, lon) for i, lat, lon in random_points(rng, 500)
+    ]
+    index = SpatialIndex()
+    index.rebuild(points)
+
+    for lat, lon in [(30.3165, 78.0322), (30.45, 77.95), (0.0, 0.0)]:
+        for radius_km in (0.5, 3, 25, 5000):
+            assert_same_hits(index.within_radius(lat, lon, radius_km), expected(points, lat, lon, radius_km))
+
+
+def test_queries_across_the_antimeridian_and_near_the_poles():
+    rng = random.Random(2)
+    points = random_points(rng, 300, (-89.9, 89.9), (170.0, 180.0)) + [
+        (300 + i, lat, lon) for i, lat, lon in random_points(rng, 300, (-89.9, 89.9), (-180.0, -170.0))
+    ]
+    index = SpatialIndex()
+    index.rebuild(points)
+
+    for lat, lon in [(10.0, 179.9), (-45.0, -179.95), (89.5, 0.0), (-89.5, 120.0)]:
+        assert_same_hits(index.nearest(lat, lon, 10), expected(points, lat, lon)[:10])
+        assert_same_hits(index.within_radius(lat, lon, 400), expected(points, lat, lon, 400))
+
+
+def test_adds_and_removes_are_seen_by_the_next_query():
+    index = SpatialIndex()
+    index.rebuild([(1, 30.3165, 78.0322), (2, 30.4598, 78.0644)])
+    index.add(3, 30.3170, 78.0330)
+    index.add(4, None, 78.0)
+    index.remove(1)
+
+    assert [point_id for _, point_id in index.nearest(30.3165, 78.0322, 5)] == [3, 2]
+    assert [point_id for _, point_id in index.within_radius(30.3165, 78.0322, 1)] == [3]
+    assert 4 not in index
+    assert SpatialIndex().nearest(0.0, 0.0, 3) == []
@@ -0,0 +1,128 @@
+# tests/test_tour.py
+
+import random
+from array import array
+from itertools import permutations
+from math import hypot
+
+import pytest
+
+from app.utils import graph_interface
+from app.utils.graph_interface import (
+    python_solve_tour_exact, python_solve_tour_heuristic, solve_tour, tour_cost,
+)
+
+needs_cpp = pytest.mark.skipif(not graph_interface.CPP_AVAILABLE, reason="dijkstra_graph is not built")
+
+EXACT_SOLVERS = [
+    pytest.param(python_solve_tour_exact, id="python"),
+    pytest.param(getattr(graph_interface.dijkstra_graph, "solve_tour_exact", None), id="cpp", marks=needs_cpp),
+]
+HEURISTIC_SOLVERS = [
+    pytest.param(python_solve_tour_heuristic, id="python"),
+    pytest.param(getattr(graph_interface.dijkstra_graph, "solve_tour_heuristic", None), id="cpp", marks=needs_cpp),
+]
+
+
+def euclidean_matrix(rng, n):
+    points = [(rng.uniform(0, 10), rng.uniform(0, 10)) for _ in range(n)]
+    return array("d", [hypot(a[0] - b[0], a[1] - b[1]) for a in points for b in points])
+
+
+def asymmetric_matrix(rng, n):
+    return array("d", [0.0 if i == j else rng.uniform(1, 20) for i in range(n) for j in range(n)])
+
+
+def optimal_cost(matrix, n, return_to_start):
+    """
+    Brute-force answer: every order of the stops after node 0.
+    """
+    if n <= 1:
+        return 0.0
+    return min(tour_cost(matrix, n, (0,) + order, return_to_start) for order in permutations(range(1, n)))
+
+
+def assert_valid_tour(matrix, n, order, cost, return_to_start):
+    assert order[:1] == [0][:n]
+    assert sorted(order) == list(range(n))
+    assert cost == pytest.approx(tour_cost(matrix, n, order, return_to_start))
+
+
+@pytest.mark.parametrize("solve", EXACT_SOLVERS)
+@pytest.mark.parametrize("return_to_start", [False, True])
+def test_exact_solver_matches_brute_force(solve, return_to_start):
+    rng = random.Random(6)
+    for n in (0, 1, 2, 3, 5, 8):
+        for make_matrix in (euclidean_matrix, asymmetric_matrix):
+            matrix = make_matrix(rng, n)
+            order, cost = solve(matrix, return_to_start)
+            order = list(order)
+
+            assert_valid_tour(matrix, n, order, cost, return_to_start)
+            assert cost == pytest.approx(optimal_cost(matrix, n, return_to_start))
+
+
+@pytest.mark.parametrize("solve", HEURISTIC_SOLVERS)
+@pytest.mark.parametrize("return_to_start", [False, True])
+def test_heuristic_ends_in_a_local_optimum(solve, return_to_start):
+    rng = random.Random(13)
+    for n in (1, 2, 6, 25):
+        matrix = euclidean_matrix(rng, n)
+        order, cost = solve(matrix, return_to_start, 1000.0)
+        order = list(order)
+
+        assert_valid_tour(matrix, n, order, cost, return_to_start)
+        if n <= 8:
+            assert cost >= optimal_cost(matrix, n, return_to_start) - 1e-9
+        # No segment reversal (2-opt) or short segment move (Or-opt) improves it
+        for i in range(1, n - 1):
+            for k in range(i + 1, n):
+                candidate = order[:i] + order[i:k + 1][::-1] + order[k + 1:]
+                assert tour_cost(matrix, n, candidate, return_to_start) >= cost - 1e-9
+        for length in (1, 2, 3):
+            for i in range(1, n - length + 1):
+                rest = order[:i] + order[i + length:]
+                for at in range(1, len(rest) + 1):
+                    candidate = rest[:at] + order[i:i + length] + rest[at:]
+                    assert tour_cost(matrix, n, candidate, return_to_start) >= cost - 1e-9
+
+
+@pytest.mark.parametrize("solve", EXACT_SOLVERS + HEURISTIC_SOLVERS)
+def test_malformed_matrices_are_rejected(solve):
+    with pytest.raises(ValueError):
+        solve(array("d", [0.0, 1.0, 1.0]), False)
+
+
+@pytest.mark.parametrize("solve", EXACT_SOLVERS)
+def test_exact_solver_refuses_large_inputs(solve):
+    n = graph_interface.MAX_EXACT_TOUR_NODES + 1
+    with pytest.raises(ValueError):
+        solve(array("d", [1.0]) * (n * n), False)
+
+
+@needs_cpp
+def test_engines_agree():
+    rng = random.Random(21)
+    for _ in range(10):
+        n = rng.randint(2, 10)
+        matrix = asymmetric_matrix(rng, n)
+        for return_to_start in (False, True):
+            _, cpp_cost = graph_interface.dijkstra_graph.solve_tour_exact(matrix, return_to_start)
+            _, python_cost = python_solve_tour_exact(matrix, return_to_start)
+            assert cpp_cost == pytest.approx(python_cost)
+
+            # Both heuristics start from the same nearest-neighbour order
+            cpp_order, cpp_cost = graph_interface.dijkstra_graph.solve_tour_heuristic(matrix, return_to_start, 0.0)
+            python_order, python_cost = python_solve_tour_heuristic(matrix, return_to_start, 0.0)
+            assert (list(cpp_order), cpp_cost) == (python_order, pytest.approx(python_cost))
+
+
+def test_solve_tour_picks_the_solver_by_size():
+    rng = random.Random(1)
+    small, large = euclidean_matrix(rng, 6), euclidean_matrix(rng, 12)
+
+    _, cost, solver = solve_tour(list(small), exact_max_nodes=8)
+    assert solver == "exact"
+    assert cost == pytest.approx(optimal_cost(small, 6, False))
+    assert solve_tour(large, exact_max_nodes=8)[2] == "heuristic"
+    assert solve_tour(small, exact_max_nodes=100)[2] == "exact"
@@ -0,0 +1,122 @@
+# tests/test_trie.py
+
+import random
+import sys
+import threading
+
+import pytest
+
+from app.utils import trie_interface
+from app.utils.trie_interface import PythonMedicineTrie
+
+BACKENDS = [
+    pytest.param(PythonMedicineTrie, id="python"),
+    pytest.param(
+        getattr(trie_interface.medicine_trie, "MedicineTrie", None), id="cpp",
+        marks=pytest.mark.skipif(not trie_interface.CPP_AVAILABLE, reason="medicine_trie is not built"),
+    ),
+]
+
+
+def expected(entries, prefix, k):
+    """
+    Brute-force answer: matches by case-insensitive prefix, higher weight
+    first, then alphabetical.
+    """
+    matches = [(-weight, name) for name, weight in entries.items() if name.lower().startswith(prefix.lower())]
+    return [name for _, name in sorted(matches)[:k]]
+
+
+@pytest.mark.parametrize("make_trie", BACKENDS)
+def test_prefix_search_ranks_by_weight_then_name(make_trie):
+    trie = make_trie(10)
+    for name, weight in (("Paracetamol", 3), ("Paracip", 5), ("Pantoprazole", 5), ("parafon", 1), ("Ibuprofen", 9)):
+        trie.insert(name, weight)
+
+    assert trie.search_by_prefix("PARA", 10) == ["Paracip", "Paracetamol", "parafon"]
+    assert trie.search_by_prefix("pa", 2) == ["Pantoprazole", "Paracip"]
+    assert trie.search_by_prefix("x", 10) == []
+
+
+@pytest.mark.parametrize("make_trie", BACKENDS)
+def test_insert_updates_weight_and_remove_drops_the_name(make_trie):
+    trie = make_trie(10)
+    trie.insert("Paracetamol", 1)
+    trie.insert("Paracip", 2)
+    trie.insert("Paracetamol", 7)
+
+    assert trie.search_by_prefix("para", 10) == ["Paracetamol", "Paracip"]
+    assert trie.remove("Paracetamol")
+    assert not trie.remove("Paracetamol")
+    assert trie.search_by_prefix("para", 10) == ["Paracip"]
+
+
+@pytest.mark.parametrize("make_trie", BACKENDS)
+def test_large_catalog_matches_brute_force(make_trie):
+    rng = random.Random(7)
+    trie = make_trie(5)
+    entries = {}
+    # Enough names to split the Python trie's blocks many times over
+    for _ in range(3000):
+        name = rng.choice(["Para", "Pan", "Ibu", "Amox", "Cet"]) + "".join(rng.choice("abcdef") for _ in range(5))
+        entries[name] = float(rng.randint(1, 20))
+        trie.insert(name, entries[name])
+    for name in rng.sample(sorted(entries), 300):
+        trie.remove(name)
+        del entries[name]
+
+    for prefix in ("p", "Para", "panab", "IBU", "amoxf", "c"):
+        for k in (1, 5, 12):
+            assert trie.search_by_prefix(prefix, k) == expected(entries, prefix, k)
+
+
+def test_live_inserts_are_searchable():
+    trie_interface.build_trie([("Paracetamol", 3), ("Ibuprofen", 1)], top_k=5)
+    trie_interface.insert_medicine("Paracip", 4)
+    trie_interface.insert_medicine("Ibuprofen", 6)
+
+    assert trie_interface.search_medicine_prefix("para") == ["Paracip", "Paracetamol"]
+    assert trie_interface.medicine_weights() == {"Paracetamol": 3.0, "Ibuprofen": 6.0, "Paracip": 4.0}
+    assert trie_interface.remove_medicine("Paracip")
+    assert trie_interface.search_medicine_prefix("para") == ["Paracetamol"]
+
+
+def test_prefix_searches_during_concurrent_inserts():
+    trie_interface.build_trie([], top_k=5)
+    names = [f"Med{i:05d}" for i in range(10000)]
+    random.Random(3).shuffle(names)
+    errors = []
+    inserting = threading.Event()
+    inserting.set()
+
+    def insert():
+        for i, name in enumerate(names):
+            trie_interface.insert_medicine(name, i % 17)
+        inserting.clear()
+
+    def search():
+        try:
+            i = 0
+            while inserting.is_set():
+                for name in trie_interface.search_medicine_prefix(f"med{i % 100:02d}", 5):
+                    assert name.startswith(f"Med{i % 100:02d}")
+                i += 1
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=insert)] + [threading.Thread(target=search) for _ in range(3)]
+    # Switch threads often so reads land inside block splits
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert trie_interface.search_medicine_prefix("med029", 5) == expected(
+        {name: i % 17 for i, name in enumerate(names)}, "med029", 5
+    )